@@ -42,8 +42,8 @@ def create_app(config_name='default'):
              r"/api/*": {
                  "origins": ["http://localhost:3000", "http://127.0.0.1:3000"],
                  "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
-                 "allow_headers": ["Content-Type", "Authorization", "X-Requested-With", "X-Auth-Token", "Origin", "Accept"],
-                 "expose_headers": ["Content-Type", "Authorization", "X-Requested-With"],
+                 "allow_headers": ["Content-Type", "Authorization", "X-Requested-With", "X-Auth-Token", "Origin", "Accept", "Idempotency-Key"],
+                 "expose_headers": ["Content-Type", "Authorization", "X-Requested-With", "Idempotent-Replayed"],
                  "supports_credentials": True,
                  "max_age": 3600
              },
@@ -105,11 +105,34 @@ def create_app(config_name='default'):
     except ImportError as e:
         print(f"警告: 无法导入 quiz 路由: {e}")
 
+    # ========== 初始化主观题后台批改队列（首次提交时启动工作线程）、评分缓存、幂等键存储和考试草稿缓冲 ==========
+    try:
+        from services.grading_queue import grading_queue
+        grading_queue.init_app(app)
+        from services.grade_cache import grade_cache
+        grade_cache.init_app(app)
+        from services.lexical_scorer import lexical_index
+        lexical_index.init_app(app)
+        from utils.idempotency import idempotency_store
+        idempotency_store.init_app(app)
+        from services.exam import draft_buffer
+        draft_buffer.init_app(app)
+    except ImportError as e:
+        print(f"警告: 无法初始化批改队列: {e}")
+
     # ========== 注册AI路由 ==========
     try:
         from routes.ai import ai_bp
         app.register_blueprint(ai_bp, url_prefix='/api/v1/ai')
         print("✅ AI路由注册成功 (v1)")
+        from services.llm_client import llm_client
+        llm_client.init_app(app)
+        from services.llm_cache import llm_cache
+        llm_cache.init_app(app)
+        from services.llm_health import llm_health
+        llm_health.init_app(app)
+        from services.ai_jobs import ai_job_queue
+        ai_job_queue.init_app(app)
         
         # 检查AI服务配置
         doubao_key = os.getenv('DOUBAO_API_KEY', '')
@@ -2,6 +2,7 @@ from flask import Flask, request, jsonify
 import torch
 from transformers import BertTokenizer, BertModel
 from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
 import os
 
 app = Flask(__name__)
@@ -35,6 +36,21 @@ def get_text_embedding(text):
         print(f"生成文本向量失败: {e}")
         return None
 
+def get_text_embeddings(texts, batch_size=32):
+    """批量将文本转为BERT语义向量（按批补齐后一次前向计算），返回与texts一一对应的矩阵"""
+    if not tokenizer or not model:
+        return None
+    
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        inputs = tokenizer(
+            texts[start:start + batch_size], return_tensors="pt", padding=True, truncation=True, max_length=512
+        )
+        with torch.no_grad():
+            outputs = model(**inputs)
+        vectors.append(outputs.last_hidden_state[:, 0, :].numpy())
+    return np.concatenate(vectors) if vectors else np.zeros((0, model.config.hidden_size))
+
 def calculate_similarity(text1, text2):
     """计算两个文本的语义相似度"""
     try:
@@ -122,29 +138,50 @@ def batch_calculate_similarity():
                 'message': 'AI模型未加载'
             }), 503
         
+        # 去重后批量编码：同一参考答案、相同的学生答案只计算一次（空文本不编码，对应行返回错误）
+        unique_texts = [text for text in dict.fromkeys(student_answers + reference_answers) if text]
+        try:
+            embeddings = get_text_embeddings(unique_texts)
+        except Exception as e:
+            print(f"批量生成文本向量失败: {e}")
+            embeddings = None
+        
+        # 向量计算失败时返回错误，由调用方降级评分（不能返回0分冒充真实结果）
+        if embeddings is None:
+            return jsonify({
+                'success': False,
+                'message': '批量生成文本向量失败'
+            }), 500
+        
+        norms = np.linalg.norm(embeddings, axis=1)
+        norms[norms == 0] = 1.0
+        normalized = embeddings / norms[:, None]
+        position = {text: i for i, text in enumerate(unique_texts)}
         results = []
         for i in range(len(student_answers)):
-            similarity = calculate_similarity(student_answers[i], reference_answers[i])
-            if similarity is not None:
-                score = round(similarity * 100, 2)
+            if not student_answers[i] or not reference_answers[i]:
+                # 与单条接口一致：空文本不计算相似度
                 results.append({
                     'index': i,
-                    'similarity': float(similarity),
-                    'score': score,
-                    'analysis': get_analysis_by_score(score)
-                })
-            else:
-                results.append({
-                    'index': i,
-                    'similarity': 0,
-                    'score': 0,
-                    'analysis': '计算失败'
+                    'error': '需要两个文本参数'
                 })
+                continue
+            similarity = float(np.dot(
+                normalized[position[student_answers[i]]], normalized[position[reference_answers[i]]]
+            ))
+            score = round(similarity * 100, 2)
+            results.append({
+                'index': i,
+                'similarity': similarity,
+                'score': score,
+                'analysis': get_analysis_by_score(score)
+            })
         
+        scores = [r['score'] for r in results if 'score' in r]
         return jsonify({
             'success': True,
             'results': results,
-            'average_score': round(sum(r['score'] for r in results) / len(results), 2) if results else 0
+            'average_score': round(sum(scores) / len(scores), 2) if scores else 0
         })
     except Exception as e:
         return jsonify({
@@ -152,6 +189,41 @@ def batch_calculate_similarity():
             'message': f'批量计算失败: {str(e)}'
         }), 500
 
+@app.route('/api/embeddings', methods=['POST'])
+def api_embeddings():
+    """批量获取文本的语义向量（L2归一化）"""
+    try:
+        data = request.get_json()
+        texts = data.get('texts', [])
+        
+        if not isinstance(texts, list) or not texts:
+            return jsonify({
+                'success': False,
+                'message': '需要非空的texts列表'
+            }), 400
+        
+        if not tokenizer or not model:
+            return jsonify({
+                'success': False,
+                'message': 'AI模型未加载'
+            }), 503
+        
+        embeddings = get_text_embeddings([str(text) for text in texts])
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        embeddings = embeddings / norms
+        
+        return jsonify({
+            'success': True,
+            'dimension': int(embeddings.shape[1]),
+            'embeddings': [[round(float(x), 6) for x in row] for row in embeddings]
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'生成向量失败: {str(e)}'
+        }), 500
+
 @app.route('/health', methods=['GET'])
 def health():
     """健康检查"""
@@ -171,6 +243,7 @@ def index():
         'endpoints': {
             'similarity': '/api/similarity',
             'batch_similarity': '/api/batch-similarity',
+            'embeddings': '/api/embeddings',
             'health': '/health'
         }
     })
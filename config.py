@@ -53,6 +53,30 @@ class Config:
     DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY', '')
     DEEPSEEK_API_URL = os.getenv('DEEPSEEK_API_URL', 'https://api.deepseek.com/v1')
     DEEPSEEK_MODEL = os.getenv('DEEPSEEK_MODEL', 'deepseek-chat')
+    # 大模型客户端：连接池大小（按并发工作线程数设置）、连接/读取超时（秒）、重试次数和退避参数
+    LLM_POOL_SIZE = int(os.getenv('LLM_POOL_SIZE', 20))
+    LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', 5))
+    LLM_READ_TIMEOUT = float(os.getenv('LLM_READ_TIMEOUT', 30))
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 2))
+    LLM_BACKOFF_BASE = float(os.getenv('LLM_BACKOFF_BASE', 0.5))
+    LLM_BACKOFF_MAX = float(os.getenv('LLM_BACKOFF_MAX', 8))
+    # 熔断器：连续失败次数阈值和熔断冷却时间（秒）
+    LLM_BREAKER_THRESHOLD = int(os.getenv('LLM_BREAKER_THRESHOLD', 5))
+    LLM_BREAKER_RESET = float(os.getenv('LLM_BREAKER_RESET', 30))
+    # 合并并发的相同大模型请求（single-flight）
+    LLM_COALESCE = os.getenv('LLM_COALESCE', 'true').lower() == 'true'
+    # 大模型健康探测间隔和超时（秒）
+    LLM_HEALTH_INTERVAL = float(os.getenv('LLM_HEALTH_INTERVAL', 60))
+    LLM_HEALTH_TIMEOUT = float(os.getenv('LLM_HEALTH_TIMEOUT', 10))
+    # AI生成任务各类型的并发数（类型:线程数）
+    AI_JOB_CONCURRENCY = os.getenv('AI_JOB_CONCURRENCY', 'ppt:2,quiz:2,textbook:1')
+    # 执行中的AI任务超过该秒数仍未完成，视为进程中断遗留，由任一进程重新入队
+    AI_JOB_STALE_AFTER = int(os.getenv('AI_JOB_STALE_AFTER', 600))
+    # 生成类AI接口响应缓存：过期时间（秒）、内存条数上限、磁盘条数上限和磁盘缓存文件（置空则只用内存）
+    LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', 7 * 86400))
+    LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_SIZE', 1000))
+    LLM_CACHE_DISK_SIZE = int(os.getenv('LLM_CACHE_DISK_SIZE', 20000))
+    LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', str(BASE_DIR / 'database' / 'llm_cache.db'))
 
     # 豆包大模型配置 (已弃用，保留兼容性)
     DOUBAO_API_KEY = os.getenv('DOUBAO_API_KEY', '')
@@ -68,7 +92,31 @@ class Config:
     # ----- 网关模式配置（通过Node.js AI服务）-----
     AI_SERVICE_URL = os.getenv('AI_SERVICE_URL', 'http://localhost:3001/api/v1/ai')
     AI_SERVICE_TIMEOUT = int(os.getenv('AI_SERVICE_TIMEOUT', 30))
-    
+
+    # ========== 测验批改配置 ==========
+    # BERT语义相似度服务（bert-service）
+    BERT_SERVICE_URL = os.getenv('BERT_SERVICE_URL', 'http://localhost:5001')
+    BERT_SERVICE_TIMEOUT = int(os.getenv('BERT_SERVICE_TIMEOUT', 10))
+    # 批量批改时每次请求BERT批量接口的答案条数
+    BERT_BATCH_SIZE = int(os.getenv('BERT_BATCH_SIZE', 256))
+    # 主观题异步批改：提交时只批改客观题，主观题交给后台批改线程
+    GRADING_ASYNC = os.getenv('GRADING_ASYNC', 'true').lower() == 'true'
+    GRADING_WORKERS = int(os.getenv('GRADING_WORKERS', 4))
+    # 批改中的记录超过该秒数仍未完成，视为进程中断遗留，由任一进程重新入队
+    GRADING_STALE_AFTER = int(os.getenv('GRADING_STALE_AFTER', 600))
+    # 主观题评分结果缓存容量（条），相同题目的相同答案不再重复请求BERT服务
+    GRADE_CACHE_SIZE = int(os.getenv('GRADE_CACHE_SIZE', 10000))
+    # 词法降级评分的参考答案向量缓存容量（道题）
+    LEXICAL_INDEX_SIZE = int(os.getenv('LEXICAL_INDEX_SIZE', 10000))
+    # 提交接口幂等键：结果保留时间（秒）和重试请求等待首次请求完成的最长时间（秒）
+    IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 86400))
+    IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', 30))
+    # 考试作答自动保存：后台批量写入间隔（秒）和每批条数
+    EXAM_AUTOSAVE_INTERVAL = float(os.getenv('EXAM_AUTOSAVE_INTERVAL', 2.0))
+    EXAM_AUTOSAVE_BATCH = int(os.getenv('EXAM_AUTOSAVE_BATCH', 500))
+    # 题库缓存版本检查间隔（秒），本进程写入题目时立即失效
+    QUESTION_BANK_CHECK_INTERVAL = float(os.getenv('QUESTION_BANK_CHECK_INTERVAL', 1.0))
+
     # ========== 文件上传配置 ==========
     UPLOAD_FOLDER = BASE_DIR / os.getenv('UPLOAD_FOLDER', 'backend/static/uploads')
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_FILE_SIZE', 50 * 1024 * 1024))  # 默认50MB
@@ -225,7 +273,11 @@ class TestingConfig(Config):
     TESTING = True
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
-    
+    # 内存数据库无法跨线程共享，测试环境下同步批改
+    GRADING_ASYNC = False
+    # 测试环境不写磁盘缓存
+    LLM_CACHE_PATH = ''
+
     def print_config_summary(self):
         """打印测试环境配置摘要"""
         super().print_config_summary()
@@ -49,19 +49,47 @@ except ImportError as e:
 
 # ========== 修复：完整导入测验相关模型 ==========
 try:
-    from .quiz import Quiz, QuizSubmission, QuizSimilarQuestion, QuizStatistics
+    from .quiz import (
+        Quiz, QuizSubmission, QuizAnswer, ReviewItem, QuizSimilarQuestion, QuizStatistics,
+        KnowledgeMastery, KnowledgeTracingParams, QuizItemStats, AnalyticsWatermark
+    )
     print("✅ 导入Quiz模型")
     print("✅ 导入QuizSubmission模型")
+    print("✅ 导入QuizAnswer模型")
+    print("✅ 导入ReviewItem模型")
     print("✅ 导入QuizSimilarQuestion模型")
     print("✅ 导入QuizStatistics模型")
+    print("✅ 导入KnowledgeMastery模型")
+    print("✅ 导入QuizItemStats模型")
 except ImportError as e:
     Quiz = None
     QuizSubmission = None
+    QuizAnswer = None
+    ReviewItem = None
     QuizSimilarQuestion = None
     QuizStatistics = None
+    KnowledgeMastery = None
+    KnowledgeTracingParams = None
+    QuizItemStats = None
+    AnalyticsWatermark = None
     print(f"⚠️  导入测验模型失败: {e}")
 # ===============================================
 
+try:
+    from .exam import ExamSession, ExamAnswerDraft
+    print("✅ 导入ExamSession模型")
+except ImportError as e:
+    ExamSession = None
+    ExamAnswerDraft = None
+    print(f"⚠️  导入考试模型失败: {e}")
+
+try:
+    from .ai_job import AIJob
+    print("✅ 导入AIJob模型")
+except ImportError as e:
+    AIJob = None
+    print(f"⚠️  导入AI任务模型失败: {e}")
+
 try:
     from .note import Note, SubtitleTranslation
     print("✅ 导入Note模型")
@@ -90,6 +118,8 @@ class Chapter(db.Model):
 __all__ = [
     'db', 'User', 'Role', 'Permission', 'UserStats',
     'Course', 'Video', 'Progress', 'UserProgress', 
-    'Quiz', 'QuizSubmission', 'QuizSimilarQuestion', 'QuizStatistics',
+    'Quiz', 'QuizSubmission', 'QuizAnswer', 'ReviewItem', 'QuizSimilarQuestion', 'QuizStatistics',
+    'KnowledgeMastery', 'KnowledgeTracingParams', 'QuizItemStats', 'AnalyticsWatermark',
+    'ExamSession', 'ExamAnswerDraft', 'AIJob',
     'Note', 'SubtitleTranslation', 'Chapter'
 ]
\ No newline at end of file
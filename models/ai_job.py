@@ -0,0 +1,64 @@
+"""
+AI生成任务模型
+"""
+import json
+from datetime import datetime
+# 统一使用从 models 导入的方式
+try:
+    from . import db
+except ImportError:
+    try:
+        from models import db
+    except ImportError:
+        from backend import db
+
+
+class AIJob(db.Model):
+    """耗时的AI生成任务（PPT大纲、测验题目、教材），由后台线程池执行，表本身即持久化队列"""
+    __tablename__ = 'ai_jobs'
+    __table_args__ = (
+        db.Index('ix_ai_jobs_status_created', 'status', 'created_at'),
+    )
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+
+    # 任务ID不可猜测（AI接口不要求登录，凭任务ID查询结果）
+    id = db.Column(db.String(32), primary_key=True)
+    job_type = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_QUEUED)
+
+    params = db.Column(db.Text, nullable=False)  # JSON格式：请求参数
+    result = db.Column(db.Text)  # JSON格式：生成结果（与同步接口的 data 字段相同）
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, default=0)
+
+    # 时间戳
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
+
+    def to_dict(self, include_result=True):
+        """转换为字典格式"""
+        data = {
+            'id': self.id,
+            'type': self.job_type,
+            'status': self.status,
+            'error': self.error,
+            'attempts': self.attempts or 0,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+        if include_result:
+            data['result'] = json.loads(self.result) if self.result else None
+        return data
+
+    def __repr__(self):
+        return f'<AIJob {self.id} {self.job_type} {self.status}>'
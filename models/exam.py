@@ -0,0 +1,70 @@
+"""
+考试场次模型
+"""
+import json
+from datetime import datetime
+# 统一使用从 models 导入的方式
+try:
+    from . import db
+except ImportError:
+    try:
+        from models import db
+    except ImportError:
+        from backend import db
+
+
+class ExamSession(db.Model):
+    """考试场次：固定题目列表，试卷渲染一次后由内存提供，每个学生按种子得到确定的题目顺序"""
+    __tablename__ = 'exam_sessions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+
+    # 题目ID列表（JSON格式）：{"objective": [...], "subjective": [...]}
+    question_ids = db.Column(db.Text, nullable=False)
+    # 题目乱序种子，与学生ID组合得到每个学生的题目顺序
+    seed = db.Column(db.String(64), nullable=False)
+
+    starts_at = db.Column(db.DateTime)
+    ends_at = db.Column(db.DateTime)
+    duration = db.Column(db.Integer)  # 考试时长（秒）
+
+    # 时间戳
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        """转换为字典格式"""
+        question_ids = json.loads(self.question_ids) if self.question_ids else {}
+        return {
+            'id': self.id,
+            'title': self.title,
+            'created_by': self.created_by,
+            'question_count': sum(len(ids) for ids in question_ids.values()),
+            'starts_at': self.starts_at.isoformat() if self.starts_at else None,
+            'ends_at': self.ends_at.isoformat() if self.ends_at else None,
+            'duration': self.duration,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<ExamSession {self.id}: {self.title}>'
+
+
+class ExamAnswerDraft(db.Model):
+    """考试作答草稿（自动保存，每个学生每场考试一行）"""
+    __tablename__ = 'exam_answer_drafts'
+    __table_args__ = (
+        db.UniqueConstraint('exam_id', 'user_id', name='uq_exam_answer_drafts_exam_user'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exam_sessions.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    answers = db.Column(db.Text)  # JSON格式：{"objective": {...}, "subjective": {...}}
+
+    saved_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ExamAnswerDraft exam_id={self.exam_id} user_id={self.user_id}>'
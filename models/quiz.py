@@ -18,6 +18,15 @@ except ImportError:
 class Quiz(db.Model):
     """测验题目"""
     __tablename__ = 'quizzes'
+    __table_args__ = (
+        # 题库筛选 + 按ID的游标分页
+        db.Index('ix_quizzes_type_difficulty', 'type', 'difficulty', 'id'),
+        db.Index('ix_quizzes_category_difficulty', 'category', 'difficulty', 'id'),
+        db.Index('ix_quizzes_knowledge_point_difficulty', 'knowledge_point', 'difficulty', 'id'),
+        db.Index('ix_quizzes_video_id', 'video_id', 'id'),
+        # 视频播放时按时间窗口取随堂测验
+        db.Index('ix_quizzes_video_timestamp', 'video_id', 'timestamp', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     video_id = db.Column(db.Integer, db.ForeignKey('videos.id'), nullable=True)  # 可以为空，表示独立测验
@@ -32,6 +41,7 @@ class Quiz(db.Model):
     knowledge_point = db.Column(db.String(200))
     explanation = db.Column(db.Text)
     reference_answer = db.Column(db.Text)  # 主观题参考答案
+    lexical_vector = db.Column(db.Text)  # 参考答案的预计算TF-IDF向量（JSON），用于BERT不可用时的降级评分
     
     # 相似题目信息（JSON格式）
     similar_questions = db.Column(db.Text)
@@ -76,6 +86,16 @@ class Quiz(db.Model):
 class QuizSubmission(db.Model):
     """测验提交记录"""
     __tablename__ = 'quiz_submissions'
+    __table_args__ = (
+        # 提交历史按 (submitted_at, id) 倒序游标分页
+        db.Index('ix_quiz_submissions_user_submitted', 'user_id', 'submitted_at', 'id'),
+    )
+
+    # 批改状态：pending（等待主观题批改）、grading（批改中）、graded（已完成）、failed（批改失败）
+    STATUS_PENDING = 'pending'
+    STATUS_GRADING = 'grading'
+    STATUS_GRADED = 'graded'
+    STATUS_FAILED = 'failed'
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -95,6 +115,11 @@ class QuizSubmission(db.Model):
     
     # 详细结果（JSON格式）
     detailed_results = db.Column(db.Text)
+
+    # 批改状态（历史记录均为同步批改，默认视为已完成）
+    status = db.Column(db.String(20), default='graded', index=True)
+    grading_error = db.Column(db.Text)
+    grading_started_at = db.Column(db.DateTime)  # 后台线程抢占批改任务的时间，用于识别中断遗留的任务
     
     # 时间戳
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -115,6 +140,23 @@ class QuizSubmission(db.Model):
             'duration': self.duration,
             'answers': json.loads(self.answers) if self.answers else {},
             'detailed_results': json.loads(self.detailed_results) if self.detailed_results else {},
+            'status': self.status or self.STATUS_GRADED,
+            'grading_error': self.grading_error,
+            'submitted_at': self.submitted_at.isoformat() if self.submitted_at else None,
+            'graded_at': self.graded_at.isoformat() if self.graded_at else None
+        }
+
+    def to_summary_dict(self):
+        """提交历史列表使用的摘要（不含答案和详细批改结果）"""
+        return {
+            'id': self.id,
+            'quiz_id': self.quiz_id,
+            'quiz_type': self.quiz_type,
+            'score': self.score,
+            'total_questions': self.total_questions,
+            'correct_questions': self.correct_questions,
+            'duration': self.duration,
+            'status': self.status or self.STATUS_GRADED,
             'submitted_at': self.submitted_at.isoformat() if self.submitted_at else None,
             'graded_at': self.graded_at.isoformat() if self.graded_at else None
         }
@@ -123,9 +165,230 @@ class QuizSubmission(db.Model):
         return f'<QuizSubmission user_id={self.user_id} quiz_type={self.quiz_type} score={self.score}>'
 
 
+class QuizAnswer(db.Model):
+    """单题作答结果（由提交的批改结果拆分，便于按题目或学生统计，无需解析detailed_results）"""
+    __tablename__ = 'quiz_answers'
+    __table_args__ = (
+        db.UniqueConstraint('submission_id', 'question_type', 'quiz_id', name='uq_quiz_answers_submission_question'),
+        db.Index('ix_quiz_answers_quiz_id', 'quiz_id'),
+        db.Index('ix_quiz_answers_user_id', 'user_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('quiz_submissions.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, nullable=False)  # 题目ID（可能来自静态题库，因此不设外键）
+    question_type = db.Column(db.String(20), nullable=False)  # objective, subjective
+    answer = db.Column(db.Text)  # 学生答案（客观题为所选选项）
+    score = db.Column(db.Float, default=0.0)
+    max_score = db.Column(db.Float, default=10.0)
+    is_correct = db.Column(db.Boolean, default=False)
+    similarity = db.Column(db.Float)  # 主观题语义相似度
+
+    # 时间戳（与提交时间一致）
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'id': self.id,
+            'submission_id': self.submission_id,
+            'user_id': self.user_id,
+            'quiz_id': self.quiz_id,
+            'question_type': self.question_type,
+            'answer': self.answer,
+            'score': self.score,
+            'max_score': self.max_score,
+            'is_correct': self.is_correct,
+            'similarity': self.similarity,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<QuizAnswer submission_id={self.submission_id} quiz_id={self.quiz_id} score={self.score}>'
+
+
+class ReviewItem(db.Model):
+    """错题本条目：答错的题目按SM-2间隔重复算法安排复习"""
+    __tablename__ = 'review_items'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'question_type', 'quiz_id', name='uq_review_items_user_question'),
+        # "当前待复习"按到期时间范围扫描
+        db.Index('ix_review_items_user_due', 'user_id', 'due_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, nullable=False)  # 题目ID（可能来自静态题库，因此不设外键）
+    question_type = db.Column(db.String(20), nullable=False)  # objective, subjective
+    last_answer = db.Column(db.Text)  # 最近一次的作答
+
+    # SM-2调度参数
+    repetitions = db.Column(db.Integer, default=0)  # 连续答对次数
+    interval_days = db.Column(db.Float, default=0.0)  # 当前复习间隔（天）
+    ease_factor = db.Column(db.Float, default=2.5)  # 难易系数
+    lapses = db.Column(db.Integer, default=0)  # 累计答错次数
+    due_at = db.Column(db.DateTime, nullable=False)  # 下次复习时间
+
+    # 时间戳
+    last_reviewed_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'id': self.id,
+            'quiz_id': self.quiz_id,
+            'question_type': self.question_type,
+            'last_answer': self.last_answer,
+            'repetitions': self.repetitions,
+            'interval_days': self.interval_days,
+            'ease_factor': self.ease_factor,
+            'lapses': self.lapses,
+            'due_at': self.due_at.isoformat() if self.due_at else None,
+            'last_reviewed_at': self.last_reviewed_at.isoformat() if self.last_reviewed_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<ReviewItem user_id={self.user_id} quiz_id={self.quiz_id} due_at={self.due_at}>'
+
+
+class KnowledgeMastery(db.Model):
+    """学生知识点掌握概率（贝叶斯知识追踪，每次批改增量更新）"""
+    __tablename__ = 'knowledge_mastery'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'knowledge_point', name='uq_knowledge_mastery_user_point'),
+        # 按知识点汇总班级掌握情况
+        db.Index('ix_knowledge_mastery_point', 'knowledge_point'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    knowledge_point = db.Column(db.String(200), nullable=False)  # 与 Quiz.knowledge_point 长度一致
+    p_mastery = db.Column(db.Float, nullable=False)  # 已掌握的后验概率
+    attempts = db.Column(db.Integer, default=0)
+    correct = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'knowledge_point': self.knowledge_point,
+            'p_mastery': round(self.p_mastery, 4),
+            'attempts': self.attempts,
+            'correct': self.correct,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        return f'<KnowledgeMastery user_id={self.user_id} knowledge_point={self.knowledge_point} p={self.p_mastery}>'
+
+
+class KnowledgeTracingParams(db.Model):
+    """知识点的BKT参数（由历史作答拟合，未拟合的知识点使用默认参数）"""
+    __tablename__ = 'knowledge_tracing_params'
+
+    id = db.Column(db.Integer, primary_key=True)
+    knowledge_point = db.Column(db.String(200), unique=True, nullable=False)
+    p_init = db.Column(db.Float, nullable=False)  # 初始掌握概率
+    p_transit = db.Column(db.Float, nullable=False)  # 每次练习后学会的概率
+    p_slip = db.Column(db.Float, nullable=False)  # 已掌握但答错的概率
+    p_guess = db.Column(db.Float, nullable=False)  # 未掌握但答对的概率
+    observations = db.Column(db.Integer, default=0)  # 拟合使用的作答数
+    log_likelihood = db.Column(db.Float)
+    fitted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'knowledge_point': self.knowledge_point,
+            'p_init': self.p_init,
+            'p_transit': self.p_transit,
+            'p_slip': self.p_slip,
+            'p_guess': self.p_guess,
+            'observations': self.observations,
+            'log_likelihood': self.log_likelihood,
+            'fitted_at': self.fitted_at.isoformat() if self.fitted_at else None
+        }
+
+    def __repr__(self):
+        return f'<KnowledgeTracingParams {self.knowledge_point}>'
+
+
+class QuizItemStats(db.Model):
+    """
+    题目分析统计（经典测量理论）
+
+    保存可累加的充分统计量，新作答按增量合并：
+    x 为该题得分，r 为同一次提交中其余题目的得分（总分减去本题）。
+    """
+    __tablename__ = 'quiz_item_stats'
+    __table_args__ = (
+        db.UniqueConstraint('question_type', 'quiz_id', name='uq_quiz_item_stats_question'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, nullable=False)  # 题目ID（可能来自静态题库，因此不设外键）
+    question_type = db.Column(db.String(20), nullable=False)  # objective, subjective
+
+    # 充分统计量
+    responses = db.Column(db.Integer, default=0)
+    sum_max = db.Column(db.Float, default=0.0)
+    sum_x = db.Column(db.Float, default=0.0)
+    sum_x2 = db.Column(db.Float, default=0.0)
+    sum_r = db.Column(db.Float, default=0.0)
+    sum_r2 = db.Column(db.Float, default=0.0)
+    sum_xr = db.Column(db.Float, default=0.0)
+    option_counts = db.Column(db.Text)  # JSON: 选项 -> 选择次数（客观题）
+
+    # 由统计量计算的指标
+    p_value = db.Column(db.Float)  # 难度（平均得分率）
+    discrimination = db.Column(db.Float)  # 区分度（本题得分与其余题目得分的点二列相关）
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        """转换为字典格式"""
+        option_counts = json.loads(self.option_counts) if self.option_counts else {}
+        chosen = sum(option_counts.values())
+        return {
+            'quiz_id': self.quiz_id,
+            'question_type': self.question_type,
+            'responses': self.responses,
+            'p_value': None if self.p_value is None else round(self.p_value, 4),
+            'discrimination': None if self.discrimination is None else round(self.discrimination, 4),
+            'option_counts': option_counts,
+            'option_rates': {
+                option: round(count / chosen, 4) for option, count in option_counts.items()
+            } if chosen else {},
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        return f'<QuizItemStats {self.question_type}:{self.quiz_id} p={self.p_value}>'
+
+
+class AnalyticsWatermark(db.Model):
+    """离线统计任务的处理进度（已处理到的最大作答ID）"""
+    __tablename__ = 'analytics_watermarks'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+    last_id = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<AnalyticsWatermark {self.name}={self.last_id}>'
+
+
 class QuizSimilarQuestion(db.Model):
     """相似题目关系"""
     __tablename__ = 'quiz_similar_questions'
+    __table_args__ = (
+        # 按题目取相似题（按相似度排序）
+        db.Index('ix_quiz_similar_questions_quiz_score', 'quiz_id', 'similarity_score'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), nullable=False)
@@ -146,6 +409,9 @@ class QuizSimilarQuestion(db.Model):
 class QuizStatistics(db.Model):
     """测验统计"""
     __tablename__ = 'quiz_statistics'
+    __table_args__ = (
+        db.Index('uq_quiz_statistics_user_type', 'user_id', 'quiz_type', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -3,11 +3,19 @@ AI服务路由 - 优化使用DeepSeek API
 支持智能对话、PPT生成、题目生成等功能
 """
 from flask import Blueprint, request, jsonify, current_app
-import requests
 import json
 import os
+import time
 from datetime import datetime
 
+from models import db, AIJob
+from services import ai_generation
+from services.ai_jobs import ai_job_queue
+from services.llm_client import llm_client, LLMUnavailableError
+from services.llm_cache import llm_cache
+from services.llm_health import llm_health
+from utils.sse import format_sse, sse_keepalive, sse_response
+
 ai_bp = Blueprint('ai', __name__, url_prefix='/api/v1/ai')
 
 # DeepSeek API配置（OpenAI兼容格式）
@@ -28,31 +36,13 @@ def call_deepseek_api(messages, model=None, temperature=0.7, max_tokens=2000):
     Returns:
         dict: API响应结果
     """
-    if not DEEPSEEK_API_KEY:
-        raise ValueError("DeepSeek API Key未配置，请在.env文件中设置DEEPSEEK_API_KEY")
-
-    url = f"{DEEPSEEK_API_URL}/chat/completions"
-    headers = {
-        'Authorization': f'Bearer {DEEPSEEK_API_KEY}',
-        'Content-Type': 'application/json'
-    }
-
-    payload = {
-        'model': model or DEEPSEEK_MODEL,
-        'messages': messages,
-        'temperature': temperature,
-        'max_tokens': max_tokens,
-        'stream': False
-    }
-
-    try:
-        response = requests.post(url, json=payload, headers=headers, timeout=30)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.Timeout:
-        raise Exception("DeepSeek API请求超时")
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"DeepSeek API请求失败: {str(e)}")
+    # 共用连接池，带超时、重试和熔断（见 services/llm_client.py）
+    return llm_client.chat_completion(
+        messages,
+        model=model or DEEPSEEK_MODEL,
+        temperature=temperature,
+        max_tokens=max_tokens
+    )
 
 @ai_bp.route('/chat', methods=['POST'])
 def ai_chat():
@@ -64,8 +54,15 @@ def ai_chat():
             "messages": [{"role": "user", "content": "你好"}],
             "model": "deepseek-chat",  # 可选
             "temperature": 0.7,        # 可选
-            "max_tokens": 2000         # 可选
+            "max_tokens": 2000,        # 可选
+            "stream": false            # 可选，true 时以SSE逐块返回
         }
+
+    流式模式事件:
+        delta      {"content": "..."}                     回复片段
+        reasoning  {"content": "..."}                     推理过程片段（推理模型）
+        done       {"usage": {...}, "model": "...", "finish_reason": "stop"}
+        error      {"message": "..."}                     上游在传输中途出错
     """
     try:
         data = request.get_json()
@@ -80,6 +77,15 @@ def ai_chat():
                 'message': '消息内容不能为空'
             }), 400
 
+        if data.get('stream'):
+            chunks = llm_client.stream_chat_completion(
+                messages,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            return sse_response(_relay_chat_stream(chunks, model))
+
         # 调用DeepSeek API
         result = call_deepseek_api(
             messages=messages,
@@ -106,6 +112,11 @@ def ai_chat():
                 'message': 'AI返回结果格式异常'
             }), 500
 
+    except LLMUnavailableError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503
     except ValueError as e:
         return jsonify({
             'success': False,
@@ -118,74 +129,80 @@ def ai_chat():
             'message': f'AI服务错误: {str(e)}'
         }), 500
 
-@ai_bp.route('/ppt/generate', methods=['POST'])
-def ppt_generate():
-    """
-    生成PPT大纲
-
-    请求体:
-        {
-            "topic": "人工智能导论",
-            "slides": 10,              # 可选，默认8页
-            "style": "professional"    # 可选
-        }
-    """
+def _relay_chat_stream(chunks, model):
+    """把上游数据块转换为SSE事件，逐块转发（不拼接完整回复），最后一条事件带用量统计"""
+    usage = {}
+    finish_reason = None
     try:
-        data = request.get_json()
-        topic = data.get('topic', '')
-        slides = data.get('slides', 8)
-        style = data.get('style', 'professional')
+        for chunk in chunks:
+            model = chunk.get('model') or model
+            if chunk.get('usage'):
+                usage = chunk['usage']
+            for choice in chunk.get('choices') or []:
+                delta = choice.get('delta') or {}
+                if delta.get('reasoning_content'):
+                    yield format_sse({'content': delta['reasoning_content']}, event='reasoning')
+                if delta.get('content'):
+                    yield format_sse({'content': delta['content']}, event='delta')
+                finish_reason = choice.get('finish_reason') or finish_reason
+        yield format_sse({'usage': usage, 'model': model, 'finish_reason': finish_reason}, event='done')
+    except Exception as e:
+        current_app.logger.error(f"AI Chat流式输出错误: {str(e)}")
+        yield format_sse({'message': f'AI服务错误: {str(e)}'}, event='error')
+    finally:
+        chunks.close()
 
-        if not topic:
+def _generate(job_type, error_label):
+    """生成类接口的公共处理：async=true 时创建后台任务并立即返回任务ID，否则同步生成"""
+    try:
+        data = request.get_json() or {}
+        if data.get('async'):
+            job = ai_job_queue.submit(job_type, data)
             return jsonify({
-                'success': False,
-                'message': '主题不能为空'
-            }), 400
-
-        # 构建PPT生成提示词
-        prompt = f"""请为主题"{topic}"生成一个{slides}页的PPT大纲。
-
-要求：
-1. 包含封面、目录、内容页和总结页
-2. 每页需要标题和要点内容（3-5个要点）
-3. 风格：{style}
-4. 内容要专业、清晰、有逻辑性
-
-请以JSON格式输出，格式如下：
-{{
-  "title": "PPT标题",
-  "slides": [
-    {{
-      "page": 1,
-      "title": "页面标题",
-      "content": ["要点1", "要点2", "要点3"],
-      "notes": "备注说明"
-    }}
-  ]
-}}"""
-
-        messages = [{"role": "user", "content": prompt}]
-        result = call_deepseek_api(messages, temperature=0.7, max_tokens=2000)
-
-        content = result.get('choices', [{}])[0].get('message', {}).get('content', '')
+                'success': True,
+                'data': job.to_dict(include_result=False),
+                'message': '任务已创建'
+            }), 202
 
+        validate, generate = ai_generation.GENERATORS[job_type]
         return jsonify({
             'success': True,
-            'data': {
-                'topic': topic,
-                'outline': content,
-                'slides_count': slides,
-                'style': style
-            }
+            'data': generate(validate(data))
         })
 
+    except LLMUnavailableError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
-        current_app.logger.error(f"PPT生成错误: {str(e)}")
+        current_app.logger.error(f"{error_label}错误: {str(e)}")
         return jsonify({
             'success': False,
-            'message': f'生成PPT失败: {str(e)}'
+            'message': f'{error_label}失败: {str(e)}'
         }), 500
 
+@ai_bp.route('/ppt/generate', methods=['POST'])
+def ppt_generate():
+    """
+    生成PPT大纲
+
+    请求体:
+        {
+            "topic": "人工智能导论",
+            "slides": 10,              # 可选，默认8页
+            "style": "professional",   # 可选
+            "no_cache": false,         # 可选，true 时跳过缓存重新生成
+            "async": false             # 可选，true 时创建后台任务，返回202和任务ID
+        }
+    """
+    return _generate('ppt', '生成PPT')
+
 @ai_bp.route('/quiz/generate', methods=['POST'])
 def quiz_generate():
     """
@@ -196,78 +213,28 @@ def quiz_generate():
             "content": "Python基础知识：变量、数据类型...",
             "type": "multiple_choice",  # 题目类型
             "num": 5,                    # 题目数量
-            "difficulty": "medium"       # 可选：难度
+            "difficulty": "medium",      # 可选：难度
+            "no_cache": false,           # 可选，true 时跳过缓存重新生成
+            "async": false               # 可选，true 时创建后台任务，返回202和任务ID
         }
     """
-    try:
-        data = request.get_json()
-        content = data.get('content', '')
-        question_type = data.get('type', 'multiple_choice')
-        num_questions = data.get('num', 5)
-        difficulty = data.get('difficulty', 'medium')
+    return _generate('quiz', '生成题目')
 
-        if not content:
-            return jsonify({
-                'success': False,
-                'message': '内容不能为空'
-            }), 400
+@ai_bp.route('/textbook/generate', methods=['POST'])
+def textbook_generate():
+    """
+    生成教材大纲
 
-        # 题目类型映射
-        type_map = {
-            'multiple_choice': '单选题',
-            'true_false': '判断题',
-            'short_answer': '简答题',
-            'fill_blank': '填空题'
+    请求体:
+        {
+            "subject": "Python编程",
+            "level": "初级",           # 可选
+            "chapters": 3,             # 可选，最多10章
+            "no_cache": false,         # 可选，true 时跳过缓存重新生成
+            "async": false             # 可选，true 时创建后台任务，返回202和任务ID
         }
-
-        type_name = type_map.get(question_type, '单选题')
-
-        # 构建题目生成提示词
-        prompt = f"""请基于以下内容生成{num_questions}道{type_name}（难度：{difficulty}）：
-
-内容：{content}
-
-要求：
-1. 题目要准确、清晰、有针对性
-2. 选项要合理，干扰项要有一定迷惑性
-3. 提供正确答案和解析
-4. 以JSON格式输出
-
-输出格式：
-{{
-  "questions": [
-    {{
-      "id": 1,
-      "type": "{question_type}",
-      "question": "题目内容",
-      "options": ["A. 选项1", "B. 选项2", "C. 选项3", "D. 选项4"],
-      "answer": "A",
-      "explanation": "答案解析"
-    }}
-  ]
-}}"""
-
-        messages = [{"role": "user", "content": prompt}]
-        result = call_deepseek_api(messages, temperature=0.5, max_tokens=2000)
-
-        content_response = result.get('choices', [{}])[0].get('message', {}).get('content', '')
-
-        return jsonify({
-            'success': True,
-            'data': {
-                'content': content,
-                'questions': content_response,
-                'type': question_type,
-                'difficulty': difficulty
-            }
-        })
-
-    except Exception as e:
-        current_app.logger.error(f"题目生成错误: {str(e)}")
-        return jsonify({
-            'success': False,
-            'message': f'生成题目失败: {str(e)}'
-        }), 500
+    """
+    return _generate('textbook', '生成教材')
 
 @ai_bp.route('/analyze', methods=['POST'])
 def analyze_content():
@@ -278,7 +245,8 @@ def analyze_content():
         {
             "content": "要分析的内容",
             "analyze_type": "summary|keywords|sentiment",
-            "language": "zh"
+            "language": "zh",
+            "no_cache": false          # 可选，true 时跳过缓存重新生成
         }
     """
     try:
@@ -304,7 +272,9 @@ def analyze_content():
         prompt = f"{prompt_prefix}\n\n{content}"
 
         messages = [{"role": "user", "content": prompt}]
-        result = call_deepseek_api(messages, temperature=0.3, max_tokens=1000)
+        result, cached = ai_generation.generate_cached(
+            messages, temperature=0.3, max_tokens=1000, bypass=bool(data.get('no_cache'))
+        )
 
         analysis = result.get('choices', [{}])[0].get('message', {}).get('content', '')
 
@@ -313,10 +283,16 @@ def analyze_content():
             'data': {
                 'analysis': analysis,
                 'type': analyze_type,
-                'original_length': len(content)
+                'original_length': len(content),
+                'cached': cached
             }
         })
 
+    except LLMUnavailableError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503
     except Exception as e:
         current_app.logger.error(f"内容分析错误: {str(e)}")
         return jsonify({
@@ -324,40 +300,138 @@ def analyze_content():
             'message': f'分析失败: {str(e)}'
         }), 500
 
-@ai_bp.route('/status', methods=['GET'])
-def api_status():
+@ai_bp.route('/jobs', methods=['POST'])
+def create_job():
     """
-    检查AI服务状态
+    创建AI生成任务（立即返回任务ID，由后台线程池执行）
+
+    请求体:
+        {
+            "type": "ppt|quiz|textbook",
+            "params": {...}             # 与对应同步生成接口的请求体相同
+        }
     """
     try:
-        # 简单的状态检查
-        if not DEEPSEEK_API_KEY:
-            return jsonify({
-                'success': False,
-                'status': 'error',
-                'message': 'DeepSeek API Key未配置'
-            }), 500
-
-        # 尝试调用API进行健康检查
-        messages = [{"role": "user", "content": "你好"}]
-        result = call_deepseek_api(messages, max_tokens=10)
-
+        data = request.get_json() or {}
+        job = ai_job_queue.submit(data.get('type'), data.get('params') or {})
         return jsonify({
             'success': True,
-            'status': 'healthy',
-            'provider': 'DeepSeek',
-            'model': DEEPSEEK_MODEL,
-            'api_url': DEEPSEEK_API_URL,
-            'timestamp': datetime.now().isoformat()
-        })
+            'data': job.to_dict(include_result=False),
+            'message': '任务已创建'
+        }), 202
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"创建AI任务错误: {str(e)}")
         return jsonify({
             'success': False,
-            'status': 'unhealthy',
-            'message': str(e),
-            'timestamp': datetime.now().isoformat()
+            'message': f'创建任务失败: {str(e)}'
         }), 500
 
+@ai_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """查询AI生成任务的状态和结果"""
+    job = db.session.get(AIJob, job_id)
+    if not job:
+        return jsonify({
+            'success': False,
+            'message': '任务不存在'
+        }), 404
+
+    # 服务重启后首次查询时恢复未完成的任务
+    if not job.is_finished:
+        ai_job_queue.ensure_started()
+
+    return jsonify({
+        'success': True,
+        'data': job.to_dict()
+    })
+
+@ai_bp.route('/jobs/<job_id>/events', methods=['GET'])
+def stream_job(job_id):
+    """以SSE推送AI生成任务的状态，任务完成或失败后结束"""
+    job = db.session.get(AIJob, job_id)
+    if not job:
+        return jsonify({
+            'success': False,
+            'message': '任务不存在'
+        }), 404
+
+    ai_job_queue.ensure_started()
+
+    def generate():
+        notifier = ai_job_queue.notifier
+        deadline = time.monotonic() + 300
+        last_status = None
+        last_sent = time.monotonic()
+        version = notifier.version(job_id)
+
+        while True:
+            current = db.session.get(AIJob, job_id)
+            if current is None:
+                # 推送期间任务记录被删除
+                yield format_sse({'id': job_id, 'status': 'gone'}, event='gone')
+                return
+            status = current.status
+
+            if status != last_status:
+                last_status = status
+                if current.is_finished:
+                    yield format_sse(current.to_dict(), event=status)
+                    return
+                yield format_sse({'id': job_id, 'status': status}, event='status')
+                last_sent = time.monotonic()
+
+            if time.monotonic() >= deadline:
+                yield format_sse({'id': job_id, 'status': status}, event='timeout')
+                return
+
+            # 等待期间释放数据库连接；本进程任务完成时立即唤醒，多进程部署时退化为每2秒查询一次
+            db.session.close()
+            new_version = notifier.wait(job_id, version, timeout=2)
+            if new_version == version and time.monotonic() - last_sent >= 15:
+                yield sse_keepalive()
+                last_sent = time.monotonic()
+            version = new_version
+
+    return sse_response(generate())
+
+@ai_bp.route('/status', methods=['GET'])
+def api_status():
+    """
+    检查AI服务状态
+
+    返回后台探测线程缓存的最近一次结果（不调用大模型），age_seconds 为结果距今秒数。
+    查询参数 refresh=1 时唤醒探测线程立即重新探测（本次仍返回缓存结果）。
+    """
+    llm_health.ensure_started()
+    if request.args.get('refresh') in ('1', 'true'):
+        llm_health.refresh()
+
+    health = llm_health.snapshot()
+    status = health['status']
+    payload = {
+        'success': status in (llm_health.HEALTHY, llm_health.UNKNOWN),
+        'status': status,
+        'provider': 'DeepSeek',
+        'model': DEEPSEEK_MODEL,
+        'api_url': DEEPSEEK_API_URL,
+        'health': health,
+        'cache': llm_cache.stats(),
+        'client': llm_client.stats(),
+        'jobs': {'pending': ai_job_queue.pending_counts(), 'concurrency': ai_job_queue.concurrency},
+        'timestamp': datetime.now().isoformat()
+    }
+    if status == llm_health.UNCONFIGURED:
+        payload['message'] = 'DeepSeek API Key未配置'
+    elif status == llm_health.UNHEALTHY:
+        payload['message'] = health['last_error']
+    return jsonify(payload), 200 if payload['success'] else 500
+
 # 健康检查（向后兼容）
 @ai_bp.route('/health', methods=['GET'])
 def health_check():
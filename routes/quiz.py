@@ -1,48 +1,209 @@
 # backend/routes/quiz.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from sqlalchemy import and_, or_, case, func
+from sqlalchemy.orm import load_only
 from routes.auth import token_required
-from models import db, Quiz, QuizSubmission, QuizStatistics
-import requests
+from models import db, QuizSubmission, QuizStatistics, ExamSession, ReviewItem, KnowledgeMastery, QuizItemStats, UserProgress, Video
+from services.question_bank import get_static_question_bank, question_bank
+from services.grading import (
+    new_results, grade_objective_answers, grade_subjective_answers,
+    finalize_results, apply_results_to_submission, score_subjective_answer, QUESTION_SCORE
+)
+from services.quiz_stats import record_graded_submission
+from services.quiz_answers import record_answers
+from services.grading_queue import grading_queue
+from services.grade_cache import grade_cache
+from services.adaptive import adaptive_engine
+from services.exam import exam_papers, draft_buffer
+from services.review import apply_review, quality_from_outcome
+from services.knowledge_tracing import MASTERY_THRESHOLD
+from services.item_analysis import item_flags, update_item_statistics
+from services import question_import
+from services.bulk_grading import (
+    DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE, bulk_grade, detect_format, iter_answer_rows
+)
+from utils.sse import format_sse, sse_keepalive, sse_response
+from utils.idempotency import idempotent
+import io
 import json
+import secrets
+import time
 from datetime import datetime
 
 quiz_bp = Blueprint('quiz', __name__, url_prefix='/api/v1/quiz')
 
 # ==================== API路由 ====================
 
+# 分页参数
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# 每次获取的待复习错题数量
+DEFAULT_REVIEW_LIMIT = 20
+MAX_REVIEW_LIMIT = 100
+
+# 视频随堂测验时间窗口（秒）
+DEFAULT_VIDEO_WINDOW = 30
+MAX_VIDEO_WINDOW = 600
+
+
 @quiz_bp.route('/questions', methods=['GET'])
 @token_required
 def get_questions(current_user):
-    """获取题库列表（从数据库）"""
+    """
+    获取题库列表
+
+    查询参数:
+        type: objective | subjective | all
+        category / knowledge_point / difficulty / video_id: 可选筛选条件
+        limit: 每页数量（默认50，最大200）
+        cursor: 上一页返回的 next_cursor
+
+    不带筛选和分页参数时返回整个题库（进程内缓存的预编码响应）；
+    带任一参数时走复合索引按ID游标分页，只返回本页题目。
+    """
+    question_type = request.args.get('type', 'all')
+    if question_type not in ('objective', 'subjective'):
+        question_type = 'all'
+
+    paged_args = ('category', 'knowledge_point', 'difficulty', 'video_id', 'limit', 'cursor')
+    if any(request.args.get(name) not in (None, '') for name in paged_args):
+        return _get_questions_page(question_type)
+
     try:
-        question_type = request.args.get('type', 'all')
-        
-        if question_type == 'objective':
-            questions = Quiz.query.filter_by(type='objective').all()
-        elif question_type == 'subjective':
-            questions = Quiz.query.filter_by(type='subjective').all()
-        else:
-            questions = Quiz.query.all()
-        
+        return Response(question_bank.listing(question_type), status=200, mimetype='application/json')
+    except Exception as e:
+        print(f"获取题库失败，使用静态数据: {e}")
+        return jsonify({
+            'success': True,  # 注意这里保持success为True，因为静态数据也是有效的
+            'message': f'从数据库获取题库失败，已返回静态数据: {str(e)}',
+            'data': get_static_question_bank()
+        }), 200
+
+
+def _get_questions_page(question_type):
+    """按条件筛选并分页返回题目"""
+    cursor = request.args.get('cursor')
+    try:
+        after_id = _parse_question_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': '无效的分页游标'
+        }), 400
+
+    try:
+        filters = {
+            'type': None if question_type == 'all' else question_type,
+            'category': request.args.get('category') or None,
+            'knowledge_point': request.args.get('knowledge_point') or None,
+            'difficulty': request.args.get('difficulty', type=int),
+            'video_id': request.args.get('video_id', type=int)
+        }
+        limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        questions, has_more = question_bank.page(filters, after_id=after_id, limit=limit)
         return jsonify({
             'success': True,
             'data': {
-                'objective': [q.to_dict() for q in questions if q.type == 'objective'],
-                'subjective': [q.to_dict() for q in questions if q.type == 'subjective']
+                'objective': [q for q in questions if q['type'] == 'objective'],
+                'subjective': [q for q in questions if q['type'] == 'subjective']
+            },
+            'pagination': {
+                'limit': limit,
+                'count': len(questions),
+                'has_more': has_more,
+                'next_cursor': questions[-1]['id'] if has_more and questions else None
             }
         }), 200
     except Exception as e:
-        print(f"获取题库失败，使用静态数据: {e}")
+        print(f"分页获取题库失败: {e}")
         return jsonify({
-            'success': True,  # 注意这里保持success为True，因为静态数据也是有效的
-            'message': f'从数据库获取题库失败，已返回静态数据: {str(e)}',
-            'data': get_static_question_bank()
+            'success': False,
+            'message': f'获取题库失败: {str(e)}'
+        }), 500
+
+
+def _parse_question_cursor(cursor):
+    """题库分页游标：上一页最后一道题的ID（正整数）"""
+    after_id = int(cursor)
+    if after_id <= 0:
+        raise ValueError(cursor)
+    return after_id
+
+@quiz_bp.route('/video/<int:video_id>/window', methods=['GET'])
+@token_required
+def get_video_window(current_user, video_id):
+    """
+    获取视频播放时间窗口内的随堂测验（播放器轮询使用）
+
+    查询参数:
+        start: 窗口起点（秒，含）
+        end: 窗口终点（秒，不含），默认 start + 30，窗口最长600秒
+
+    响应只含题目摘要（不含答案），支持 If-None-Match 条件请求。
+    """
+    start = request.args.get('start', 0.0, type=float)
+    end = request.args.get('end', start + DEFAULT_VIDEO_WINDOW, type=float)
+    if end < start:
+        return jsonify({
+            'success': False,
+            'message': 'end 不能小于 start'
+        }), 400
+    end = min(end, start + MAX_VIDEO_WINDOW)
+
+    try:
+        body, etag = question_bank.video_window(video_id, start, end)
+    except Exception as e:
+        print(f"获取视频随堂测验失败: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'获取视频随堂测验失败: {str(e)}'
+        }), 500
+
+    response = Response(body, status=200, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+@quiz_bp.route('/questions/<int:quiz_id>/similar', methods=['GET'])
+@token_required
+def get_similar_questions(current_user, quiz_id):
+    """
+    获取相似题（用于"练习相似题"）
+
+    查询参数:
+        limit: 返回数量（默认10，最大50）
+
+    相似关系由 scripts/build_similar_questions.py 离线预计算，接口直接从题库缓存读取。
+    """
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    try:
+        questions = question_bank.similar(quiz_id, limit)
+        return jsonify({
+            'success': True,
+            'data': questions
         }), 200
+    except Exception as e:
+        print(f"获取相似题失败: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'获取相似题失败: {str(e)}'
+        }), 500
+
 
 @quiz_bp.route('/submit', methods=['POST'])
 @token_required
+@idempotent
 def submit_quiz(current_user):
-    """提交答题"""
+    """
+    提交答题
+
+    客观题同步批改；主观题交给后台批改队列，立即返回submission_id，
+    前端通过 /submissions/<id> 轮询或 /submissions/<id>/events 订阅批改结果。
+    携带 Idempotency-Key 请求头重试时返回首次提交的结果，不会重复批改和计入统计。
+    """
     try:
         data = request.get_json()
         
@@ -55,139 +216,41 @@ def submit_quiz(current_user):
         objective_answers = data.get('answers', {}).get('objective', {})
         subjective_answers = data.get('answers', {}).get('subjective', {})
         
-        results = {
-            'objective': {},
-            'subjective': {},
-            'summary': {
-                'total_score': 0,
-                'objective_score': 0,
-                'subjective_score': 0,
-                'correct_count': 0,
-                'total_count': len(objective_answers) + len(subjective_answers)
-            }
-        }
-        
-        # 批改客观题
-        for q_id, answer in objective_answers.items():
-            try:
-                # 先尝试从数据库获取题目
-                try:
-                    question = Quiz.query.get(int(q_id))
-                except Exception as db_error:
-                    print(f"数据库查询题目 {q_id} 失败: {db_error}")
-                    question = None
-                
-                if question and question.type == 'objective':
-                    is_correct = (str(answer).upper() == question.answer)
-                    results['objective'][q_id] = {
-                        'user_answer': answer,
-                        'correct_answer': question.answer,
-                        'is_correct': is_correct,
-                        'explanation': question.explanation,
-                        'score': 10 if is_correct else 0
-                    }
-                    
-                    if is_correct:
-                        results['summary']['objective_score'] += 10
-                        results['summary']['correct_count'] += 1
-                else:
-                    # 如果数据库中没有题目，使用静态数据
-                    static_questions = get_static_objective_questions()
-                    for static_q in static_questions:
-                        if str(static_q['id']) == str(q_id):
-                            is_correct = (str(answer).upper() == static_q['answer'])
-                            results['objective'][q_id] = {
-                                'user_answer': answer,
-                                'correct_answer': static_q['answer'],
-                                'is_correct': is_correct,
-                                'explanation': static_q['explanation'],
-                                'score': 10 if is_correct else 0
-                            }
-                            
-                            if is_correct:
-                                results['summary']['objective_score'] += 10
-                                results['summary']['correct_count'] += 1
-                            break
-            except Exception as e:
-                print(f"批改客观题 {q_id} 失败: {e}")
-        
-        # 批改主观题
-        for q_id, answer in subjective_answers.items():
+        results = new_results(objective_answers, subjective_answers)
+        grade_objective_answers(objective_answers, results)
+
+        # 有主观题且启用异步批改时，先保存待批改记录再交给后台线程
+        if subjective_answers and grading_queue.enabled:
+            finalize_results(results)
             try:
-                # 先尝试从数据库获取题目
-                try:
-                    question = Quiz.query.get(int(q_id))
-                except Exception as db_error:
-                    print(f"数据库查询主观题 {q_id} 失败: {db_error}")
-                    question = None
-                
-                if question and question.type == 'subjective':
-                    # 调用BERT服务计算相似度
-                    try:
-                        bert_response = requests.post(
-                            'http://localhost:5001/api/similarity',
-                            json={
-                                'text1': answer,
-                                'text2': question.reference_answer
-                            },
-                            timeout=10
-                        )
-                        
-                        if bert_response.status_code == 200:
-                            bert_data = bert_response.json()
-                            similarity = bert_data.get('similarity', 0)
-                            score = round(similarity * 10, 2)
-                            feedback = bert_data.get('analysis', '')
-                        else:
-                            # 如果BERT服务响应错误，使用简单评分
-                            raise Exception("BERT服务响应错误")
-                    except Exception as bert_error:
-                        print(f"BERT服务不可用，使用简单评分: {bert_error}")
-                        # 如果BERT服务不可用，使用简单评分
-                        keywords = question.reference_answer.split()[:5]
-                        match_count = sum(1 for keyword in keywords if keyword in answer)
-                        score = min(10, match_count * 2)
-                        similarity = score / 10
-                        feedback = f'关键词匹配 {match_count}/{len(keywords)}'
-                    
-                    results['subjective'][q_id] = {
-                        'user_answer': answer,
-                        'reference_answer': question.reference_answer,
-                        'similarity': similarity,
-                        'score': score,
-                        'explanation': question.explanation,
-                        'feedback': feedback
-                    }
-                    
-                    results['summary']['subjective_score'] += score
-                else:
-                    # 如果数据库中没有题目，使用静态数据
-                    static_questions = get_static_subjective_questions()
-                    for static_q in static_questions:
-                        if str(static_q['id']) == str(q_id):
-                            # 简单的关键词匹配评分
-                            keywords = static_q['reference_answer'].split()[:5]
-                            match_count = sum(1 for keyword in keywords if keyword in answer)
-                            score = min(10, match_count * 2)
-                            similarity = score / 10
-                            feedback = f'关键词匹配 {match_count}/{len(keywords)}'
-                            
-                            results['subjective'][q_id] = {
-                                'user_answer': answer,
-                                'reference_answer': static_q['reference_answer'],
-                                'similarity': similarity,
-                                'score': score,
-                                'explanation': static_q['explanation'],
-                                'feedback': feedback
-                            }
-                            
-                            results['summary']['subjective_score'] += score
-                            break
-            except Exception as e:
-                print(f"批改主观题 {q_id} 失败: {e}")
-        
-        # 计算总分
-        results['summary']['total_score'] = results['summary']['objective_score'] + results['summary']['subjective_score']
+                submission = QuizSubmission(
+                    user_id=current_user.id,
+                    quiz_type='static',
+                    answers=json.dumps(data.get('answers', {})),
+                    score=results['summary']['total_score'],
+                    total_questions=results['summary']['total_count'],
+                    correct_questions=results['summary']['correct_count'],
+                    duration=data.get('duration', 0),
+                    detailed_results=json.dumps(results),
+                    status=QuizSubmission.STATUS_PENDING
+                )
+                db.session.add(submission)
+                db.session.commit()
+            except Exception as db_error:
+                print(f"保存待批改提交失败，改为同步批改: {db_error}")
+                db.session.rollback()
+            else:
+                grading_queue.enqueue(submission.id)
+                return jsonify({
+                    'success': True,
+                    'data': results,
+                    'submission_id': submission.id,
+                    'status': QuizSubmission.STATUS_PENDING,
+                    'message': '客观题已批改，主观题正在后台批改'
+                }), 202
+
+        grade_subjective_answers(subjective_answers, results)
+        finalize_results(results)
         
         # 尝试保存提交记录到数据库
         try:
@@ -195,41 +258,16 @@ def submit_quiz(current_user):
                 user_id=current_user.id,
                 quiz_type='static',
                 answers=json.dumps(data.get('answers', {})),
-                score=results['summary']['total_score'],
-                ai_feedback='自动批改完成',
-                similarity_score=results['summary']['subjective_score'] / len(subjective_answers) if subjective_answers else 0,
-                total_questions=results['summary']['total_count'],
-                correct_questions=results['summary']['correct_count'],
-                duration=data.get('duration', 0),
-                detailed_results=json.dumps(results),
-                graded_at=datetime.utcnow()
+                duration=data.get('duration', 0)
             )
+            apply_results_to_submission(submission, results, len(subjective_answers))
             db.session.add(submission)
             
             # 尝试更新用户统计
             try:
-                stats = QuizStatistics.query.filter_by(user_id=current_user.id, quiz_type='static').first()
-                if stats:
-                    stats.total_quizzes += 1
-                    stats.average_score = (stats.average_score * (stats.total_quizzes - 1) + results['summary']['total_score']) / stats.total_quizzes
-                    stats.best_score = max(stats.best_score, results['summary']['total_score'])
-                    stats.worst_score = min(stats.worst_score, results['summary']['total_score']) if stats.total_quizzes > 1 else results['summary']['total_score']
-                    stats.total_correct += results['summary']['correct_count']
-                    stats.total_questions += results['summary']['total_count']
-                else:
-                    # 如果不存在统计记录，创建新的
-                    stats = QuizStatistics(
-                        user_id=current_user.id,
-                        quiz_type='static',
-                        total_quizzes=1,
-                        average_score=results['summary']['total_score'],
-                        best_score=results['summary']['total_score'],
-                        worst_score=results['summary']['total_score'],
-                        total_correct=results['summary']['correct_count'],
-                        total_questions=results['summary']['total_count']
-                    )
-                    db.session.add(stats)
-                
+                db.session.flush()
+                record_answers(submission, results)
+                record_graded_submission(current_user.id, results)
                 db.session.commit()
                 
                 submission_id = submission.id
@@ -245,7 +283,8 @@ def submit_quiz(current_user):
         return jsonify({
             'success': True,
             'data': results,
-            'submission_id': submission_id
+            'submission_id': submission_id,
+            'status': QuizSubmission.STATUS_GRADED
         }), 200
         
     except Exception as e:
@@ -256,115 +295,809 @@ def submit_quiz(current_user):
             'message': f'提交答题失败: {str(e)}'
         }), 500
 
-# ==================== 辅助函数（静态数据备用） ====================
 
-def get_static_question_bank():
-    """获取静态题库数据"""
-    return {
-        "objective": get_static_objective_questions(),
-        "subjective": get_static_subjective_questions()
-    }
+@quiz_bp.route('/next', methods=['GET'])
+@token_required
+def get_next_question(current_user):
+    """
+    自适应推荐下一道题
+
+    查询参数:
+        type: objective | subjective | all
+        knowledge_point: 指定知识点（默认自动选择掌握度最低的知识点）
 
-def get_static_objective_questions():
-    """获取静态客观题数据"""
-    return [
-        {
-            "id": 1,
-            "anchor": "obj1",
-            "question": "Python定义函数的关键字是？",
-            "options": [
-                {"label": "A", "text": "def"},
-                {"label": "B", "text": "function"},
-                {"label": "C", "text": "func"},
-                {"label": "D", "text": "define"}
-            ],
-            "answer": "A",
-            "knowledge_point": "Python基础语法",
-            "explanation": "Python中使用def（definition的缩写）关键字定义函数，function/func/define均不是Python的内置关键字。"
-        },
-        {
-            "id": 2,
-            "anchor": "obj2",
-            "question": "以下哪个不是Python的数据类型？",
-            "options": [
-                {"label": "A", "text": "list"},
-                {"label": "B", "text": "dict"},
-                {"label": "C", "text": "array"},
-                {"label": "D", "text": "tuple"}
-            ],
-            "answer": "C",
-            "knowledge_point": "Python数据类型",
-            "explanation": "Python内置数据类型包括list、dict、tuple等，但没有array类型，array属于numpy库。"
-        },
-        {
-            "id": 3,
-            "anchor": "obj3",
-            "question": "Python中用于读取文件内容的方法是？",
-            "options": [
-                {"label": "A", "text": "open()"},
-                {"label": "B", "text": "read()"},
-                {"label": "C", "text": "write()"},
-                {"label": "D", "text": "close()"}
-            ],
-            "answer": "B",
-            "knowledge_point": "Python文件操作",
-            "explanation": "open()用于打开文件，read()用于读取文件内容，write()用于写入，close()用于关闭文件。"
-        },
-        {
-            "id": 4,
-            "anchor": "obj4",
-            "question": "Python中哪个关键字用于异常处理？",
-            "options": [
-                {"label": "A", "text": "try"},
-                {"label": "B", "text": "catch"},
-                {"label": "C", "text": "exception"},
-                {"label": "D", "text": "error"}
-            ],
-            "answer": "A",
-            "knowledge_point": "Python异常处理",
-            "explanation": "Python使用try-except-finally结构处理异常，catch是其他语言的关键字。"
-        },
+    优先推荐薄弱知识点，难度随该知识点掌握度提高。
+    """
+    question_type = request.args.get('type', 'all')
+    if question_type not in ('objective', 'subjective'):
+        question_type = 'all'
+
+    try:
+        selected = adaptive_engine.next_question(
+            current_user.id, question_type, request.args.get('knowledge_point') or None
+        )
+    except Exception as e:
+        print(f"自适应选题失败: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'选题失败: {str(e)}'
+        }), 500
+
+    if not selected:
+        return jsonify({
+            'success': False,
+            'message': '没有可推荐的题目'
+        }), 404
+
+    return jsonify({
+        'success': True,
+        'data': selected
+    }), 200
+
+
+@quiz_bp.route('/statistics', methods=['GET'])
+@token_required
+def get_statistics(current_user):
+    """获取测验统计（总体成绩、知识点/难度分布和弱项），教师可通过user_id查看学生"""
+    user_id = request.args.get('user_id', type=int) or current_user.id
+    if user_id != current_user.id and not _is_teacher(current_user):
+        return jsonify({
+            'success': False,
+            'message': '没有权限查看该用户的统计'
+        }), 403
+
+    quiz_type = request.args.get('quiz_type', 'static')
+    stats = QuizStatistics.query.filter_by(user_id=user_id, quiz_type=quiz_type).first()
+    return jsonify({
+        'success': True,
+        'data': stats.to_dict() if stats else None
+    }), 200
+
+
+@quiz_bp.route('/mastery', methods=['GET'])
+@token_required
+def get_mastery(current_user):
+    """获取各知识点掌握概率（贝叶斯知识追踪，按掌握概率升序），教师可通过user_id查看学生"""
+    user_id = request.args.get('user_id', type=int) or current_user.id
+    if user_id != current_user.id and not _is_teacher(current_user):
+        return jsonify({
+            'success': False,
+            'message': '没有权限查看该用户的掌握情况'
+        }), 403
+
+    rows = KnowledgeMastery.query.filter_by(user_id=user_id).order_by(KnowledgeMastery.p_mastery).all()
+    knowledge_points = []
+    for row in rows:
+        item = row.to_dict()
+        item['mastered'] = row.p_mastery >= MASTERY_THRESHOLD
+        knowledge_points.append(item)
+
+    return jsonify({
+        'success': True,
+        'data': {
+            'user_id': user_id,
+            'knowledge_points': knowledge_points,
+            'mastered_count': sum(1 for item in knowledge_points if item['mastered']),
+            'threshold': MASTERY_THRESHOLD
+        }
+    }), 200
+
+
+@quiz_bp.route('/mastery/class', methods=['GET'])
+@token_required
+def get_class_mastery(current_user):
+    """
+    按知识点汇总一组学生的掌握情况（仅教师）
+
+    查询参数:
+        course_id: 课程ID（学习过该课程视频的学生）
+        user_ids: 逗号分隔的学生ID（与course_id二选一，都不传时汇总全部学生）
+    """
+    if not _is_teacher(current_user):
+        return jsonify({
+            'success': False,
+            'message': '没有权限查看班级掌握情况'
+        }), 403
+
+    query = db.session.query(
+        KnowledgeMastery.knowledge_point,
+        func.count(KnowledgeMastery.id),
+        func.avg(KnowledgeMastery.p_mastery),
+        func.min(KnowledgeMastery.p_mastery),
+        func.sum(case((KnowledgeMastery.p_mastery >= MASTERY_THRESHOLD, 1), else_=0)),
+        func.sum(KnowledgeMastery.attempts)
+    )
+
+    course_id = request.args.get('course_id', type=int)
+    user_ids = request.args.get('user_ids')
+    if course_id:
+        students = db.session.query(UserProgress.user_id).join(
+            Video, Video.id == UserProgress.video_id
+        ).filter(Video.course_id == course_id).distinct()
+        query = query.filter(KnowledgeMastery.user_id.in_(students))
+    elif user_ids:
+        try:
+            ids = [int(value) for value in user_ids.split(',') if value.strip()]
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'user_ids 格式错误'
+            }), 400
+        query = query.filter(KnowledgeMastery.user_id.in_(ids))
+
+    knowledge_points = [
         {
-            "id": 5,
-            "anchor": "obj5",
-            "question": "Python中如何创建空列表？",
-            "options": [
-                {"label": "A", "text": "[]"},
-                {"label": "B", "text": "list()"},
-                {"label": "C", "text": "{}"},
-                {"label": "D", "text": "()"}
-            ],
-            "answer": "A",
-            "knowledge_point": "Python列表",
-            "explanation": "[]是创建空列表的最简方式，list()也可以创建空列表，但[]更常用。"
+            'knowledge_point': knowledge_point,
+            'students': students_count,
+            'average_mastery': round(average or 0.0, 4),
+            'min_mastery': round(minimum or 0.0, 4),
+            'mastered_students': int(mastered or 0),
+            'attempts': int(attempts or 0)
         }
+        for knowledge_point, students_count, average, minimum, mastered, attempts
+        in query.group_by(KnowledgeMastery.knowledge_point).order_by(func.avg(KnowledgeMastery.p_mastery))
     ]
 
-def get_static_subjective_questions():
-    """获取静态主观题数据"""
-    return [
-        {
-            "id": 101,
-            "anchor": "sub1",
-            "question": "简述Python列表与元组的区别",
-            "reference_answer": "列表是可变序列（可增删改元素），用[]表示；元组是不可变序列，用()表示。列表适合存储需要修改的数据，元组适合存储固定不变的数据。",
-            "knowledge_point": "Python序列类型",
-            "explanation": "1. 可变性：列表可变（mutable），元组不可变（immutable）；2. 语法：列表用[]，元组用()；3. 性能：元组因不可变，遍历/访问速度略快；4. 用途：列表适合动态修改数据，元组适合存储固定不变的数据（如配置项）。"
-        },
-        {
-            "id": 102,
-            "anchor": "sub2",
-            "question": "解释Python中的装饰器是什么",
-            "reference_answer": "装饰器是一种函数，用于修改其他函数的行为，在不改变原函数代码的情况下增加功能。它接收函数作为参数并返回新函数。",
-            "knowledge_point": "Python高级特性",
-            "explanation": "装饰器是Python的高级特性，本质是接收函数作为参数并返回新函数的函数。常用于日志记录、性能测试、事务处理、缓存等场景。"
-        },
-        {
-            "id": 103,
-            "anchor": "sub3",
-            "question": "什么是Python的生成器？",
-            "reference_answer": "生成器是一种特殊的迭代器，使用yield关键字返回值，可以按需生成值而不是一次性生成所有值，节省内存。",
-            "knowledge_point": "Python迭代器和生成器",
-            "explanation": "生成器使用yield语句，每次产生一个值后暂停执行，下次从暂停处继续。与普通函数不同，生成器函数返回一个生成器对象，而不是一次性返回所有结果。"
+    return jsonify({
+        'success': True,
+        'data': {
+            'knowledge_points': knowledge_points,
+            'threshold': MASTERY_THRESHOLD
+        }
+    }), 200
+
+
+@quiz_bp.route('/submissions', methods=['GET'])
+@token_required
+def list_submissions(current_user):
+    """
+    获取提交历史（按提交时间倒序）
+
+    查询参数:
+        user_id: 教师查看指定学生的提交，默认当前用户
+        quiz_type / status: 可选筛选条件
+        limit: 每页数量（默认50，最大200）
+        cursor: 上一页返回的 next_cursor
+
+    只加载摘要列，answers/detailed_results 等大字段不读取；
+    单条提交的详情通过 /submissions/<id> 获取。
+    """
+    user_id = request.args.get('user_id', type=int) or current_user.id
+    if user_id != current_user.id and not _is_teacher(current_user):
+        return jsonify({
+            'success': False,
+            'message': '没有权限查看该用户的提交记录'
+        }), 403
+
+    cursor = request.args.get('cursor')
+    try:
+        after = _parse_submission_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': '无效的分页游标'
+        }), 400
+
+    try:
+        limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        query = QuizSubmission.query.options(load_only(
+            QuizSubmission.id, QuizSubmission.quiz_id, QuizSubmission.quiz_type,
+            QuizSubmission.score, QuizSubmission.total_questions, QuizSubmission.correct_questions,
+            QuizSubmission.duration, QuizSubmission.status,
+            QuizSubmission.submitted_at, QuizSubmission.graded_at
+        )).filter(QuizSubmission.user_id == user_id)
+
+        quiz_type = request.args.get('quiz_type')
+        if quiz_type:
+            query = query.filter(QuizSubmission.quiz_type == quiz_type)
+        status = request.args.get('status')
+        if status:
+            query = query.filter(QuizSubmission.status == status)
+        if after:
+            submitted_at, submission_id = after
+            query = query.filter(or_(
+                QuizSubmission.submitted_at < submitted_at,
+                and_(QuizSubmission.submitted_at == submitted_at, QuizSubmission.id < submission_id)
+            ))
+
+        # 多取一条判断是否还有下一页
+        rows = query.order_by(
+            QuizSubmission.submitted_at.desc(), QuizSubmission.id.desc()
+        ).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        return jsonify({
+            'success': True,
+            'data': [row.to_summary_dict() for row in rows],
+            'pagination': {
+                'limit': limit,
+                'count': len(rows),
+                'has_more': has_more,
+                'next_cursor': _submission_cursor(rows[-1]) if has_more else None
+            }
+        }), 200
+    except Exception as e:
+        print(f"获取提交历史失败: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'获取提交历史失败: {str(e)}'
+        }), 500
+
+
+def _submission_cursor(submission):
+    """提交历史分页游标：提交时间与ID"""
+    return f"{submission.submitted_at.isoformat()}_{submission.id}"
+
+
+def _parse_submission_cursor(cursor):
+    submitted_at, _, submission_id = cursor.rpartition('_')
+    return datetime.fromisoformat(submitted_at), int(submission_id)
+
+
+@quiz_bp.route('/questions/import', methods=['POST'])
+@token_required
+def import_question_file(current_user):
+    """
+    批量导入题目（仅教师），与现有题库做近似重复检测，整个文件一个事务
+
+    请求体为 multipart 文件字段 file，或直接以请求体上传文件内容。
+    查询参数:
+        format: jsonl | json | csv | xlsx（默认按文件扩展名判断）
+        threshold: 判定重复的相似度阈值（默认0.8）
+        dry_run: 为1时只校验和查重，不写入
+    """
+    if not _is_teacher(current_user):
+        return jsonify({
+            'success': False,
+            'message': '只有教师可以导入题目'
+        }), 403
+
+    upload = request.files.get('file')
+    raw = upload.stream if upload else request.stream
+    fmt = question_import.detect_format(upload.filename if upload else None, request.args.get('format'))
+    if not fmt:
+        return jsonify({
+            'success': False,
+            'message': '无法识别文件格式，请通过format参数指定 jsonl、json、csv 或 xlsx'
+        }), 400
+
+    threshold = request.args.get('threshold', question_import.DEFAULT_DUPLICATE_THRESHOLD, type=float)
+    if not 0 < threshold <= 1:
+        return jsonify({
+            'success': False,
+            'message': 'threshold 应在 (0, 1] 之间'
+        }), 400
+
+    try:
+        report = question_import.import_questions(
+            db.session, question_import.iter_question_rows(raw, fmt),
+            threshold=threshold, dry_run=request.args.get('dry_run') == '1'
+        )
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        print(f"导入题目失败: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'导入题目失败: {str(e)}'
+        }), 500
+
+    return jsonify({
+        'success': True,
+        'data': report,
+        'message': f"导入 {report['imported']} 道题，重复 {report['duplicate_count']} 道，错误 {report['error_count']} 行"
+    }), 200
+
+
+@quiz_bp.route('/bulk-grade', methods=['POST'])
+@token_required
+def bulk_grade_upload(current_user):
+    """
+    批量导入答题表并批改（仅教师），以NDJSON流式返回进度
+
+    请求体为 multipart 文件字段 file，或直接以请求体上传文件内容。
+    查询参数:
+        format: jsonl | csv（默认按文件扩展名判断）
+        quiz_type: 写入提交记录的测验类型（默认static）
+        batch_size: 每批学生数（默认200，最大1000）
+    """
+    if not _is_teacher(current_user):
+        return jsonify({
+            'success': False,
+            'message': '只有教师可以批量批改'
+        }), 403
+
+    upload = request.files.get('file')
+    raw = upload.stream if upload else request.stream
+    fmt = detect_format(upload.filename if upload else None, request.args.get('format'))
+    if not fmt:
+        return jsonify({
+            'success': False,
+            'message': '无法识别文件格式，请通过format参数指定 jsonl 或 csv'
+        }), 400
+
+    quiz_type = request.args.get('quiz_type', 'static')
+    batch_size = request.args.get('batch_size', DEFAULT_BATCH_SIZE, type=int)
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+
+    def generate():
+        stream = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+        try:
+            for progress in bulk_grade(iter_answer_rows(stream, fmt), quiz_type, batch_size):
+                yield json.dumps(progress, ensure_ascii=False) + '\n'
+        except Exception as e:
+            print(f"批量批改异常: {e}")
+            yield json.dumps({'event': 'error', 'message': f'批量批改中断: {str(e)}'}, ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@quiz_bp.route('/exams', methods=['POST'])
+@token_required
+def create_exam(current_user):
+    """
+    创建考试场次（仅教师）
+
+    请求体:
+        title: 考试名称
+        question_ids: {"objective": [...], "subjective": [...]}
+        seed: 题目乱序种子（可选，默认随机生成）
+        starts_at / ends_at: ISO格式时间（可选，UTC）
+        duration: 考试时长（秒，可选）
+    """
+    if not _is_teacher(current_user):
+        return jsonify({
+            'success': False,
+            'message': '只有教师可以创建考试'
+        }), 403
+
+    data = request.get_json() or {}
+    question_ids = data.get('question_ids') or {}
+    if not data.get('title') or not isinstance(question_ids, dict):
+        return jsonify({
+            'success': False,
+            'message': '考试名称和题目列表不能为空'
+        }), 400
+
+    cleaned = {}
+    for question_type in ('objective', 'subjective'):
+        ids = question_ids.get(question_type) or []
+        missing = [q_id for q_id in ids if not question_bank.get(q_id, question_type)]
+        if missing:
+            return jsonify({
+                'success': False,
+                'message': f'题目不存在: {question_type} {missing}'
+            }), 400
+        cleaned[question_type] = [int(q_id) for q_id in ids]
+    if not any(cleaned.values()):
+        return jsonify({
+            'success': False,
+            'message': '考试名称和题目列表不能为空'
+        }), 400
+
+    try:
+        starts_at = datetime.fromisoformat(data['starts_at']) if data.get('starts_at') else None
+        ends_at = datetime.fromisoformat(data['ends_at']) if data.get('ends_at') else None
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'message': '时间格式错误，请使用ISO格式'
+        }), 400
+
+    try:
+        exam = ExamSession(
+            title=data['title'],
+            created_by=current_user.id,
+            question_ids=json.dumps(cleaned),
+            seed=str(data.get('seed') or secrets.token_hex(8)),
+            starts_at=starts_at,
+            ends_at=ends_at,
+            duration=data.get('duration')
+        )
+        db.session.add(exam)
+        db.session.commit()
+        return jsonify({
+            'success': True,
+            'data': exam.to_dict()
+        }), 201
+    except Exception as e:
+        db.session.rollback()
+        print(f"创建考试失败: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'创建考试失败: {str(e)}'
+        }), 500
+
+
+@quiz_bp.route('/exams/<int:exam_id>/paper', methods=['GET'])
+@token_required
+def get_exam_paper(current_user, exam_id):
+    """获取考试试卷（每场考试只渲染一次，按学生确定性乱序，不含答案，不写数据库）"""
+    exam = exam_papers.get(exam_id)
+    if exam is None:
+        return jsonify({
+            'success': False,
+            'message': '考试不存在'
+        }), 404
+    if not exam.is_open() and not _is_teacher(current_user):
+        return jsonify({
+            'success': False,
+            'message': '不在考试时间内'
+        }), 403
+
+    return Response(exam.paper_for(current_user.id), status=200, mimetype='application/json')
+
+
+@quiz_bp.route('/exams/<int:exam_id>/answers', methods=['PUT'])
+@token_required
+def autosave_exam_answers(current_user, exam_id):
+    """自动保存考试作答（写入内存缓冲区，后台批量落库）"""
+    exam = exam_papers.get(exam_id)
+    if exam is None:
+        return jsonify({
+            'success': False,
+            'message': '考试不存在'
+        }), 404
+    if not exam.is_open():
+        return jsonify({
+            'success': False,
+            'message': '不在考试时间内'
+        }), 403
+
+    answers = (request.get_json() or {}).get('answers')
+    if not isinstance(answers, dict):
+        return jsonify({
+            'success': False,
+            'message': '答题数据格式错误'
+        }), 400
+
+    draft_buffer.save(exam_id, current_user.id, answers)
+    return jsonify({
+        'success': True,
+        'message': '已保存'
+    }), 202
+
+
+@quiz_bp.route('/exams/<int:exam_id>/answers', methods=['GET'])
+@token_required
+def get_exam_answers(current_user, exam_id):
+    """获取考试作答草稿（刷新页面或断线后恢复）"""
+    if exam_papers.get(exam_id) is None:
+        return jsonify({
+            'success': False,
+            'message': '考试不存在'
+        }), 404
+
+    return jsonify({
+        'success': True,
+        'data': draft_buffer.get(exam_id, current_user.id)
+    }), 200
+
+
+@quiz_bp.route('/reviews/due', methods=['GET'])
+@token_required
+def get_due_reviews(current_user):
+    """
+    获取到期的错题复习（按到期时间排序）
+
+    查询参数:
+        limit: 返回数量（默认20，最大100）
+    """
+    limit = min(max(request.args.get('limit', DEFAULT_REVIEW_LIMIT, type=int), 1), MAX_REVIEW_LIMIT)
+    now = datetime.utcnow()
+
+    # (user_id, due_at) 索引范围扫描
+    items = ReviewItem.query.filter(
+        ReviewItem.user_id == current_user.id,
+        ReviewItem.due_at <= now
+    ).order_by(ReviewItem.due_at, ReviewItem.id).limit(limit).all()
+
+    reviews = []
+    for item in items:
+        question = question_bank.get(item.quiz_id, item.question_type)
+        if not question:
+            continue
+        review = item.to_dict()
+        review['question'] = {
+            k: v for k, v in question.items()
+            if k not in ('answer', 'reference_answer', 'explanation', 'lexical_vector')
+        }
+        reviews.append(review)
+
+    due_count = ReviewItem.query.filter(
+        ReviewItem.user_id == current_user.id,
+        ReviewItem.due_at <= now
+    ).count()
+    total_count = ReviewItem.query.filter_by(user_id=current_user.id).count()
+
+    return jsonify({
+        'success': True,
+        'data': {
+            'reviews': reviews,
+            'due_count': due_count,
+            'total_count': total_count
+        }
+    }), 200
+
+
+@quiz_bp.route('/reviews/<int:item_id>', methods=['POST'])
+@token_required
+def submit_review(current_user, item_id):
+    """
+    提交一道错题的复习结果
+
+    请求体（二选一）:
+        quality: 自评质量 0-5
+        answer: 重新作答，由系统批改后换算为质量评分
+    """
+    item = ReviewItem.query.filter_by(id=item_id, user_id=current_user.id).first()
+    if item is None:
+        return jsonify({
+            'success': False,
+            'message': '错题不存在'
+        }), 404
+
+    data = request.get_json() or {}
+    answer = data.get('answer')
+    result = None
+    if 'quality' in data:
+        try:
+            quality = int(data['quality'])
+        except (TypeError, ValueError):
+            quality = -1
+        if not 0 <= quality <= 5:
+            return jsonify({
+                'success': False,
+                'message': 'quality 必须是 0-5 的整数'
+            }), 400
+    elif answer is not None:
+        question = question_bank.get(item.quiz_id, item.question_type)
+        if not question:
+            return jsonify({
+                'success': False,
+                'message': '题目不存在'
+            }), 404
+        if item.question_type == 'objective':
+            is_correct = str(answer).upper() == question['answer']
+            score = QUESTION_SCORE if is_correct else 0
+            result = {
+                'is_correct': is_correct,
+                'correct_answer': question['answer'],
+                'explanation': question.get('explanation')
+            }
+        else:
+            similarity, score, feedback = score_subjective_answer(answer, question)
+            is_correct = None
+            result = {
+                'similarity': similarity,
+                'score': score,
+                'feedback': feedback,
+                'reference_answer': question.get('reference_answer')
+            }
+        quality = quality_from_outcome(item.question_type, is_correct, score, QUESTION_SCORE)
+    else:
+        return jsonify({
+            'success': False,
+            'message': '请提供 quality 或 answer'
+        }), 400
+
+    try:
+        apply_review(item, quality, answer)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"保存复习结果失败: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'保存复习结果失败: {str(e)}'
+        }), 500
+
+    return jsonify({
+        'success': True,
+        'data': {
+            'item': item.to_dict(),
+            'quality': quality,
+            'result': result
+        }
+    }), 200
+
+
+@quiz_bp.route('/items/analysis', methods=['GET'])
+@token_required
+def get_item_analysis(current_user):
+    """
+    题目分析统计（仅教师）
+
+    查询参数:
+        type: objective | subjective
+        quiz_id: 指定题目
+        sort: discrimination | p_value | responses（默认区分度升序，问题题目在前）
+        flagged: 为1时只返回有质量提示的题目
+        limit: 返回数量（默认50，最大200）
+    """
+    if not _is_teacher(current_user):
+        return jsonify({
+            'success': False,
+            'message': '没有权限查看题目分析'
+        }), 403
+
+    query = QuizItemStats.query
+    question_type = request.args.get('type')
+    if question_type in ('objective', 'subjective'):
+        query = query.filter(QuizItemStats.question_type == question_type)
+    quiz_id = request.args.get('quiz_id', type=int)
+    if quiz_id:
+        query = query.filter(QuizItemStats.quiz_id == quiz_id)
+
+    sort = request.args.get('sort', 'discrimination')
+    if sort == 'responses':
+        query = query.order_by(QuizItemStats.responses.desc())
+    elif sort == 'p_value':
+        query = query.order_by(QuizItemStats.p_value)
+    else:
+        query = query.order_by(QuizItemStats.discrimination)
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    flagged_only = request.args.get('flagged') == '1'
+
+    items = []
+    for stats in query.yield_per(500):
+        item = stats.to_dict()
+        question = question_bank.get(stats.quiz_id, stats.question_type) or {}
+        option_labels = [
+            option.get('label') for option in question.get('options') or []
+            if isinstance(option, dict) and option.get('label')
+        ]
+        item['flags'] = item_flags(item, option_labels)
+        if flagged_only and not item['flags']:
+            continue
+        item['question'] = question.get('question')
+        item['knowledge_point'] = question.get('knowledge_point')
+        item['correct_answer'] = question.get('answer')
+        items.append(item)
+        if len(items) >= limit:
+            break
+
+    return jsonify({
+        'success': True,
+        'data': items
+    }), 200
+
+
+@quiz_bp.route('/items/analysis/refresh', methods=['POST'])
+@token_required
+def refresh_item_analysis(current_user):
+    """增量合并新作答到题目分析统计（仅教师）"""
+    if not _is_teacher(current_user):
+        return jsonify({
+            'success': False,
+            'message': '没有权限更新题目分析'
+        }), 403
+
+    try:
+        result = update_item_statistics(db.session)
+    except Exception as e:
+        db.session.rollback()
+        print(f"更新题目分析失败: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'更新题目分析失败: {str(e)}'
+        }), 500
+
+    return jsonify({
+        'success': True,
+        'data': result
+    }), 200
+
+
+@quiz_bp.route('/grading/metrics', methods=['GET'])
+@token_required
+def get_grading_metrics(current_user):
+    """批改运行指标（评分缓存命中率、待批改数量），仅教师可查看"""
+    if not _is_teacher(current_user):
+        return jsonify({
+            'success': False,
+            'message': '没有权限查看批改指标'
+        }), 403
+
+    return jsonify({
+        'success': True,
+        'data': {
+            'grade_cache': grade_cache.stats(),
+            'pending_submissions': grading_queue.pending_count()
         }
-    ]
\ No newline at end of file
+    }), 200
+
+
+def _is_teacher(user):
+    """教师或管理员可以查看其他学生的提交"""
+    role_name = user.role.name if user.role else None
+    return bool(user.is_teacher or role_name in ('teacher', 'admin'))
+
+
+def _get_visible_submission(current_user, submission_id):
+    """获取当前用户有权查看的提交记录"""
+    submission = QuizSubmission.query.get(submission_id)
+    if not submission:
+        return None
+    if submission.user_id != current_user.id and not _is_teacher(current_user):
+        return None
+    return submission
+
+
+@quiz_bp.route('/submissions/<int:submission_id>', methods=['GET'])
+@token_required
+def get_submission(current_user, submission_id):
+    """查询提交记录及批改状态（轮询接口）"""
+    submission = _get_visible_submission(current_user, submission_id)
+    if not submission:
+        return jsonify({
+            'success': False,
+            'message': '提交记录不存在'
+        }), 404
+
+    # 服务重启后首次查询时恢复未完成的批改任务
+    if submission.status in (QuizSubmission.STATUS_PENDING, QuizSubmission.STATUS_GRADING) and grading_queue.enabled:
+        grading_queue.ensure_started()
+
+    return jsonify({
+        'success': True,
+        'data': submission.to_dict()
+    }), 200
+
+
+@quiz_bp.route('/submissions/<int:submission_id>/events', methods=['GET'])
+@token_required
+def stream_submission(current_user, submission_id):
+    """以SSE推送提交的批改状态，批改完成或失败后结束"""
+    submission = _get_visible_submission(current_user, submission_id)
+    if not submission:
+        return jsonify({
+            'success': False,
+            'message': '提交记录不存在'
+        }), 404
+
+    if grading_queue.enabled:
+        grading_queue.ensure_started()
+
+    def generate():
+        notifier = grading_queue.notifier
+        deadline = time.monotonic() + 300
+        last_status = None
+        last_sent = time.monotonic()
+        version = notifier.version(submission_id)
+
+        while True:
+            current = QuizSubmission.query.get(submission_id)
+            if current is None:
+                # 推送期间提交记录被删除
+                yield format_sse({'id': submission_id, 'status': 'gone'}, event='gone')
+                return
+            status = current.status or QuizSubmission.STATUS_GRADED
+
+            if status != last_status:
+                last_status = status
+                if status in (QuizSubmission.STATUS_GRADED, QuizSubmission.STATUS_FAILED):
+                    yield format_sse(current.to_dict(), event=status)
+                    return
+                yield format_sse({'id': submission_id, 'status': status}, event='status')
+                last_sent = time.monotonic()
+
+            if time.monotonic() >= deadline:
+                yield format_sse({'id': submission_id, 'status': status}, event='timeout')
+                return
+
+            # 等待期间释放数据库连接；本进程批改完成时立即唤醒，多进程部署时退化为每2秒查询一次
+            db.session.close()
+            new_version = notifier.wait(submission_id, version, timeout=2)
+            if new_version == version and time.monotonic() - last_sent >= 15:
+                yield sse_keepalive()
+                last_sent = time.monotonic()
+            version = new_version
+
+    return sse_response(generate())
@@ -0,0 +1,96 @@
+"""
+将历史提交的 detailed_results 拆分回填到 quiz_answers 表
+按提交ID分批流式读取（只取需要的列），已有结果行的提交自动跳过，可重复执行或中断后续跑。
+
+用法:
+    python scripts/backfill_quiz_answers.py [--batch-size 500] [--start-id 0]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# 添加backend目录到Python路径
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import insert
+
+from app import create_app
+from db_instance import db
+from models import QuizSubmission, QuizAnswer
+from services.quiz_answers import build_answer_rows
+
+
+def backfill(batch_size=500, start_id=0):
+    """
+    分批回填单题结果
+
+    Returns:
+        tuple: (处理的提交数, 写入的结果行数)
+    """
+    last_id = start_id
+    submissions = 0
+    inserted = 0
+    started = time.perf_counter()
+
+    while True:
+        batch = db.session.query(
+            QuizSubmission.id, QuizSubmission.user_id,
+            QuizSubmission.detailed_results, QuizSubmission.submitted_at
+        ).filter(
+            QuizSubmission.id > last_id,
+            QuizSubmission.status == QuizSubmission.STATUS_GRADED,
+            QuizSubmission.detailed_results.isnot(None)
+        ).order_by(QuizSubmission.id).limit(batch_size).all()
+        if not batch:
+            break
+
+        last_id = batch[-1].id
+        done = {
+            submission_id for (submission_id,) in db.session.query(QuizAnswer.submission_id).filter(
+                QuizAnswer.submission_id.in_([row.id for row in batch])
+            ).distinct()
+        }
+
+        rows = []
+        for row in batch:
+            if row.id in done:
+                continue
+            try:
+                results = json.loads(row.detailed_results)
+            except ValueError:
+                print(f"⚠️ 提交 {row.id} 的批改结果无法解析，已跳过")
+                continue
+            rows.extend(build_answer_rows(row.id, row.user_id, results, row.submitted_at))
+
+        if rows:
+            db.session.execute(insert(QuizAnswer), rows)
+        db.session.commit()
+        # 释放本批对象，避免长时间运行时内存增长
+        db.session.expunge_all()
+
+        submissions += len(batch)
+        inserted += len(rows)
+        elapsed = time.perf_counter() - started
+        print(f"  已处理提交 {submissions} 条（至ID {last_id}），写入 {inserted} 行，用时 {elapsed:.1f} 秒")
+
+    return submissions, inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回填 quiz_answers 单题结果表')
+    parser.add_argument('--batch-size', type=int, default=500, help='每批处理的提交数')
+    parser.add_argument('--start-id', type=int, default=0, help='从该提交ID之后开始处理')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        submissions, inserted = backfill(args.batch_size, args.start_id)
+        print(f"✅ 回填完成：处理提交 {submissions} 条，写入单题结果 {inserted} 行")
+
+
+if __name__ == '__main__':
+    main()
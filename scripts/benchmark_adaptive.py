@@ -0,0 +1,120 @@
+"""
+自适应选题引擎基准测试（不依赖数据库）
+生成合成题库和学生掌握度，多线程模拟学生并发"选题 + 提交"，
+输出选题吞吐量和延迟分位数，并与逐题扫描的朴素实现对比。
+
+用法:
+    python scripts/benchmark_adaptive.py [--questions 100000] [--learners 10000] [--threads 16] [--rounds 20]
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+# 添加backend目录到Python路径
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from services.adaptive import AdaptiveIndex, MasteryStore, select_question
+
+
+def build_questions(count, knowledge_points, rng):
+    for quiz_id in range(1, count + 1):
+        yield {
+            'id': quiz_id,
+            'type': 'objective' if rng.random() < 0.8 else 'subjective',
+            'knowledge_point': f'知识点{rng.randrange(knowledge_points)}',
+            'difficulty': rng.randint(1, 5)
+        }
+
+
+def scan_select(questions, store, learner):
+    """朴素实现：每次遍历全部题目，找最弱知识点中难度最接近的题"""
+    weakest = min({q['knowledge_point'] for q in questions}, key=lambda kp: store.mastery(learner, kp))
+    target = 1 + store.mastery(learner, weakest) * 4
+    return min(
+        (q for q in questions if q['knowledge_point'] == weakest),
+        key=lambda q: abs(q['difficulty'] - target)
+    )
+
+
+def percentile(sorted_values, ratio):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * ratio))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='自适应选题基准测试')
+    parser.add_argument('--questions', type=int, default=100000, help='题目数量')
+    parser.add_argument('--knowledge-points', type=int, default=200, help='知识点数量')
+    parser.add_argument('--learners', type=int, default=10000, help='学生数量')
+    parser.add_argument('--threads', type=int, default=16, help='并发线程数')
+    parser.add_argument('--rounds', type=int, default=20, help='每个学生的选题次数')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    questions = list(build_questions(args.questions, args.knowledge_points, rng))
+
+    started = time.perf_counter()
+    index = AdaptiveIndex('bench', questions)
+    print(f"构建索引: {len(questions)} 道题, {len(index.buckets)} 个桶, 用时 {time.perf_counter() - started:.2f} 秒")
+
+    store = MasteryStore(max_learners=args.learners)
+    started = time.perf_counter()
+    for user_id in range(args.learners):
+        initial = {
+            f'知识点{kp}': rng.random()
+            for kp in rng.sample(range(args.knowledge_points), k=min(20, args.knowledge_points))
+        }
+        store.learner(user_id, lambda _, values=initial: values)
+    vector_bytes = sum(
+        learner.vector.itemsize * len(learner.vector) for learner in store._learners.values()
+    )
+    print(f"初始化学生: {args.learners} 人, 掌握度向量共 {vector_bytes / 1024 / 1024:.1f} MB, "
+          f"用时 {time.perf_counter() - started:.2f} 秒")
+
+    # 每个线程负责一部分学生，每轮为学生选一道题并模拟作答结果
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    def worker(thread_no):
+        local_rng = random.Random(args.seed + thread_no)
+        local = []
+        user_ids = range(thread_no, args.learners, args.threads)
+        for _ in range(args.rounds):
+            for user_id in user_ids:
+                learner = store.learner(user_id)
+                t0 = time.perf_counter()
+                selected = select_question(index, store, learner, rng=local_rng)
+                local.append(time.perf_counter() - t0)
+                store.observe(user_id, [(selected[2], 1.0 if local_rng.random() < 0.6 else 0.0)])
+        with latencies_lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"索引选题: {len(latencies)} 次, {args.threads} 线程, 用时 {elapsed:.2f} 秒, "
+          f"吞吐 {len(latencies) / elapsed:,.0f} 次/秒")
+    print(f"  延迟 p50={percentile(latencies, 0.5) * 1e6:.0f}µs "
+          f"p95={percentile(latencies, 0.95) * 1e6:.0f}µs "
+          f"p99={percentile(latencies, 0.99) * 1e6:.0f}µs")
+
+    samples = 20
+    started = time.perf_counter()
+    for user_id in range(samples):
+        scan_select(questions, store, store.learner(user_id))
+    per_scan = (time.perf_counter() - started) / samples
+    print(f"朴素扫描: 每次 {per_scan * 1e3:.1f}ms（索引选题 p50 的 {per_scan / percentile(latencies, 0.5):,.0f} 倍）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+重建主观题参考答案的词法TF-IDF向量
+新增或修改的题目在保存时会自动生成TF向量；批量导入题目后执行本脚本，
+按整个题库的IDF重新计算，提升BERT不可用时降级评分的区分度。
+
+用法:
+    python scripts/build_lexical_index.py
+"""
+import sys
+import time
+from pathlib import Path
+
+# 添加backend目录到Python路径
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app import create_app
+from db_instance import db
+from services.lexical_scorer import rebuild_lexical_vectors
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        started = time.perf_counter()
+        count = rebuild_lexical_vectors(db.session)
+        elapsed = time.perf_counter() - started
+        print(f"✅ 已重建 {count} 道主观题的参考答案向量，用时 {elapsed:.2f} 秒")
+
+
+if __name__ == '__main__':
+    main()
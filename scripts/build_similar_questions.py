@@ -0,0 +1,44 @@
+"""
+预计算题目的相似题
+分批获取题目语义向量（BERT服务不可用时使用字符n-gram哈希向量），
+分块矩阵乘法求每道题的 top-k 相似题，批量写入 quiz_similar_questions 表和 quizzes.similar_questions 列。
+题库有较大变动后执行。
+
+用法:
+    python scripts/build_similar_questions.py [--top-k 10] [--min-score 0.3] [--block-size 1024]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# 添加backend目录到Python路径
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app import create_app
+from db_instance import db
+from services.similar_questions import DEFAULT_TOP_K, rebuild_similar_questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='预计算题目的相似题')
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help='每道题保留的相似题数量')
+    parser.add_argument('--min-score', type=float, default=0.0, help='相似度下限，低于该值的不保存')
+    parser.add_argument('--batch-size', type=int, default=64, help='每次请求BERT服务的题目数')
+    parser.add_argument('--block-size', type=int, default=1024, help='分块矩阵乘法的块大小')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        report = rebuild_similar_questions(
+            db.session, top_k=args.top_k, min_score=args.min_score,
+            batch_size=args.batch_size, block_size=args.block_size
+        )
+        print(f"✅ 已为 {report['questions']} 道题写入 {report['relations']} 条相似关系"
+              f"（向量来源: {report['source']}）")
+        print(f"   向量 {report['embed_seconds']} 秒，top-k {report['topk_seconds']} 秒，"
+              f"写入 {report['write_seconds']} 秒")
+
+
+if __name__ == '__main__':
+    main()
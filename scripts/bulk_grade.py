@@ -0,0 +1,43 @@
+"""
+批量批改纸质考试答题表（JSONL/CSV），逐行流式读取，进度以NDJSON输出到标准输出
+
+文件格式见 services/bulk_grading.py。
+
+用法:
+    python scripts/bulk_grade.py answers.jsonl [--format csv] [--quiz-type static] [--batch-size 200]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# 添加backend目录到Python路径
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app import create_app
+from services.bulk_grading import DEFAULT_BATCH_SIZE, bulk_grade, detect_format, iter_answer_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量批改答题表')
+    parser.add_argument('path', help='答题文件路径（.jsonl 或 .csv）')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help='文件格式（默认按扩展名判断）')
+    parser.add_argument('--quiz-type', default='static', help='写入提交记录的测验类型')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='每批学生数')
+    args = parser.parse_args()
+
+    fmt = detect_format(args.path, args.format)
+    if not fmt:
+        print('❌ 无法识别文件格式，请通过 --format 指定 jsonl 或 csv', file=sys.stderr)
+        sys.exit(1)
+
+    app = create_app()
+    with app.app_context():
+        with open(args.path, encoding='utf-8-sig', newline='') as stream:
+            for progress in bulk_grade(iter_answer_rows(stream, fmt), args.quiz_type, max(1, args.batch_size)):
+                print(json.dumps(progress, ensure_ascii=False), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+题目分析统计任务
+读取上次处理之后的新作答（quiz_answers），增量更新每道题的难度、区分度和选项分布。
+
+用法:
+    python scripts/item_analysis.py [--full] [--batch-size 200000]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# 添加backend目录到Python路径
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app import create_app
+from db_instance import db
+from services.item_analysis import update_item_statistics
+
+
+def main():
+    parser = argparse.ArgumentParser(description='题目分析统计')
+    parser.add_argument('--full', action='store_true', help='清空已有统计后全量重算')
+    parser.add_argument('--batch-size', type=int, default=200000, help='每批读取的作答数')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        result = update_item_statistics(db.session, args.full, args.batch_size)
+        print(f"✅ 处理作答 {result['answers']} 条，更新题目 {result['items']} 道，水位 {result['watermark']}")
+        print(f"  读取 {result['load_seconds']} 秒，计算 {result.get('compute_seconds', 0)} 秒，"
+              f"写入 {result.get('write_seconds', 0)} 秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,505 @@
+"""
+提交接口压力测试
+在临时SQLite数据库上启动完整的Flask应用（真实HTTP服务线程 + 后台批改队列），
+并启动一个可配置延迟和失败率的BERT相似度桩服务，按目标RPS开环发送提交请求，
+输出各类请求的延迟分位数、错误率、数据库写语句/提交耗时和"database is locked"次数。
+
+请求组合（--mix，权重）:
+    objective  只含客观题（同步批改并写库）
+    mixed      客观题 + 主观题（主观题交给后台批改线程，调用桩服务）
+    retry      带 Idempotency-Key 的 mixed 提交，随后立即用同一个键重试一次
+
+用法:
+    python scripts/loadtest_submit.py [--rps 50] [--duration 30] [--users 500]
+        [--mix objective=6,mixed=3,retry=1] [--bert-latency 0.05] [--bert-failure-rate 0.02]
+        [--max-error-rate 0.01] [--max-p99-ms 500] [--json report.json]
+
+发布前执行，--max-error-rate / --max-p99-ms 超出时以非0状态码退出。
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+# 添加backend目录到Python路径
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+WORDS = ('变量 函数 列表 字典 循环 条件 异常 模块 对象 继承 装饰器 生成器 迭代器 闭包 文件 '
+         '字符串 元组 集合 作用域 递归 参数 返回值 可变 不可变 引用').split()
+
+
+def log(message):
+    """进度输出到stderr（应用自身的输出在测试期间被屏蔽）"""
+    print(message, file=sys.stderr, flush=True)
+
+
+def percentile(sorted_values, ratio):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * ratio))]
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 0.5) * 1000, 1),
+        'p90_ms': round(percentile(values, 0.9) * 1000, 1),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 1),
+        'max_ms': round((values[-1] if values else 0.0) * 1000, 1)
+    }
+
+
+# ==================== BERT 桩服务 ====================
+
+class StubSimilarityServer:
+    """模拟 bert-service 的相似度接口：固定延迟 + 抖动，按概率返回503"""
+
+    def __init__(self, latency, jitter, failure_rate, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    @staticmethod
+    def similarity(text1, text2):
+        chars1, chars2 = set(text1 or ''), set(text2 or '')
+        return round(len(chars1 & chars2) / len(chars1 | chars2), 4) if chars1 | chars2 else 0.0
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._reply(200, {'status': 'ok'})
+
+            def do_POST(self):
+                data = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+                with stub.lock:
+                    stub.requests += 1
+                    delay = max(0.0, stub.rng.gauss(stub.latency, stub.jitter))
+                    failed = stub.rng.random() < stub.failure_rate
+                    stub.failures += 1 if failed else 0
+                time.sleep(delay)
+                if failed:
+                    self._reply(503, {'error': 'stub failure'})
+                elif self.path == '/api/batch-similarity':
+                    self._reply(200, {'results': [
+                        {'similarity': stub.similarity(answer, reference), 'analysis': ''}
+                        for answer, reference in zip(data.get('student_answers', []), data.get('reference_answers', []))
+                    ]})
+                else:
+                    self._reply(200, {'similarity': stub.similarity(data.get('text1'), data.get('text2')), 'analysis': ''})
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='stub-bert', daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+
+# ==================== 数据库计时 ====================
+
+class DatabaseProbe:
+    """通过SQLAlchemy事件统计写语句耗时（SQLite上主要是等待写锁）、会话提交耗时和锁错误"""
+
+    def __init__(self, engine, session_class):
+        from sqlalchemy import event
+
+        self.write_seconds = []
+        self.commit_seconds = []
+        self.lock_errors = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            self._local.statement_started = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_execute(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+                elapsed = time.perf_counter() - self._local.statement_started
+                with self._lock:
+                    self.write_seconds.append(elapsed)
+
+        @event.listens_for(engine, 'handle_error')
+        def handle_error(context):
+            if 'locked' in str(context.original_exception).lower():
+                with self._lock:
+                    self.lock_errors += 1
+
+        @event.listens_for(session_class, 'before_commit')
+        def before_commit(session):
+            self._local.commit_started = time.perf_counter()
+
+        @event.listens_for(session_class, 'after_commit')
+        def after_commit(session):
+            started = getattr(self._local, 'commit_started', None)
+            if started is not None:
+                with self._lock:
+                    self.commit_seconds.append(time.perf_counter() - started)
+                self._local.commit_started = None
+
+    def report(self):
+        return {
+            'write_statements': summarize(self.write_seconds),
+            'commits': summarize(self.commit_seconds),
+            'lock_errors': self.lock_errors
+        }
+
+
+# ==================== 测试数据 ====================
+
+def seed_database(app, db, user_count, question_count, rng):
+    """创建学生和题目，返回 (访问令牌列表, 客观题列表, 主观题列表)"""
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from models import Role, User, Quiz
+
+    with app.app_context():
+        db.create_all()
+        role = Role(name='student')
+        db.session.add(role)
+        db.session.commit()
+
+        # 密码哈希很慢，所有测试用户共用一个
+        password_hash = generate_password_hash('loadtest')
+        db.session.execute(insert(User), [
+            {'username': f'load{i}', 'email': f'load{i}@example.com', 'password_hash': password_hash,
+             'role_id': role.id, 'is_active': True}
+            for i in range(user_count)
+        ])
+
+        objective_count = max(1, question_count * 4 // 5)
+        for i in range(question_count):
+            if i < objective_count:
+                db.session.add(Quiz(
+                    question=f'压测客观题{i}', type='objective', answer=rng.choice('ABCD'),
+                    options=json.dumps([{'label': label, 'text': rng.choice(WORDS)} for label in 'ABCD']),
+                    knowledge_point=f'知识点{i % 10}', difficulty=rng.randint(1, 5)
+                ))
+            else:
+                db.session.add(Quiz(
+                    question=f'压测主观题{i}', type='subjective',
+                    reference_answer=''.join(rng.sample(WORDS, 6)),
+                    knowledge_point=f'知识点{i % 10}', difficulty=rng.randint(1, 5)
+                ))
+        db.session.commit()
+
+        tokens = [create_access_token(identity=str(user_id)) for (user_id,) in db.session.query(User.id)]
+        objective = [(q.id, q.answer) for q in Quiz.query.filter_by(type='objective')]
+        subjective = [(q.id, q.reference_answer) for q in Quiz.query.filter_by(type='subjective')]
+    return tokens, objective, subjective
+
+
+def build_payload(kind, objective, subjective, rng):
+    """模拟真实作答：每次10道客观题（约70%答对），mixed 另加2道主观题（答案部分重复以命中评分缓存）"""
+    answers = {'objective': {}}
+    for quiz_id, answer in rng.sample(objective, min(10, len(objective))):
+        answers['objective'][str(quiz_id)] = answer if rng.random() < 0.7 else rng.choice('ABCD')
+    if kind != 'objective' and subjective:
+        answers['subjective'] = {
+            str(quiz_id): reference[:rng.randint(2, len(reference))] if rng.random() < 0.5
+            else ''.join(rng.sample(WORDS, 3))
+            for quiz_id, reference in rng.sample(subjective, min(2, len(subjective)))
+        }
+    return {'answers': answers, 'duration': rng.randint(60, 900)}
+
+
+# ==================== 压测 ====================
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ('objective', 'mixed', 'retry'):
+            raise argparse.ArgumentTypeError(f'未知请求类型: {name}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def run_load(base_url, tokens, objective, subjective, args):
+    """开环发送：调度线程按目标RPS投放请求，延迟从计划发送时间起算（包含排队时间）"""
+    rng = random.Random(args.seed)
+    kinds, weights = zip(*args.mix.items())
+    work = queue.Queue()
+    results = []
+    results_lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        local = []
+        while True:
+            item = work.get()
+            if item is None:
+                break
+            scheduled, kind, token, payload = item
+            headers = {'Authorization': f'Bearer {token}'}
+            if kind == 'retry':
+                headers['Idempotency-Key'] = uuid.uuid4().hex
+            attempts = 2 if kind == 'retry' else 1
+            for attempt in range(attempts):
+                started = time.perf_counter()
+                try:
+                    response = session.post(f'{base_url}/api/v1/quiz/submit', json=payload,
+                                            headers=headers, timeout=args.timeout)
+                    status = response.status_code
+                    body = response.json() if response.headers.get('Content-Type', '').startswith('application/json') else {}
+                    # 接口在写库失败时仍返回200，submission_id为空
+                    persisted = bool(body.get('submission_id'))
+                    replayed = response.headers.get('Idempotent-Replayed') == 'true'
+                except requests.RequestException:
+                    status, persisted, replayed = 0, False, False
+                finished = time.perf_counter()
+                local.append({
+                    'kind': kind if attempt == 0 else 'retry_replay',
+                    'status': status,
+                    'persisted': persisted,
+                    'replayed': replayed,
+                    'latency': finished - (scheduled if attempt == 0 else started),
+                    'service': finished - started
+                })
+        with results_lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+
+    # 预先生成请求，避免调度线程自身成为瓶颈
+    total = int(args.rps * args.duration)
+    plan = [
+        (rng.choices(kinds, weights)[0], rng.choice(tokens))
+        for _ in range(total)
+    ]
+    started = time.perf_counter()
+    for index, (kind, token) in enumerate(plan):
+        scheduled = started + index / args.rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        work.put((scheduled, kind, token, build_payload(kind, objective, subjective, rng)))
+        if index and index % max(1, int(args.rps * 5)) == 0:
+            log(f"  已发送 {index}/{total}，排队 {work.qsize()}")
+    sent_at = time.perf_counter()
+
+    for _ in threads:
+        work.put(None)
+    for thread in threads:
+        thread.join()
+    return results, sent_at - started, time.perf_counter() - started
+
+
+def wait_for_grading(app, timeout):
+    """等待后台批改队列清空，返回 (耗时, 各状态的提交数)"""
+    from sqlalchemy import func
+    from db_instance import db
+    from models import QuizSubmission
+
+    started = time.perf_counter()
+    with app.app_context():
+        while time.perf_counter() - started < timeout:
+            pending = db.session.query(func.count(QuizSubmission.id)).filter(
+                QuizSubmission.status.in_((QuizSubmission.STATUS_PENDING, QuizSubmission.STATUS_GRADING))
+            ).scalar()
+            db.session.remove()
+            if not pending:
+                break
+            time.sleep(0.2)
+        counts = dict(db.session.query(QuizSubmission.status, func.count(QuizSubmission.id)).group_by(
+            QuizSubmission.status
+        ).all())
+        db.session.remove()
+    return time.perf_counter() - started, counts
+
+
+def build_report(results, send_seconds, total_seconds, probe, stub, grading, args):
+    by_kind = {}
+    for result in results:
+        by_kind.setdefault(result['kind'], []).append(result)
+
+    requests_report = {}
+    for kind, items in sorted(by_kind.items()):
+        errors = [item for item in items if item['status'] not in (200, 202) or not item['persisted']]
+        statuses = {}
+        for item in items:
+            statuses[str(item['status'])] = statuses.get(str(item['status']), 0) + 1
+        requests_report[kind] = {
+            'latency': summarize([item['latency'] for item in items]),
+            'service_time': summarize([item['service'] for item in items]),
+            'error_rate': round(len(errors) / len(items), 4),
+            'statuses': statuses
+        }
+        if kind == 'retry_replay':
+            requests_report[kind]['replayed'] = sum(1 for item in items if item['replayed'])
+
+    first_attempts = [item for item in results if item['kind'] != 'retry_replay']
+    errors = [item for item in first_attempts if item['status'] not in (200, 202) or not item['persisted']]
+    grading_seconds, grading_counts = grading
+    return {
+        'target_rps': args.rps,
+        'achieved_rps': round(len(first_attempts) / total_seconds, 1) if total_seconds else 0,
+        'send_seconds': round(send_seconds, 2),
+        'total_seconds': round(total_seconds, 2),
+        'requests': len(results),
+        'error_rate': round(len(errors) / len(first_attempts), 4) if first_attempts else 0.0,
+        'latency': summarize([item['latency'] for item in first_attempts]),
+        'by_kind': requests_report,
+        'database': probe.report(),
+        'grading': {
+            'drain_seconds': round(grading_seconds, 2),
+            'submissions': grading_counts
+        },
+        'stub_bert': {
+            'requests': stub.requests,
+            'failures': stub.failures,
+            'latency_ms': args.bert_latency * 1000,
+            'failure_rate': args.bert_failure_rate
+        }
+    }
+
+
+def print_report(report):
+    def line(name, stats):
+        return (f"p50={stats['p50_ms']}ms p90={stats['p90_ms']}ms "
+                f"p99={stats['p99_ms']}ms max={stats['max_ms']}ms ({stats['count']}){name}")
+
+    print(f"\n📊 目标 {report['target_rps']} RPS，实际 {report['achieved_rps']} RPS，"
+          f"共 {report['requests']} 个请求，用时 {report['total_seconds']} 秒")
+    print(f"  总体延迟: {line('', report['latency'])}，错误率 {report['error_rate'] * 100:.2f}%")
+    for kind, stats in report['by_kind'].items():
+        extra = f"，重放 {stats['replayed']}" if 'replayed' in stats else ''
+        print(f"  {kind:<13} {line('', stats['latency'])}，错误率 {stats['error_rate'] * 100:.2f}%，"
+              f"状态码 {stats['statuses']}{extra}")
+    database = report['database']
+    print(f"  数据库写语句: {line('', database['write_statements'])}")
+    print(f"  会话提交:     {line('', database['commits'])}")
+    print(f"  database is locked: {database['lock_errors']} 次")
+    grading = report['grading']
+    print(f"  后台批改: 队列清空用时 {grading['drain_seconds']} 秒，提交状态 {grading['submissions']}")
+    stub = report['stub_bert']
+    print(f"  BERT桩服务: {stub['requests']} 次请求，{stub['failures']} 次模拟失败")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='提交接口压力测试')
+    parser.add_argument('--rps', type=float, default=50, help='目标每秒请求数')
+    parser.add_argument('--duration', type=float, default=30, help='发送持续时间（秒）')
+    parser.add_argument('--concurrency', type=int, default=32, help='客户端并发连接数')
+    parser.add_argument('--users', type=int, default=500, help='模拟学生数')
+    parser.add_argument('--questions', type=int, default=200, help='题库题目数（其中约20%%为主观题）')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('objective=6,mixed=3,retry=1'),
+                        help='请求组合权重，如 objective=6,mixed=3,retry=1')
+    parser.add_argument('--bert-latency', type=float, default=0.05, help='桩服务平均延迟（秒）')
+    parser.add_argument('--bert-jitter', type=float, default=0.02, help='桩服务延迟标准差（秒）')
+    parser.add_argument('--bert-failure-rate', type=float, default=0.02, help='桩服务返回503的概率')
+    parser.add_argument('--grading-workers', type=int, default=4, help='后台批改线程数')
+    parser.add_argument('--sync-grading', action='store_true', help='关闭异步批改，主观题在请求内批改')
+    parser.add_argument('--timeout', type=float, default=30, help='客户端请求超时（秒）')
+    parser.add_argument('--grading-timeout', type=float, default=120, help='等待后台批改完成的最长时间（秒）')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='将报告写入JSON文件（便于与上次发布对比）')
+    parser.add_argument('--keep-db', action='store_true', help='保留临时数据库')
+    parser.add_argument('--verbose', action='store_true', help='显示应用自身的输出')
+    parser.add_argument('--max-error-rate', type=float, help='错误率超过该值时以状态码1退出')
+    parser.add_argument('--max-p99-ms', type=float, help='总体p99延迟超过该值（毫秒）时以状态码1退出')
+    args = parser.parse_args()
+
+    stub = StubSimilarityServer(args.bert_latency, args.bert_jitter, args.bert_failure_rate, args.seed)
+    stub.start()
+
+    # 配置在导入时读取环境变量，必须在导入应用之前设置
+    workdir = tempfile.mkdtemp(prefix='loadtest_')
+    database_path = os.path.join(workdir, 'loadtest.db')
+    os.environ['DATABASE_URI'] = f'sqlite:///{database_path}'
+    os.environ['BERT_SERVICE_URL'] = stub.url
+    os.environ['GRADING_ASYNC'] = 'false' if args.sync_grading else 'true'
+    os.environ['GRADING_WORKERS'] = str(args.grading_workers)
+
+    quiet = contextlib.redirect_stdout(open(os.devnull, 'w')) if not args.verbose else contextlib.nullcontext()
+    try:
+        with quiet:
+            from werkzeug.serving import make_server
+            from app import create_app
+            from db_instance import db
+
+            app = create_app()
+            if not args.verbose:
+                logging.getLogger('werkzeug').setLevel(logging.ERROR)
+            log(f"🗄️  临时数据库: {database_path}")
+            rng = random.Random(args.seed)
+            tokens, objective, subjective = seed_database(app, db, args.users, args.questions, rng)
+            log(f"  已创建 {len(tokens)} 个学生，{len(objective)} 道客观题，{len(subjective)} 道主观题")
+
+            with app.app_context():
+                probe = DatabaseProbe(db.engine, db.session.registry().__class__)
+            server = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=server.serve_forever, name='loadtest-app', daemon=True).start()
+            base_url = f'http://127.0.0.1:{server.server_port}'
+
+            log(f"🚀 {base_url}: {args.rps} RPS × {args.duration} 秒，组合 {args.mix}")
+            results, send_seconds, total_seconds = run_load(base_url, tokens, objective, subjective, args)
+            log("  请求发送完毕，等待后台批改...")
+            grading = wait_for_grading(app, args.grading_timeout)
+            server.shutdown()
+    finally:
+        stub.stop()
+        if not args.keep_db:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = build_report(results, send_seconds, total_seconds, probe, stub, grading, args)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"  报告已写入 {args.json}")
+
+    failed = []
+    if args.max_error_rate is not None and report['error_rate'] > args.max_error_rate:
+        failed.append(f"错误率 {report['error_rate']} > {args.max_error_rate}")
+    if args.max_p99_ms is not None and report['latency']['p99_ms'] > args.max_p99_ms:
+        failed.append(f"p99 {report['latency']['p99_ms']}ms > {args.max_p99_ms}ms")
+    if failed:
+        print(f"❌ 未达标: {'；'.join(failed)}")
+        sys.exit(1)
+    print("✅ 压测通过")
+
+
+if __name__ == '__main__':
+    main()
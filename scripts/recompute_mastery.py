@@ -0,0 +1,56 @@
+"""
+重算知识点掌握度（贝叶斯知识追踪）
+从 quiz_answers 读取全部作答历史，向量化重算 knowledge_mastery 表；
+加 --refit 时先按知识点重新拟合BKT参数，再用新参数重算。
+
+首次使用前需先回填单题结果: python scripts/backfill_quiz_answers.py
+
+用法:
+    python scripts/recompute_mastery.py [--refit] [--min-observations 50] [--batch-size 50000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# 添加backend目录到Python路径
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app import create_app
+from db_instance import db
+from services.knowledge_tracing import load_answer_history, recompute_mastery, refit_params
+
+
+def main():
+    parser = argparse.ArgumentParser(description='重算知识点掌握度')
+    parser.add_argument('--refit', action='store_true', help='先重新拟合各知识点的BKT参数')
+    parser.add_argument('--min-observations', type=int, default=50, help='拟合参数所需的最少作答数')
+    parser.add_argument('--batch-size', type=int, default=50000, help='每批读取的作答数')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+
+        started = time.perf_counter()
+        history = load_answer_history(db.session, args.batch_size)
+        print(f"读取作答 {len(history)} 条，{history.sequence_count} 个(学生, 知识点)序列，"
+              f"{len(history.point_names)} 个知识点，用时 {time.perf_counter() - started:.1f} 秒")
+
+        params = None
+        if args.refit:
+            started = time.perf_counter()
+            params = refit_params(db.session, history, args.min_observations)
+            print(f"拟合参数 {len(params)} 个知识点，用时 {time.perf_counter() - started:.1f} 秒")
+            for knowledge_point, fitted in sorted(params.items()):
+                print(f"  {knowledge_point}: init={fitted.p_init} transit={fitted.p_transit} "
+                      f"slip={fitted.p_slip} guess={fitted.p_guess}")
+
+        started = time.perf_counter()
+        written = recompute_mastery(db.session, history, params)
+        print(f"✅ 重算完成：写入掌握度 {written} 行，用时 {time.perf_counter() - started:.1f} 秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+批量重新调度错题本复习计划
+调整复习间隔上限，或把积压的过期错题分散到未来几天；
+按ID分批读取，每批一次批量更新并提交，可重复执行或中断后续跑。
+
+用法:
+    python scripts/reschedule_reviews.py [--max-interval 180] [--spread-days 7] [--batch-size 5000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# 添加backend目录到Python路径
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app import create_app
+from db_instance import db
+from services.review import reschedule_reviews
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量重新调度错题本复习计划')
+    parser.add_argument('--max-interval', type=float, default=None, help='复习间隔上限（天）')
+    parser.add_argument('--spread-days', type=float, default=None, help='把过期错题分散到未来的天数')
+    parser.add_argument('--batch-size', type=int, default=5000, help='每批处理的条目数')
+    args = parser.parse_args()
+
+    if args.max_interval is None and not args.spread_days:
+        parser.error('请至少指定 --max-interval 或 --spread-days')
+
+    started = time.perf_counter()
+
+    def progress(scanned, changed):
+        print(f"  已扫描 {scanned} 条，更新 {changed} 条，用时 {time.perf_counter() - started:.1f} 秒")
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        scanned, changed = reschedule_reviews(
+            db.session, args.max_interval, args.spread_days, args.batch_size, progress=progress
+        )
+        print(f"✅ 重新调度完成：扫描 {scanned} 条，更新 {changed} 条")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+数据库结构升级脚本
+对比模型定义与现有数据库：创建缺失的表，补充缺失的列和索引，加长模型中已加长的字符串列。
+脚本可重复执行，已存在的表/列/索引会被跳过。
+
+用法:
+    python scripts/upgrade_db.py
+"""
+import sys
+from pathlib import Path
+
+# 添加backend目录到Python路径
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import inspect, String
+
+from app import create_app
+from db_instance import db
+
+
+def render_default(column):
+    """将列的标量默认值渲染为SQL字面量，无默认值时返回None"""
+    default = column.default
+    if default is None or not default.is_scalar:
+        return None
+    value = default.arg
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return None
+
+
+def add_missing_columns(connection, inspector):
+    """为已存在的表补充模型中新增的列"""
+    added = 0
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+            default = render_default(column)
+            if default is not None:
+                ddl += f' DEFAULT {default}'
+            connection.exec_driver_sql(ddl)
+            print(f"   ➕ {table.name}.{column.name} ({column_type})")
+            added += 1
+    return added
+
+
+def widen_string_columns(connection, inspector):
+    """将长度小于模型定义的字符串列加长（SQLite不限制VARCHAR长度，无需处理）"""
+    dialect = connection.dialect.name
+    if dialect not in ('postgresql', 'mysql', 'mariadb'):
+        return 0
+    widened = 0
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name']: column['type'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            current = existing.get(column.name)
+            if not isinstance(column.type, String) or not column.type.length:
+                continue
+            if not isinstance(current, String) or not current.length or current.length >= column.type.length:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            if dialect == 'postgresql':
+                ddl = f'ALTER TABLE {table.name} ALTER COLUMN {column.name} TYPE {column_type}'
+            else:
+                null = 'NULL' if column.nullable else 'NOT NULL'
+                ddl = f'ALTER TABLE {table.name} MODIFY COLUMN {column.name} {column_type} {null}'
+            connection.exec_driver_sql(ddl)
+            print(f"   ↔️  {table.name}.{column.name} ({current.length} -> {column.type.length})")
+            widened += 1
+    return widened
+
+
+def add_missing_indexes(connection, inspector):
+    """创建模型中声明但数据库中缺失的索引"""
+    added = 0
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                with connection.begin_nested():
+                    index.create(bind=connection)
+            except Exception as e:
+                # 例如唯一索引遇到历史重复数据，需人工清理后重新执行
+                print(f"   ⚠️  创建索引 {index.name} 失败: {e}")
+                continue
+            print(f"   ➕ 索引 {index.name} ON {table.name}")
+            added += 1
+    return added
+
+
+def upgrade():
+    app = create_app()
+    with app.app_context():
+        print(f"🗄️  数据库: {db.engine.url}")
+
+        # 1. 创建缺失的表（连同其索引）
+        db.create_all()
+
+        # 2. 补充列和索引
+        with db.engine.begin() as connection:
+            inspector = inspect(connection)
+            columns = add_missing_columns(connection, inspector)
+            widened = widen_string_columns(connection, inspector)
+            inspector = inspect(connection)
+            indexes = add_missing_indexes(connection, inspector)
+
+        print(f"✅ 升级完成：新增 {columns} 列，加长 {widened} 列，{indexes} 个索引")
+
+
+if __name__ == '__main__':
+    upgrade()
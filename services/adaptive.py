@@ -0,0 +1,275 @@
+"""
+自适应选题引擎
+根据学生各知识点的掌握度挑选下一道题：优先薄弱知识点，难度随掌握度提高。
+
+- 掌握度向量：每个学生一个 float32 数组，知识点统一编号为数组下标；
+  首次访问时由 QuizStatistics.knowledge_statistics 初始化，之后每条批改完成的提交按指数滑动平均更新。
+- 题目索引：按 (题型, 知识点, 难度) 分桶的有序题目ID列表，随题库快照版本重建；
+  选题在桶内按学生上次作答位置二分查找下一题，复杂度 O(log n)，不扫描题目表。
+"""
+import json
+import random
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+from models import db, QuizStatistics
+from services.question_bank import question_bank
+
+QUESTION_TYPES = ('objective', 'subjective')
+
+# 掌握度滑动平均系数（越大越看重最近的作答）
+MASTERY_ALPHA = 0.3
+# 没有作答记录的知识点的初始掌握度
+MASTERY_PRIOR = 0.5
+# 随机选择知识点的概率，避免始终只练同一个弱项
+EXPLORE_RATE = 0.2
+# 内存中保留的学生数量上限（超出后淘汰最久未访问的学生，下次访问重新初始化）
+MAX_LEARNERS = 50000
+
+_UNSEEN = -1.0
+
+
+class AdaptiveIndex:
+    """某一版本题库的分桶索引"""
+
+    def __init__(self, version, questions):
+        """
+        Args:
+            version: 题库版本标识
+            questions: 可迭代的题目字典（需含 id/type/knowledge_point/difficulty）
+        """
+        self.version = version
+        buckets = {}
+        for question in questions:
+            question_type = question.get('type')
+            if question_type not in QUESTION_TYPES:
+                continue
+            key = (question_type, question.get('knowledge_point') or '未分类', int(question.get('difficulty') or 1))
+            buckets.setdefault(key, []).append(question['id'])
+
+        # (题型, 知识点, 难度) -> 有序ID列表
+        self.buckets = {key: sorted(ids) for key, ids in buckets.items()}
+        # 题型 -> 知识点 -> 有序难度列表
+        self.levels = {question_type: {} for question_type in QUESTION_TYPES}
+        for question_type, knowledge_point, difficulty in self.buckets:
+            self.levels[question_type].setdefault(knowledge_point, []).append(difficulty)
+        for by_point in self.levels.values():
+            for difficulties in by_point.values():
+                difficulties.sort()
+
+        # 题型 -> 可选知识点（all 为各题型合并）
+        self._knowledge_points = {question_type: tuple(self.levels[question_type]) for question_type in QUESTION_TYPES}
+        self._knowledge_points['all'] = tuple(dict.fromkeys(
+            kp for question_type in QUESTION_TYPES for kp in self.levels[question_type]
+        ))
+
+    def knowledge_points(self, question_type):
+        return self._knowledge_points.get(question_type, self._knowledge_points['all'])
+
+
+class _Learner:
+    __slots__ = ('vector', 'cursors', 'lock')
+
+    def __init__(self, size):
+        self.vector = array('f', [_UNSEEN]) * size
+        self.cursors = {}  # 桶 -> 上次选中的题目ID
+        self.lock = threading.Lock()
+
+
+class MasteryStore:
+    """学生掌握度向量（进程内，按LRU淘汰）"""
+
+    def __init__(self, max_learners=MAX_LEARNERS):
+        self.max_learners = max_learners
+        self._positions = {}  # 知识点 -> 向量下标
+        self._learners = OrderedDict()
+        self._lock = threading.Lock()
+
+    def position(self, knowledge_point):
+        position = self._positions.get(knowledge_point)
+        if position is None:
+            with self._lock:
+                position = self._positions.setdefault(knowledge_point, len(self._positions))
+        return position
+
+    def weakest(self, learner, knowledge_points, offset=0):
+        """掌握度最低的知识点（掌握度相同时取从offset开始遇到的第一个）"""
+        vector = learner.vector
+        size = len(vector)
+        positions = self._positions
+        best = None
+        best_value = 2.0
+        count = len(knowledge_points)
+        for i in range(count):
+            knowledge_point = knowledge_points[(offset + i) % count]
+            position = positions.get(knowledge_point)
+            value = vector[position] if position is not None and position < size else _UNSEEN
+            if value == _UNSEEN:
+                value = MASTERY_PRIOR
+            if value < best_value:
+                best, best_value = knowledge_point, value
+        return best
+
+    def mastery(self, learner, knowledge_point):
+        """知识点掌握度（无作答记录时返回先验值）"""
+        position = self._positions.get(knowledge_point)
+        if position is None or position >= len(learner.vector) or learner.vector[position] == _UNSEEN:
+            return MASTERY_PRIOR
+        return learner.vector[position]
+
+    def learner(self, user_id, loader=None):
+        """获取学生状态，不在内存中时通过loader返回的知识点统计初始化"""
+        with self._lock:
+            learner = self._learners.get(user_id)
+            if learner is not None:
+                self._learners.move_to_end(user_id)
+                return learner
+
+        learner = _Learner(len(self._positions))
+        for knowledge_point, value in (loader(user_id) if loader else {}).items():
+            self._set(learner, self.position(knowledge_point), value)
+
+        with self._lock:
+            existing = self._learners.get(user_id)
+            if existing is not None:
+                return existing
+            self._learners[user_id] = learner
+            while len(self._learners) > self.max_learners:
+                self._learners.popitem(last=False)
+        return learner
+
+    def observe(self, user_id, outcomes):
+        """
+        按批改结果更新掌握度（只更新已在内存中的学生；
+        未加载的学生下次访问时从已提交的统计中初始化，已包含本次结果）
+
+        Args:
+            outcomes: 可迭代的 (知识点, 得分率)
+        """
+        learner = self._learners.get(user_id)
+        if learner is None:
+            return
+        with learner.lock:
+            for knowledge_point, ratio in outcomes:
+                position = self.position(knowledge_point)
+                current = learner.vector[position] if position < len(learner.vector) else _UNSEEN
+                value = ratio if current == _UNSEEN else current + MASTERY_ALPHA * (ratio - current)
+                self._set(learner, position, value)
+
+    def forget(self, user_id):
+        with self._lock:
+            self._learners.pop(user_id, None)
+
+    @staticmethod
+    def _set(learner, position, value):
+        if position >= len(learner.vector):
+            learner.vector.extend([_UNSEEN] * (position + 1 - len(learner.vector)))
+        learner.vector[position] = min(1.0, max(0.0, value))
+
+
+def select_question(index, store, learner, question_type='all', knowledge_point=None, rng=random):
+    """
+    为学生挑选下一道题
+
+    Returns:
+        tuple: (题型, 题目ID, 知识点, 难度, 掌握度)，题库为空时返回None
+    """
+    if knowledge_point is None:
+        candidates = index.knowledge_points(question_type)
+        if not candidates:
+            return None
+        if rng.random() < EXPLORE_RATE:
+            knowledge_point = rng.choice(candidates)
+        else:
+            knowledge_point = store.weakest(learner, candidates, rng.randrange(len(candidates)))
+
+    types = [question_type] if question_type in QUESTION_TYPES else list(QUESTION_TYPES)
+    types = [qt for qt in types if knowledge_point in index.levels[qt]]
+    if not types:
+        return None
+    chosen_type = types[0] if len(types) == 1 else rng.choice(types)
+
+    # 按掌握度所在分位选择难度：掌握度越高题目越难
+    mastery = store.mastery(learner, knowledge_point)
+    difficulties = index.levels[chosen_type][knowledge_point]
+    difficulty = difficulties[min(len(difficulties) - 1, int(mastery * len(difficulties)))]
+
+    bucket = (chosen_type, knowledge_point, difficulty)
+    ids = index.buckets[bucket]
+    with learner.lock:
+        position = bisect_right(ids, learner.cursors.get(bucket, -1))
+        quiz_id = ids[position] if position < len(ids) else ids[0]  # 做完一轮后从头开始
+        learner.cursors[bucket] = quiz_id
+    return chosen_type, quiz_id, knowledge_point, difficulty, mastery
+
+
+def load_knowledge_mastery(user_id):
+    """由测验统计初始化学生各知识点掌握度（合并各测验类型的得分率）"""
+    totals = {}
+    for (knowledge_statistics,) in db.session.query(QuizStatistics.knowledge_statistics).filter(
+        QuizStatistics.user_id == user_id
+    ):
+        if not knowledge_statistics:
+            continue
+        for knowledge_point, bucket in json.loads(knowledge_statistics).items():
+            score, max_score = totals.get(knowledge_point, (0.0, 0.0))
+            if bucket.get('max_score'):
+                score += bucket.get('score', 0)
+                max_score += bucket['max_score']
+            else:
+                score += bucket.get('correct', 0)
+                max_score += bucket.get('total', 0)
+            totals[knowledge_point] = (score, max_score)
+    return {kp: score / max_score for kp, (score, max_score) in totals.items() if max_score}
+
+
+class AdaptiveEngine:
+    """选题入口：维护与题库快照同版本的分桶索引"""
+
+    def __init__(self):
+        self.mastery = MasteryStore()
+        self._snapshot = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    def index(self):
+        """返回当前题库快照对应的索引（快照更新后重建）"""
+        snapshot = question_bank.snapshot()
+        if self._snapshot is not snapshot:
+            with self._lock:
+                if self._snapshot is not snapshot:
+                    self._index = AdaptiveIndex(snapshot.version, snapshot.index.values())
+                    self._snapshot = snapshot
+        return self._snapshot, self._index
+
+    def next_question(self, user_id, question_type='all', knowledge_point=None):
+        """
+        挑选下一道题
+
+        Returns:
+            dict: {question, knowledge_point, difficulty, mastery}，没有可选题目时返回None
+        """
+        snapshot, index = self.index()
+        learner = self.mastery.learner(user_id, load_knowledge_mastery)
+        selected = select_question(index, self.mastery, learner, question_type, knowledge_point)
+        if selected is None:
+            return None
+
+        chosen_type, quiz_id, knowledge_point, difficulty, mastery = selected
+        question = snapshot.by_id.get(quiz_id)
+        if question is None or question['type'] != chosen_type:
+            question = {k: v for k, v in snapshot.index[(chosen_type, quiz_id)].items() if k != 'lexical_vector'}
+        return {
+            'question': question,
+            'knowledge_point': knowledge_point,
+            'difficulty': difficulty,
+            'mastery': round(mastery, 4)
+        }
+
+    def observe(self, user_id, outcomes):
+        self.mastery.observe(user_id, outcomes)
+
+
+adaptive_engine = AdaptiveEngine()
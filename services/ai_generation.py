@@ -0,0 +1,248 @@
+"""
+AI内容生成（PPT大纲、测验题目、教材）
+提示词完全由请求参数决定，生成结果经响应缓存；同步接口和后台任务共用这里的生成函数。
+
+每种生成类型由 (参数校验函数, 生成函数) 组成：
+校验函数在接收请求时调用，参数有误时抛出 ValueError；生成函数调用大模型并返回结果字典。
+"""
+import json
+
+from services.llm_cache import llm_cache
+from services.llm_client import llm_client, LLMError
+
+MAX_TEXTBOOK_CHAPTERS = 10
+
+QUIZ_TYPE_NAMES = {
+    'multiple_choice': '单选题',
+    'true_false': '判断题',
+    'short_answer': '简答题',
+    'fill_blank': '填空题'
+}
+
+
+def generate_cached(messages, temperature=0.7, max_tokens=2000, bypass=False):
+    """
+    带响应缓存的大模型调用
+
+    Args:
+        bypass: 跳过缓存读取，强制重新生成（新结果仍会写入缓存）
+
+    Returns:
+        tuple: (API响应结果, 是否命中缓存)
+    """
+    params = {
+        'model': llm_client.model,
+        'messages': messages,
+        'temperature': temperature,
+        'max_tokens': max_tokens
+    }
+
+    def produce():
+        result = llm_client.chat_completion(messages, temperature=temperature, max_tokens=max_tokens)
+        # 格式异常的响应不写入缓存
+        if not result.get('choices'):
+            raise LLMError("AI返回结果格式异常")
+        return result
+
+    return llm_cache.fetch(params, produce, bypass=bypass)
+
+
+def message_content(result):
+    """提取回复文本"""
+    return result.get('choices', [{}])[0].get('message', {}).get('content', '')
+
+
+# ==================== PPT大纲 ====================
+
+def ppt_params(data):
+    topic = data.get('topic', '')
+    if not topic:
+        raise ValueError('主题不能为空')
+    return {
+        'topic': topic,
+        'slides': data.get('slides', 8),
+        'style': data.get('style', 'professional'),
+        'no_cache': bool(data.get('no_cache'))
+    }
+
+
+def generate_ppt(params):
+    topic, slides, style = params['topic'], params['slides'], params['style']
+    prompt = f"""请为主题"{topic}"生成一个{slides}页的PPT大纲。
+
+要求：
+1. 包含封面、目录、内容页和总结页
+2. 每页需要标题和要点内容（3-5个要点）
+3. 风格：{style}
+4. 内容要专业、清晰、有逻辑性
+
+请以JSON格式输出，格式如下：
+{{
+  "title": "PPT标题",
+  "slides": [
+    {{
+      "page": 1,
+      "title": "页面标题",
+      "content": ["要点1", "要点2", "要点3"],
+      "notes": "备注说明"
+    }}
+  ]
+}}"""
+
+    messages = [{"role": "user", "content": prompt}]
+    result, cached = generate_cached(messages, temperature=0.7, max_tokens=2000, bypass=params.get('no_cache'))
+    return {
+        'topic': topic,
+        'outline': message_content(result),
+        'slides_count': slides,
+        'style': style,
+        'cached': cached
+    }
+
+
+# ==================== 测验题目 ====================
+
+def quiz_params(data):
+    content = data.get('content', '')
+    if not content:
+        raise ValueError('内容不能为空')
+    return {
+        'content': content,
+        'type': data.get('type', 'multiple_choice'),
+        'num': data.get('num', 5),
+        'difficulty': data.get('difficulty', 'medium'),
+        'no_cache': bool(data.get('no_cache'))
+    }
+
+
+def generate_quiz(params):
+    content, question_type = params['content'], params['type']
+    num_questions, difficulty = params['num'], params['difficulty']
+    type_name = QUIZ_TYPE_NAMES.get(question_type, '单选题')
+    prompt = f"""请基于以下内容生成{num_questions}道{type_name}（难度：{difficulty}）：
+
+内容：{content}
+
+要求：
+1. 题目要准确、清晰、有针对性
+2. 选项要合理，干扰项要有一定迷惑性
+3. 提供正确答案和解析
+4. 以JSON格式输出
+
+输出格式：
+{{
+  "questions": [
+    {{
+      "id": 1,
+      "type": "{question_type}",
+      "question": "题目内容",
+      "options": ["A. 选项1", "B. 选项2", "C. 选项3", "D. 选项4"],
+      "answer": "A",
+      "explanation": "答案解析"
+    }}
+  ]
+}}"""
+
+    messages = [{"role": "user", "content": prompt}]
+    result, cached = generate_cached(messages, temperature=0.5, max_tokens=2000, bypass=params.get('no_cache'))
+    return {
+        'content': content,
+        'questions': message_content(result),
+        'type': question_type,
+        'difficulty': difficulty,
+        'cached': cached
+    }
+
+
+# ==================== 教材 ====================
+
+TEXTBOOK_SYSTEM_PROMPT = """你是一个教育专家和课程设计师，擅长设计结构化的教学材料。
+请根据用户需求生成完整的教材大纲，包含章节结构、学习目标、核心内容和练习题。
+请以JSON格式返回，格式如下：
+{
+    "title": "教材标题",
+    "subject": "学科主题",
+    "level": "难度级别",
+    "chapters": [
+        {
+            "chapter": 1,
+            "title": "章节标题",
+            "objectives": ["学习目标1", "学习目标2"],
+            "content": ["主要内容点1", "主要内容点2"],
+            "examples": ["示例1", "示例2"],
+            "exercises": [
+                {
+                    "question": "问题描述",
+                    "type": "choice|code|essay",
+                    "options": ["选项A", "选项B"]
+                }
+            ]
+        }
+    ]
+}
+确保JSON格式正确，不要包含其他文本。"""
+
+
+def textbook_params(data):
+    subject = str(data.get('subject', '') or '').strip()
+    if not subject:
+        raise ValueError('教材主题不能为空')
+    try:
+        chapters = int(data.get('chapters', 3))
+    except (TypeError, ValueError):
+        raise ValueError('chapters 必须是整数')
+    return {
+        'subject': subject,
+        'level': data.get('level', '初级'),
+        'chapters': max(1, min(chapters, MAX_TEXTBOOK_CHAPTERS)),
+        'no_cache': bool(data.get('no_cache'))
+    }
+
+
+def parse_json_object(content):
+    """从回复文本中提取第一个 { 到最后一个 } 之间的JSON对象，解析失败返回None"""
+    start, end = content.find('{'), content.rfind('}') + 1
+    if start < 0 or end <= start:
+        return None
+    try:
+        return json.loads(content[start:end])
+    except ValueError:
+        return None
+
+
+def generate_textbook(params):
+    subject, level, chapters = params['subject'], params['level'], params['chapters']
+    user_prompt = f"""请为"{subject}"课程设计一个{level}级别的智能教材，要求：
+1. 总共{chapters}章，内容由浅入深
+2. 每章包含：章节标题、学习目标、核心内容、示例、练习题
+3. 适合{level}学习者
+4. 注重实践性和互动性
+5. 包含教学建议和评估方法
+请返回JSON格式的教材大纲。"""
+
+    messages = [
+        {"role": "system", "content": TEXTBOOK_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+    result, cached = generate_cached(messages, temperature=0.7, max_tokens=4000, bypass=params.get('no_cache'))
+    content = message_content(result)
+    textbook = parse_json_object(content)
+    if textbook is not None and not ('title' in textbook and 'chapters' in textbook):
+        textbook = None
+    return {
+        'subject': subject,
+        'level': level,
+        'chapters': chapters,
+        # 解析失败时为None，前端使用原始文本
+        'textbook': textbook,
+        'content': content,
+        'cached': cached
+    }
+
+
+# 生成类型 -> (参数校验函数, 生成函数)
+GENERATORS = {
+    'ppt': (ppt_params, generate_ppt),
+    'quiz': (quiz_params, generate_quiz),
+    'textbook': (textbook_params, generate_textbook)
+}
@@ -0,0 +1,168 @@
+"""
+AI生成任务队列
+
+PPT、测验题目和教材生成可能要等待上游30秒，在请求线程中执行会占满Web工作线程。
+任务模式下接口只写入一条 ai_jobs 记录并立即返回任务ID，由本模块按任务类型划分的后台线程池执行，
+各类型的并发数由 AI_JOB_CONCURRENCY 配置（如 "ppt:2,quiz:2,textbook:1"）。
+ai_jobs 表本身就是持久化队列：线程池启动时以及空闲时会把 queued 状态的任务，
+和 running 超过 AI_JOB_STALE_AFTER 秒的任务（执行它的进程已中断）重新入队。
+"""
+import json
+import queue
+import threading
+import uuid
+from datetime import datetime
+
+from models import db, AIJob
+from services.ai_generation import GENERATORS
+from services.grading_queue import SubmissionNotifier, StaleRecovery, reset_stale_claims, DEFAULT_STALE_AFTER
+
+DEFAULT_CONCURRENCY = 'ppt:2,quiz:2,textbook:1'
+
+
+def parse_concurrency(value):
+    """解析 "类型:并发数,..." 配置，未配置的类型并发数为1"""
+    concurrency = {job_type: 1 for job_type in GENERATORS}
+    for part in str(value or '').split(','):
+        job_type, _, count = part.partition(':')
+        job_type = job_type.strip()
+        if job_type in concurrency and count.strip():
+            concurrency[job_type] = max(1, int(count))
+    return concurrency
+
+
+class AIJobQueue:
+    """按任务类型划分的AI任务线程池（首次使用时启动，并恢复未完成的任务）"""
+
+    def __init__(self):
+        self.app = None
+        self.notifier = SubmissionNotifier()
+        self.concurrency = parse_concurrency(DEFAULT_CONCURRENCY)
+        self._queues = {job_type: queue.Queue() for job_type in GENERATORS}
+        self._lock = threading.Lock()
+        self._started = False
+        self.recovery = StaleRecovery(self._recover_pending)
+
+    def init_app(self, app):
+        self.app = app
+        self.concurrency = parse_concurrency(app.config.get('AI_JOB_CONCURRENCY', DEFAULT_CONCURRENCY))
+        self.recovery.stale_after = app.config.get('AI_JOB_STALE_AFTER', DEFAULT_STALE_AFTER)
+        app.extensions['ai_job_queue'] = self
+
+    def submit(self, job_type, data):
+        """
+        校验参数并创建任务（调用方无需再提交事务）
+
+        Raises:
+            ValueError: 未知任务类型或参数有误
+        """
+        if job_type not in GENERATORS:
+            raise ValueError(f"不支持的任务类型: {job_type}，可选: {', '.join(GENERATORS)}")
+        validate, _ = GENERATORS[job_type]
+        params = validate(data or {})
+
+        # 先启动（恢复遗留任务），再写入新任务，避免新任务被恢复逻辑重复入队
+        self.ensure_started()
+        job = AIJob(
+            id=uuid.uuid4().hex,
+            job_type=job_type,
+            status=AIJob.STATUS_QUEUED,
+            params=json.dumps(params, ensure_ascii=False)
+        )
+        db.session.add(job)
+        db.session.commit()
+        self._queues[job_type].put(job.id)
+        return job
+
+    def ensure_started(self):
+        """启动工作线程（只执行一次）"""
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self.recovery.run()
+            for job_type, count in self.concurrency.items():
+                for index in range(count):
+                    threading.Thread(
+                        target=self._worker,
+                        args=(job_type,),
+                        name=f'ai-job-{job_type}-{index}',
+                        daemon=True
+                    ).start()
+            self._started = True
+
+    def pending_counts(self):
+        return {job_type: job_queue.qsize() for job_type, job_queue in self._queues.items()}
+
+    def _recover_pending(self):
+        """将中断遗留的任务重新入队"""
+        with self.app.app_context():
+            try:
+                reset_stale_claims(
+                    AIJob, AIJob.started_at, AIJob.STATUS_RUNNING, AIJob.STATUS_QUEUED, self.recovery.stale_after
+                )
+                db.session.commit()
+                pending = db.session.query(AIJob.id, AIJob.job_type).filter_by(
+                    status=AIJob.STATUS_QUEUED
+                ).order_by(AIJob.created_at).all()
+            except Exception as e:
+                db.session.rollback()
+                print(f"恢复未完成的AI任务失败: {e}")
+                return
+
+        recovered = 0
+        for job_id, job_type in pending:
+            if job_type in self._queues:
+                self._queues[job_type].put(job_id)
+                recovered += 1
+        if recovered:
+            print(f"✅ 已恢复 {recovered} 个未完成的AI任务")
+
+    def _worker(self, job_type):
+        job_queue = self._queues[job_type]
+        while True:
+            try:
+                job_id = job_queue.get(timeout=self.recovery.stale_after)
+            except queue.Empty:
+                self.recovery.run_if_due()
+                continue
+            try:
+                with self.app.app_context():
+                    self._run(job_id)
+                    db.session.remove()
+            except Exception as e:
+                print(f"AI任务线程处理任务 {job_id} 异常: {e}")
+            finally:
+                job_queue.task_done()
+                self.notifier.notify(job_id)
+
+    def _run(self, job_id):
+        # 条件更新抢占任务，避免同一个任务被重复执行
+        claimed = AIJob.query.filter_by(id=job_id, status=AIJob.STATUS_QUEUED).update({
+            'status': AIJob.STATUS_RUNNING,
+            'started_at': datetime.utcnow(),
+            'attempts': AIJob.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            return
+        self.notifier.notify(job_id)
+
+        job = db.session.get(AIJob, job_id)
+        _, generate = GENERATORS[job.job_type]
+        try:
+            result = generate(json.loads(job.params))
+        except Exception as e:
+            print(f"AI任务 {job_id}（{job.job_type}）失败: {e}")
+            job.status = AIJob.STATUS_FAILED
+            job.error = str(e)
+        else:
+            job.status = AIJob.STATUS_SUCCEEDED
+            job.result = json.dumps(result, ensure_ascii=False)
+            job.error = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+
+ai_job_queue = AIJobQueue()
@@ -0,0 +1,237 @@
+"""
+批量批改导入
+纸质考试录入的答题表（JSONL/CSV）逐行流式读取，不把整个文件读入内存。每批学生：
+- 客观题本地批改，主观题汇总后分批调用BERT批量接口；
+- 提交记录和单题结果批量写入，每批一个事务；
+- 产出一条进度记录，供接口以NDJSON流式返回。
+
+JSONL 每行: {"user_id": 1 或 "username": "stu", "answers": {"objective": {...}, "subjective": {...}}, "duration": 0}
+CSV 表头: user_id 或 username、duration（可选），以及 objective_<题号> / subjective_<题号> 答案列
+"""
+import csv
+import json
+import time
+
+from sqlalchemy import insert
+
+from models import db, User, QuizSubmission, QuizAnswer
+from services.grading import (
+    new_results, find_question, grade_objective_answers, score_subjective_batch,
+    add_subjective_result, finalize_results, apply_results_to_submission
+)
+from services.quiz_answers import build_answer_rows
+from services.quiz_stats import record_graded_submission
+
+SUPPORTED_FORMATS = ('jsonl', 'csv')
+DEFAULT_BATCH_SIZE = 200
+MAX_BATCH_SIZE = 1000
+
+
+def detect_format(filename=None, explicit=None):
+    """根据显式参数或文件扩展名确定格式，无法识别时返回None"""
+    fmt = (explicit or '').lower()
+    if not fmt and filename:
+        fmt = filename.rsplit('.', 1)[-1].lower()
+    if fmt in ('json', 'ndjson'):
+        fmt = 'jsonl'
+    return fmt if fmt in SUPPORTED_FORMATS else None
+
+
+def _record_from_csv(row):
+    answers = {'objective': {}, 'subjective': {}}
+    for column, value in row.items():
+        if not column or value is None or value.strip() == '':
+            continue
+        prefix, _, q_id = column.strip().partition('_')
+        if prefix in answers and q_id:
+            answers[prefix][q_id] = value.strip()
+    return {
+        'user_id': row.get('user_id'),
+        'username': row.get('username'),
+        'duration': row.get('duration'),
+        'answers': answers
+    }
+
+
+def iter_answer_rows(stream, fmt):
+    """
+    逐行解析答题文件
+
+    Yields:
+        tuple: (行号, 记录字典, 错误信息)，解析失败时记录为None
+    """
+    if fmt == 'csv':
+        for line_no, row in enumerate(csv.DictReader(stream), 2):
+            yield line_no, _record_from_csv(row), None
+        return
+
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f'JSON解析失败: {e}'
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, '每行应为一个JSON对象'
+            continue
+        yield line_no, record, None
+
+
+def _resolve_users(records):
+    """批量查询本批记录涉及的用户，返回 (ID集合, 用户名->ID)"""
+    user_ids = set()
+    usernames = set()
+    for _, record in records:
+        if record.get('user_id') not in (None, ''):
+            try:
+                user_ids.add(int(record['user_id']))
+            except (TypeError, ValueError):
+                pass
+        elif record.get('username'):
+            usernames.add(str(record['username']))
+
+    known_ids = set()
+    if user_ids:
+        known_ids = {user_id for (user_id,) in db.session.query(User.id).filter(User.id.in_(user_ids))}
+    by_name = {}
+    if usernames:
+        by_name = dict(db.session.query(User.username, User.id).filter(User.username.in_(usernames)))
+    return known_ids, by_name
+
+
+def _user_id_for(record, known_ids, by_name):
+    if record.get('user_id') not in (None, ''):
+        try:
+            user_id = int(record['user_id'])
+        except (TypeError, ValueError):
+            return None
+        return user_id if user_id in known_ids else None
+    return by_name.get(str(record.get('username') or ''))
+
+
+def _grade_batch(records, quiz_type):
+    """
+    批改并写入一批记录
+
+    Returns:
+        tuple: (成功数, 错误列表[{'line', 'message'}])
+    """
+    errors = []
+    known_ids, by_name = _resolve_users(records)
+
+    graded = []
+    items = []
+    targets = []
+    for line_no, record in records:
+        user_id = _user_id_for(record, known_ids, by_name)
+        if user_id is None:
+            errors.append({'line': line_no, 'message': '用户不存在'})
+            continue
+        answers = record.get('answers') or {}
+        if not isinstance(answers, dict):
+            errors.append({'line': line_no, 'message': '答案格式错误'})
+            continue
+        objective_answers = answers.get('objective') or {}
+        subjective_answers = answers.get('subjective') or {}
+        if not isinstance(objective_answers, dict) or not isinstance(subjective_answers, dict):
+            errors.append({'line': line_no, 'message': '答案格式错误'})
+            continue
+
+        results = new_results(objective_answers, subjective_answers)
+        grade_objective_answers(objective_answers, results)
+        for q_id, answer in subjective_answers.items():
+            question = find_question(q_id, 'subjective')
+            if question:
+                items.append((answer, question))
+                targets.append((results, q_id, answer, question))
+        graded.append((line_no, user_id, record, answers, results, len(subjective_answers)))
+
+    # 整批主观题一起评分
+    for (results, q_id, answer, question), scored in zip(targets, score_subjective_batch(items)):
+        add_subjective_result(results, q_id, answer, question, *scored)
+
+    if not graded:
+        return 0, errors
+
+    try:
+        submissions = []
+        for _, user_id, record, answers, results, subjective_count in graded:
+            finalize_results(results)
+            try:
+                duration = int(record.get('duration') or 0)
+            except (TypeError, ValueError):
+                duration = 0
+            submission = QuizSubmission(
+                user_id=user_id,
+                quiz_type=quiz_type,
+                answers=json.dumps(answers),
+                duration=duration
+            )
+            apply_results_to_submission(submission, results, subjective_count)
+            submissions.append(submission)
+
+        db.session.add_all(submissions)
+        db.session.flush()
+
+        answer_rows = []
+        for submission, (_, user_id, _, _, results, _) in zip(submissions, graded):
+            answer_rows.extend(build_answer_rows(submission.id, user_id, results, submission.submitted_at))
+            record_graded_submission(user_id, results, quiz_type)
+        if answer_rows:
+            db.session.execute(insert(QuizAnswer), answer_rows)
+
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"批量批改写入失败: {e}")
+        errors.extend({'line': item[0], 'message': f'写入失败: {e}'} for item in graded)
+        return 0, errors
+    finally:
+        # 释放本批对象，避免大文件导入时内存增长
+        db.session.expunge_all()
+
+    return len(submissions), errors
+
+
+def bulk_grade(rows, quiz_type='static', batch_size=DEFAULT_BATCH_SIZE):
+    """
+    分批批改答题记录
+
+    Args:
+        rows: iter_answer_rows 产出的 (行号, 记录, 错误信息)
+        quiz_type: 写入提交记录的测验类型
+        batch_size: 每批学生数
+
+    Yields:
+        dict: 进度事件（error / progress / done）
+    """
+    started = time.perf_counter()
+    totals = {'processed': 0, 'graded': 0, 'failed': 0}
+
+    def flush(batch):
+        graded, errors = _grade_batch(batch, quiz_type)
+        totals['processed'] += len(batch)
+        totals['graded'] += graded
+        totals['failed'] += len(batch) - graded
+        for error in errors:
+            yield {'event': 'error', **error}
+        yield {'event': 'progress', **totals, 'elapsed': round(time.perf_counter() - started, 2)}
+
+    batch = []
+    for line_no, record, error in rows:
+        if error:
+            totals['processed'] += 1
+            totals['failed'] += 1
+            yield {'event': 'error', 'line': line_no, 'message': error}
+            continue
+        batch.append((line_no, record))
+        if len(batch) >= batch_size:
+            yield from flush(batch)
+            batch = []
+    if batch:
+        yield from flush(batch)
+
+    yield {'event': 'done', **totals, 'elapsed': round(time.perf_counter() - started, 2)}
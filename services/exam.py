@@ -0,0 +1,243 @@
+"""
+考试场次服务
+考试开始时所有学生在同一秒请求试卷，逐个查库渲染会拖垮SQLite。这里：
+- 每场考试只加载并渲染一次：题目（去掉答案和解析）预编码为JSON片段，缓存在进程内，
+  题库版本或考试的 updated_at 变化后重新渲染（考试记录每隔 QUESTION_BANK_CHECK_INTERVAL 秒核对一次）；
+- 每个学生的题目顺序由 (考试种子, 学生ID) 确定性地打乱，试卷响应由片段拼接而成，开考不写数据库；
+- 作答自动保存先写入内存缓冲区（同一学生只保留最新一份），后台线程定期批量写入草稿表。
+"""
+import atexit
+import json
+import random
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import insert
+
+from models import db, ExamSession, ExamAnswerDraft
+from services.question_bank import question_bank
+
+# 试卷中保留的题目字段（不含答案、参考答案和解析）
+PAPER_FIELDS = ('id', 'type', 'anchor', 'question', 'options', 'knowledge_point', 'difficulty')
+
+
+class RenderedExam:
+    """渲染好的考试试卷"""
+
+    def __init__(self, exam, bank_version):
+        self.id = exam.id
+        self.version = exam.updated_at
+        self.bank_version = bank_version
+        self.checked_at = time.monotonic()
+        self.seed = exam.seed
+        self.starts_at = exam.starts_at
+        self.ends_at = exam.ends_at
+        self.meta = json.dumps(exam.to_dict(), ensure_ascii=False).encode('utf-8')
+
+        question_ids = json.loads(exam.question_ids)
+        # 题型 -> 预编码的题目JSON片段
+        self.fragments = {}
+        for question_type in ('objective', 'subjective'):
+            fragments = []
+            for quiz_id in question_ids.get(question_type, []):
+                question = question_bank.get(quiz_id, question_type)
+                if not question:
+                    continue
+                paper_question = {field: question.get(field) for field in PAPER_FIELDS}
+                paper_question['type'] = question_type
+                fragments.append(json.dumps(paper_question, ensure_ascii=False).encode('utf-8'))
+            self.fragments[question_type] = fragments
+
+    def is_open(self, now=None):
+        now = now or datetime.utcnow()
+        if self.starts_at and now < self.starts_at:
+            return False
+        if self.ends_at and now > self.ends_at:
+            return False
+        return True
+
+    def paper_for(self, user_id):
+        """按 (种子, 学生ID) 确定性乱序后拼接的试卷响应体"""
+        rng = random.Random(f'{self.seed}:{user_id}')
+        parts = [b'{"success":true,"data":{"exam":', self.meta]
+        for question_type in ('objective', 'subjective'):
+            fragments = self.fragments[question_type]
+            order = list(range(len(fragments)))
+            rng.shuffle(order)
+            parts.append(f',"{question_type}":['.encode())
+            parts.append(b','.join(fragments[i] for i in order))
+            parts.append(b']')
+        parts.append(b'}}')
+        return b''.join(parts)
+
+
+class ExamPaperCache:
+    """进程内考试试卷缓存（同一场考试并发请求只加载一次，题库或考试修改后重新渲染）"""
+
+    def __init__(self):
+        self._exams = {}
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, rendered, bank_version):
+        if rendered.bank_version != bank_version:
+            return False
+        interval = current_app.config.get('QUESTION_BANK_CHECK_INTERVAL', 1.0)
+        if time.monotonic() - rendered.checked_at < interval:
+            return True
+        updated_at = db.session.query(ExamSession.updated_at).filter_by(id=rendered.id).scalar()
+        if updated_at is None or updated_at != rendered.version:
+            return False
+        rendered.checked_at = time.monotonic()
+        return True
+
+    def get(self, exam_id):
+        """获取渲染好的试卷，考试不存在时返回None"""
+        bank_version = question_bank.snapshot().version
+        rendered = self._exams.get(exam_id)
+        if rendered is not None and self._is_fresh(rendered, bank_version):
+            return rendered
+        with self._lock:
+            rendered = self._exams.get(exam_id)
+            if rendered is None or not self._is_fresh(rendered, bank_version):
+                exam = db.session.get(ExamSession, exam_id)
+                if exam is None:
+                    self._exams.pop(exam_id, None)
+                    return None
+                rendered = RenderedExam(exam, bank_version)
+                self._exams[exam_id] = rendered
+            return rendered
+
+    def bust(self, exam_id):
+        with self._lock:
+            self._exams.pop(exam_id, None)
+
+
+class DraftBuffer:
+    """
+    作答草稿的后写缓冲区
+
+    save() 只写内存；后台线程每隔 EXAM_AUTOSAVE_INTERVAL 秒，
+    或缓冲数量达到 EXAM_AUTOSAVE_BATCH 时，把缓冲区内容分批写入 exam_answer_drafts。
+    """
+
+    def __init__(self):
+        self.app = None
+        self._pending = {}  # (exam_id, user_id) -> (answers_json, saved_at)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['exam_draft_buffer'] = self
+        # 进程正常退出时写入剩余草稿
+        atexit.register(self.flush)
+
+    def save(self, exam_id, user_id, answers):
+        with self._lock:
+            self._pending[(exam_id, user_id)] = (json.dumps(answers, ensure_ascii=False), datetime.utcnow())
+            size = len(self._pending)
+        self._ensure_started()
+        if size >= self.app.config.get('EXAM_AUTOSAVE_BATCH', 500):
+            self._wakeup.set()
+
+    def get(self, exam_id, user_id):
+        """读取草稿（优先缓冲区中尚未写入的最新版本）"""
+        with self._lock:
+            pending = self._pending.get((exam_id, user_id))
+        if pending is not None:
+            return json.loads(pending[0])
+        draft = ExamAnswerDraft.query.filter_by(exam_id=exam_id, user_id=user_id).first()
+        return json.loads(draft.answers) if draft and draft.answers else None
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """将缓冲区写入数据库，返回写入条数"""
+        if self.app is None:
+            return 0
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        batch_size = self.app.config.get('EXAM_AUTOSAVE_BATCH', 500)
+        items = list(pending.items())
+        written = 0
+        with self.app.app_context():
+            for start in range(0, len(items), batch_size):
+                batch = items[start:start + batch_size]
+                try:
+                    _upsert_drafts(batch)
+                    db.session.commit()
+                    written += len(batch)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"考试草稿批量写入失败: {e}")
+                    # 放回缓冲区下次重试（期间已有更新的草稿则保留更新的版本）
+                    with self._lock:
+                        for key, value in batch:
+                            self._pending.setdefault(key, value)
+            db.session.remove()
+        return written
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='exam-draft-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.app.config.get('EXAM_AUTOSAVE_INTERVAL', 2.0))
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"考试草稿写入线程异常: {e}")
+                time.sleep(1)
+
+
+def _upsert_drafts(batch):
+    """批量插入或更新草稿（依赖 exam_id + user_id 唯一约束）"""
+    rows = [
+        {'exam_id': exam_id, 'user_id': user_id, 'answers': answers, 'saved_at': saved_at}
+        for (exam_id, user_id), (answers, saved_at) in batch
+    ]
+    table = ExamAnswerDraft.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=['exam_id', 'user_id'],
+            set_={'answers': statement.excluded.answers, 'saved_at': statement.excluded.saved_at}
+        )
+        db.session.execute(statement, rows)
+    elif dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        statement = dialect_insert(table)
+        statement = statement.on_duplicate_key_update(
+            answers=statement.inserted.answers, saved_at=statement.inserted.saved_at
+        )
+        db.session.execute(statement, rows)
+    else:
+        for row in rows:
+            updated = ExamAnswerDraft.query.filter_by(exam_id=row['exam_id'], user_id=row['user_id']).update(
+                {'answers': row['answers'], 'saved_at': row['saved_at']}, synchronize_session=False
+            )
+            if not updated:
+                db.session.execute(insert(table).values(**row))
+
+
+exam_papers = ExamPaperCache()
+draft_buffer = DraftBuffer()
@@ -0,0 +1,91 @@
+"""
+主观题评分结果缓存
+
+大量学生会对同一道简答题提交完全相同（或仅空白不同）的答案，每次都请求BERT服务是浪费。
+按 (题目ID, 参考答案指纹, 规范化答案, 评分版本) 缓存语义评分结果，重复答案只需一次哈希查找。
+缓存为进程内LRU，容量有上限，并统计命中率。
+"""
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from services.lexical_scorer import reference_hash
+
+# 语义评分规则版本，评分方式（模型、分数换算）调整时递增以使缓存失效
+GRADER_VERSION = 1
+
+DEFAULT_CACHE_SIZE = 10000
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_answer(text):
+    """规范化答案文本：全角/兼容字符归一（NFKC）并合并空白"""
+    text = unicodedata.normalize('NFKC', str(text or ''))
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+class GradeCache:
+    """线程安全的LRU评分缓存"""
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def init_app(self, app):
+        self.max_size = app.config.get('GRADE_CACHE_SIZE', DEFAULT_CACHE_SIZE)
+        app.extensions['grade_cache'] = self
+
+    @staticmethod
+    def make_key(question, normalized_answer):
+        return (
+            question.get('id'),
+            reference_hash(question.get('reference_answer') or ''),
+            normalized_answer,
+            GRADER_VERSION
+        )
+
+    def get(self, key):
+        """命中时返回 (similarity, score, feedback)，否则返回None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0
+            }
+
+
+grade_cache = GradeCache()
@@ -0,0 +1,268 @@
+"""
+测验批改服务
+客观题按标准答案比对；主观题调用BERT语义服务评分，服务不可用时降级为词法TF-IDF评分
+"""
+import json
+from datetime import datetime
+
+import requests
+from flask import current_app
+
+from services.question_bank import question_bank
+from services.quiz_stats import record_graded_submission
+from services.quiz_answers import record_answers
+from services.lexical_scorer import score_with_fallback
+from services.grade_cache import grade_cache, normalize_answer
+
+# 每道题满分
+QUESTION_SCORE = 10
+
+
+def new_results(objective_answers, subjective_answers):
+    """创建空的批改结果结构"""
+    return {
+        'objective': {},
+        'subjective': {},
+        'summary': {
+            'total_score': 0,
+            'objective_score': 0,
+            'subjective_score': 0,
+            'correct_count': 0,
+            'total_count': len(objective_answers) + len(subjective_answers)
+        }
+    }
+
+
+def find_question(q_id, question_type):
+    """查找题目（题库缓存，数据库题目优先，找不到时使用静态题库），返回只读字典或None"""
+    return question_bank.get(q_id, question_type)
+
+
+def grade_objective_answers(objective_answers, results):
+    """批改客观题，结果写入results"""
+    for q_id, answer in objective_answers.items():
+        try:
+            question = find_question(q_id, 'objective')
+            if not question:
+                continue
+
+            is_correct = (str(answer).upper() == question['answer'])
+            results['objective'][q_id] = {
+                'user_answer': answer,
+                'correct_answer': question['answer'],
+                'is_correct': is_correct,
+                'explanation': question.get('explanation'),
+                'score': QUESTION_SCORE if is_correct else 0,
+                'max_score': QUESTION_SCORE
+            }
+
+            if is_correct:
+                results['summary']['objective_score'] += QUESTION_SCORE
+                results['summary']['correct_count'] += 1
+        except Exception as e:
+            print(f"批改客观题 {q_id} 失败: {e}")
+
+
+# 空白答案直接记0分，不请求BERT服务（空文本的向量与任何参考答案都有一定相似度）
+BLANK_ANSWER_RESULT = (0.0, 0, '未作答')
+
+
+def score_subjective_answer(answer, question):
+    """
+    为单道主观题评分（相同题目的相同答案命中评分缓存时不再请求BERT服务）
+
+    Returns:
+        tuple: (similarity, score, feedback)
+    """
+    reference_answer = question.get('reference_answer') or ''
+    answer = normalize_answer(answer)
+    if not answer:
+        return BLANK_ANSWER_RESULT
+    cache_key = grade_cache.make_key(question, answer)
+    cached = grade_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        bert_url = current_app.config.get('BERT_SERVICE_URL', 'http://localhost:5001')
+        bert_response = requests.post(
+            f'{bert_url}/api/similarity',
+            json={
+                'text1': answer,
+                'text2': reference_answer
+            },
+            timeout=current_app.config.get('BERT_SERVICE_TIMEOUT', 10)
+        )
+
+        if bert_response.status_code != 200:
+            raise Exception("BERT服务响应错误")
+
+        bert_data = bert_response.json()
+        similarity = bert_data.get('similarity', 0)
+        score = round(similarity * QUESTION_SCORE, 2)
+        feedback = bert_data.get('analysis', '')
+        # 只缓存语义评分结果；降级评分本身开销很小，且BERT恢复后应重新评分
+        grade_cache.put(cache_key, (similarity, score, feedback))
+    except Exception as bert_error:
+        print(f"BERT服务不可用，使用词法评分: {bert_error}")
+        similarity, score, feedback = score_with_fallback(answer, question, QUESTION_SCORE)
+
+    return similarity, score, feedback
+
+
+def _failed_row(row):
+    """BERT批量接口中计算失败的单条结果（旧版服务失败时返回 similarity=0、analysis='计算失败'）"""
+    return (
+        not isinstance(row, dict)
+        or row.get('error')
+        or not isinstance(row.get('similarity'), (int, float))
+        or row.get('analysis') == '计算失败'
+    )
+
+
+def score_subjective_batch(items):
+    """
+    批量为主观题评分（批量导入使用）
+
+    空白答案直接记0分；其余先查评分缓存，未命中的答案去重后按 BERT_BATCH_SIZE 分批调用BERT批量接口，
+    某一批请求失败时该批降级为词法评分。
+
+    Args:
+        items: [(answer, question), ...]
+
+    Returns:
+        list: 与items一一对应的 (similarity, score, feedback)
+    """
+    scored = [None] * len(items)
+    pending = {}
+    for i, (answer, question) in enumerate(items):
+        answer = normalize_answer(answer)
+        if not answer:
+            scored[i] = BLANK_ANSWER_RESULT
+            continue
+        cache_key = grade_cache.make_key(question, answer)
+        cached = grade_cache.get(cache_key)
+        if cached is not None:
+            scored[i] = cached
+        else:
+            pending.setdefault(cache_key, (answer, question, []))[2].append(i)
+
+    bert_url = current_app.config.get('BERT_SERVICE_URL', 'http://localhost:5001')
+    timeout = current_app.config.get('BERT_SERVICE_TIMEOUT', 10)
+    batch_size = current_app.config.get('BERT_BATCH_SIZE', 256)
+    entries = list(pending.items())
+    for start in range(0, len(entries), batch_size):
+        batch = entries[start:start + batch_size]
+        try:
+            bert_response = requests.post(
+                f'{bert_url}/api/batch-similarity',
+                json={
+                    'student_answers': [answer for _, (answer, _, _) in batch],
+                    'reference_answers': [question.get('reference_answer') or '' for _, (_, question, _) in batch]
+                },
+                # 批量请求按条数放宽超时
+                timeout=timeout * max(1, len(batch) // 32)
+            )
+            if bert_response.status_code != 200:
+                raise Exception("BERT服务响应错误")
+            bert_data = bert_response.json()
+            if bert_data.get('success') is False:
+                raise Exception(bert_data.get('message') or "BERT服务计算失败")
+            bert_results = bert_data.get('results', [])
+            if len(bert_results) != len(batch):
+                raise Exception("BERT服务返回数量不匹配")
+
+            for (cache_key, (answer, question, positions)), row in zip(batch, bert_results):
+                if _failed_row(row):
+                    # 单条计算失败时降级为词法评分，且不写入评分缓存
+                    value = score_with_fallback(answer, question, QUESTION_SCORE)
+                else:
+                    similarity = row['similarity']
+                    value = (similarity, round(similarity * QUESTION_SCORE, 2), row.get('analysis', ''))
+                    grade_cache.put(cache_key, value)
+                for i in positions:
+                    scored[i] = value
+        except Exception as bert_error:
+            print(f"BERT批量评分不可用，使用词法评分: {bert_error}")
+            for _, (answer, question, positions) in batch:
+                value = score_with_fallback(answer, question, QUESTION_SCORE)
+                for i in positions:
+                    scored[i] = value
+
+    return scored
+
+
+def grade_subjective_answers(subjective_answers, results):
+    """批改主观题，结果写入results"""
+    for q_id, answer in subjective_answers.items():
+        try:
+            question = find_question(q_id, 'subjective')
+            if not question:
+                continue
+
+            similarity, score, feedback = score_subjective_answer(answer, question)
+            add_subjective_result(results, q_id, answer, question, similarity, score, feedback)
+        except Exception as e:
+            print(f"批改主观题 {q_id} 失败: {e}")
+
+
+def add_subjective_result(results, q_id, answer, question, similarity, score, feedback):
+    """将一道主观题的评分写入results"""
+    results['subjective'][q_id] = {
+        'user_answer': answer,
+        'reference_answer': question.get('reference_answer'),
+        'similarity': similarity,
+        'score': score,
+        'max_score': QUESTION_SCORE,
+        'explanation': question.get('explanation'),
+        'feedback': feedback
+    }
+    results['summary']['subjective_score'] += score
+
+
+def finalize_results(results):
+    """计算总分"""
+    summary = results['summary']
+    summary['total_score'] = summary['objective_score'] + summary['subjective_score']
+    return results
+
+
+def apply_results_to_submission(submission, results, subjective_count):
+    """将批改结果写回提交记录"""
+    summary = results['summary']
+    submission.score = summary['total_score']
+    submission.similarity_score = summary['subjective_score'] / subjective_count if subjective_count else 0
+    submission.total_questions = summary['total_count']
+    submission.correct_questions = summary['correct_count']
+    submission.detailed_results = json.dumps(results)
+    submission.ai_feedback = '自动批改完成'
+    submission.graded_at = datetime.utcnow()
+    submission.status = submission.STATUS_GRADED
+    submission.grading_error = None
+
+
+def complete_submission(submission):
+    """
+    完成一条待批改提交的主观题批改（后台批改线程调用）
+
+    客观题结果在提交时已写入detailed_results，这里只补充主观题部分并更新统计。
+    """
+    answers = json.loads(submission.answers) if submission.answers else {}
+    objective_answers = answers.get('objective', {})
+    subjective_answers = answers.get('subjective', {})
+
+    if submission.detailed_results:
+        results = json.loads(submission.detailed_results)
+    else:
+        results = new_results(objective_answers, subjective_answers)
+        grade_objective_answers(objective_answers, results)
+
+    results['subjective'] = {}
+    results['summary']['subjective_score'] = 0
+    grade_subjective_answers(subjective_answers, results)
+    finalize_results(results)
+
+    apply_results_to_submission(submission, results, len(subjective_answers))
+    record_answers(submission, results)
+    record_graded_submission(submission.user_id, results, submission.quiz_type or 'static')
+    return results
@@ -0,0 +1,224 @@
+"""
+主观题后台批改队列
+
+提交接口只负责保存答案并同步批改客观题，主观题交由本模块的后台线程池处理。
+quiz_submissions 表本身就是持久化队列：待批改记录的状态为 pending，抢占后为 grading 并记录抢占时间。
+多个进程共用同一张表，因此只有 grading 超过 GRADING_STALE_AFTER 秒的记录才视为中断遗留（进程崩溃或重启），
+工作线程启动时以及空闲时会把这些记录和 pending 记录重新入队；重复入队无妨，条件更新保证只有一个线程能抢到。
+"""
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from models import db, QuizSubmission
+from services.grading import complete_submission
+
+DEFAULT_STALE_AFTER = 600
+
+
+def reset_stale_claims(model, claimed_at, running_status, queued_status, stale_after):
+    """
+    将抢占后超过 stale_after 秒仍未完成的记录改回待处理状态（调用方负责提交事务）
+
+    其他进程正在处理的记录抢占时间较新，不受影响；没有抢占时间的旧记录视为已超时。
+
+    Returns:
+        int: 恢复的记录数
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+    return model.query.filter(
+        model.status == running_status,
+        db.or_(claimed_at.is_(None), claimed_at < cutoff)
+    ).update({'status': queued_status}, synchronize_session=False)
+
+
+class StaleRecovery:
+    """
+    中断任务的恢复节奏：线程池启动时执行一次，之后由空闲的工作线程每隔 stale_after 秒执行一次，
+    以接管其他进程崩溃后遗留的任务。同一时刻只有一个线程执行恢复。
+    """
+
+    def __init__(self, recover):
+        self.recover = recover
+        self.stale_after = DEFAULT_STALE_AFTER
+        self._lock = threading.Lock()
+        self._last_run = 0.0
+
+    def run(self):
+        self._last_run = time.monotonic()
+        self.recover()
+
+    def run_if_due(self):
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() - self._last_run >= self.stale_after:
+                self.run()
+        finally:
+            self._lock.release()
+
+
+class SubmissionNotifier:
+    """
+    进程内的批改状态通知，供SSE推送等待使用
+
+    版本号单调递增，不在通知后立即删除（否则刚读到旧版本、尚未开始等待的SSE连接会错过唤醒）；
+    超过 retention 秒没有新通知的记录在下一次通知时清理，保留时间长于SSE连接的最长时长。
+    """
+
+    def __init__(self, retention=600):
+        self.retention = retention
+        self._condition = threading.Condition()
+        self._versions = {}
+        self._touched = {}
+        self._pruned_at = time.monotonic()
+
+    def notify(self, submission_id):
+        now = time.monotonic()
+        with self._condition:
+            self._versions[submission_id] = self._versions.get(submission_id, 0) + 1
+            self._touched[submission_id] = now
+            if now - self._pruned_at >= self.retention:
+                self._prune(now)
+            self._condition.notify_all()
+
+    def _prune(self, now):
+        for key, touched in list(self._touched.items()):
+            if now - touched >= self.retention:
+                del self._touched[key]
+                self._versions.pop(key, None)
+        self._pruned_at = now
+
+    def version(self, submission_id):
+        with self._condition:
+            return self._versions.get(submission_id, 0)
+
+    def wait(self, submission_id, last_version, timeout):
+        """等待提交状态变化，返回最新版本号（超时则返回原版本号）"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._versions.get(submission_id, 0) == last_version:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return self._versions.get(submission_id, 0)
+
+
+class GradingQueue:
+    """主观题批改线程池（首次入队时启动，并恢复未完成的批改任务）"""
+
+    def __init__(self):
+        self.app = None
+        self.notifier = SubmissionNotifier()
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._started = False
+        self.recovery = StaleRecovery(self._recover_pending)
+
+    def init_app(self, app):
+        self.app = app
+        self.recovery.stale_after = app.config.get('GRADING_STALE_AFTER', DEFAULT_STALE_AFTER)
+        app.extensions['grading_queue'] = self
+
+    @property
+    def enabled(self):
+        return bool(self.app and self.app.config.get('GRADING_ASYNC', True))
+
+    def enqueue(self, submission_id):
+        """提交一条待批改记录"""
+        self.ensure_started()
+        self._queue.put(submission_id)
+
+    def ensure_started(self):
+        """启动工作线程（只执行一次）"""
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self.recovery.run()
+            worker_count = max(1, int(self.app.config.get('GRADING_WORKERS', 4)))
+            for index in range(worker_count):
+                thread = threading.Thread(
+                    target=self._worker,
+                    name=f'grading-worker-{index}',
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            self._started = True
+
+    def pending_count(self):
+        return self._queue.qsize()
+
+    def _recover_pending(self):
+        """将中断遗留的批改任务重新入队"""
+        with self.app.app_context():
+            try:
+                reset_stale_claims(
+                    QuizSubmission, QuizSubmission.grading_started_at,
+                    QuizSubmission.STATUS_GRADING, QuizSubmission.STATUS_PENDING, self.recovery.stale_after
+                )
+                db.session.commit()
+                pending_ids = [
+                    row.id for row in db.session.query(QuizSubmission.id)
+                    .filter_by(status=QuizSubmission.STATUS_PENDING)
+                    .order_by(QuizSubmission.id)
+                ]
+            except Exception as e:
+                db.session.rollback()
+                print(f"恢复待批改提交失败: {e}")
+                return
+
+        for submission_id in pending_ids:
+            self._queue.put(submission_id)
+        if pending_ids:
+            print(f"✅ 已恢复 {len(pending_ids)} 条待批改提交")
+
+    def _worker(self):
+        while True:
+            try:
+                submission_id = self._queue.get(timeout=self.recovery.stale_after)
+            except queue.Empty:
+                self.recovery.run_if_due()
+                continue
+            try:
+                with self.app.app_context():
+                    self._grade(submission_id)
+            except Exception as e:
+                print(f"批改线程处理提交 {submission_id} 异常: {e}")
+            finally:
+                self._queue.task_done()
+                self.notifier.notify(submission_id)
+
+    def _grade(self, submission_id):
+        # 条件更新抢占任务，避免同一条记录被重复批改
+        claimed = QuizSubmission.query.filter_by(
+            id=submission_id, status=QuizSubmission.STATUS_PENDING
+        ).update({
+            'status': QuizSubmission.STATUS_GRADING,
+            'grading_started_at': datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            return
+        self.notifier.notify(submission_id)
+
+        submission = QuizSubmission.query.get(submission_id)
+        try:
+            complete_submission(submission)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"批改提交 {submission_id} 失败: {e}")
+            QuizSubmission.query.filter_by(id=submission_id).update({
+                'status': QuizSubmission.STATUS_FAILED,
+                'grading_error': str(e)
+            }, synchronize_session=False)
+            db.session.commit()
+
+
+grading_queue = GradingQueue()
@@ -0,0 +1,214 @@
+"""
+题目分析（经典测量理论）
+为每道题计算难度（p值）、区分度（校正后的点二列相关）和各选项的选择次数。
+
+统计任务从 quiz_answers 读取新作答（按ID水位增量处理），用 pandas 分组一次性求出每道题的
+充分统计量（作答数、得分和、平方和、与其余题目得分的交叉积和），与已保存的统计量相加后
+向量化重新计算指标。统计量可直接累加，因此增量更新与全量重算结果一致。
+"""
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, select
+
+from models import QuizAnswer, QuizItemStats, AnalyticsWatermark
+
+WATERMARK_NAME = 'item_analysis'
+
+# 题目质量提示阈值
+EASY_P_VALUE = 0.9
+HARD_P_VALUE = 0.2
+LOW_DISCRIMINATION = 0.2
+# 作答数不足时不给出提示
+MIN_RESPONSES = 20
+
+_SUM_COLUMNS = ['responses', 'sum_max', 'sum_x', 'sum_x2', 'sum_r', 'sum_r2', 'sum_xr']
+
+
+def load_answers(session, after_id=0, batch_size=200000):
+    """
+    按ID分批读取水位之后的作答（只取需要的列）
+
+    Returns:
+        tuple: (DataFrame, 最大作答ID)
+    """
+    table = QuizAnswer.__table__
+    columns = [table.c.id, table.c.submission_id, table.c.question_type, table.c.quiz_id,
+               table.c.answer, table.c.score, table.c.max_score]
+    frames = []
+    last_id = after_id
+    connection = session.connection()
+    while True:
+        rows = connection.execute(
+            select(*columns).where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        frames.append(pd.DataFrame.from_records(
+            rows, columns=['id', 'submission_id', 'question_type', 'quiz_id', 'answer', 'score', 'max_score']
+        ))
+    if not frames:
+        return None, last_id
+    return pd.concat(frames, ignore_index=True), last_id
+
+
+def sufficient_statistics(answers):
+    """
+    按题目分组计算充分统计量
+
+    Returns:
+        tuple: (统计量 DataFrame，索引为 (question_type, quiz_id)；选项计数 DataFrame)
+    """
+    score = answers['score'].fillna(0.0).astype(np.float64)
+    max_score = answers['max_score'].fillna(0.0).astype(np.float64)
+    # 同一次提交中其余题目的得分
+    rest = score.groupby(answers['submission_id']).transform('sum') - score
+
+    frame = pd.DataFrame({
+        'question_type': answers['question_type'],
+        'quiz_id': answers['quiz_id'].astype(np.int64),
+        'responses': 1,
+        'sum_max': max_score,
+        'sum_x': score,
+        'sum_x2': score * score,
+        'sum_r': rest,
+        'sum_r2': rest * rest,
+        'sum_xr': score * rest
+    })
+    sums = frame.groupby(['question_type', 'quiz_id'])[_SUM_COLUMNS].sum()
+
+    objective = answers[(answers['question_type'] == 'objective') & answers['answer'].notna()]
+    options = pd.DataFrame({
+        'quiz_id': objective['quiz_id'].astype(np.int64),
+        'option': objective['answer'].astype(str).str.strip().str.upper()
+    })
+    option_counts = options[options['option'] != ''].groupby(['quiz_id', 'option']).size()
+    return sums, option_counts
+
+
+def compute_indices(sums):
+    """由充分统计量向量化计算难度和区分度（方差为0时区分度为NaN）"""
+    n = sums['responses'].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_value = np.where(sums['sum_max'] > 0, sums['sum_x'] / sums['sum_max'], np.nan)
+        mean_x = sums['sum_x'].to_numpy() / n
+        mean_r = sums['sum_r'].to_numpy() / n
+        covariance = sums['sum_xr'].to_numpy() / n - mean_x * mean_r
+        variance_x = sums['sum_x2'].to_numpy() / n - mean_x ** 2
+        variance_r = sums['sum_r2'].to_numpy() / n - mean_r ** 2
+        denominator = np.sqrt(variance_x * variance_r)
+        discrimination = np.where(denominator > 1e-12, covariance / denominator, np.nan)
+    return p_value, np.clip(discrimination, -1.0, 1.0)
+
+
+def _merge_option_counts(existing, new_counts):
+    """合并已保存的选项计数（JSON）与新增计数"""
+    merged = dict(existing)
+    for option, count in new_counts.items():
+        merged[option] = merged.get(option, 0) + int(count)
+    return merged
+
+
+def update_item_statistics(session, full=False, batch_size=200000):
+    """
+    增量更新题目分析统计（full=True 时清空后全量重算）
+
+    Returns:
+        dict: 处理的作答数、更新的题目数、水位和耗时
+    """
+    started = time.perf_counter()
+    # 锁定水位行，避免两个统计任务同时处理同一批作答
+    watermark = session.query(AnalyticsWatermark).filter_by(name=WATERMARK_NAME).with_for_update().first()
+    if watermark is None:
+        watermark = AnalyticsWatermark(name=WATERMARK_NAME, last_id=0)
+        session.add(watermark)
+    after_id = 0 if full else (watermark.last_id or 0)
+
+    answers, last_id = load_answers(session, after_id, batch_size)
+    loaded_at = time.perf_counter()
+    if answers is None:
+        if full:
+            session.query(QuizItemStats).delete(synchronize_session=False)
+        watermark.last_id = last_id
+        session.commit()
+        return {'answers': 0, 'items': 0, 'watermark': last_id, 'load_seconds': round(loaded_at - started, 2)}
+
+    sums, option_counts = sufficient_statistics(answers)
+
+    # 与已保存的统计量相加
+    existing_options = {}
+    if not full:
+        existing = session.query(QuizItemStats).all()
+        if existing:
+            saved = pd.DataFrame.from_records(
+                [(row.question_type, row.quiz_id, *(getattr(row, column) or 0 for column in _SUM_COLUMNS))
+                 for row in existing],
+                columns=['question_type', 'quiz_id', *_SUM_COLUMNS]
+            ).set_index(['question_type', 'quiz_id'])
+            sums = sums.add(saved, fill_value=0)
+            existing_options = {
+                (row.question_type, row.quiz_id): json.loads(row.option_counts)
+                for row in existing if row.option_counts
+            }
+
+    p_value, discrimination = compute_indices(sums)
+
+    new_options = {}
+    for (quiz_id, option), count in option_counts.items():
+        new_options.setdefault(('objective', quiz_id), {})[option] = count
+
+    now = datetime.utcnow()
+    rows = []
+    for position, ((question_type, quiz_id), values) in enumerate(zip(sums.index, sums.itertuples(index=False))):
+        key = (question_type, int(quiz_id))
+        counts = _merge_option_counts(existing_options.get(key, {}), new_options.get(key, {}))
+        rows.append({
+            'question_type': question_type,
+            'quiz_id': int(quiz_id),
+            'responses': int(values.responses),
+            **{column: float(getattr(values, column)) for column in _SUM_COLUMNS[1:]},
+            'option_counts': json.dumps(counts, ensure_ascii=False) if counts else None,
+            'p_value': None if np.isnan(p_value[position]) else float(p_value[position]),
+            'discrimination': None if np.isnan(discrimination[position]) else float(discrimination[position]),
+            'updated_at': now
+        })
+    computed_at = time.perf_counter()
+
+    # 题目数量远小于作答数量，整表替换即可
+    session.query(QuizItemStats).delete(synchronize_session=False)
+    if rows:
+        session.execute(insert(QuizItemStats), rows)
+    watermark.last_id = last_id
+    session.commit()
+
+    return {
+        'answers': len(answers),
+        'items': len(rows),
+        'watermark': last_id,
+        'load_seconds': round(loaded_at - started, 2),
+        'compute_seconds': round(computed_at - loaded_at, 2),
+        'write_seconds': round(time.perf_counter() - computed_at, 2)
+    }
+
+
+def item_flags(stats, option_labels=()):
+    """题目质量提示（过易、过难、区分度低、有无人选择的选项）"""
+    if (stats.get('responses') or 0) < MIN_RESPONSES:
+        return []
+    flags = []
+    p_value = stats.get('p_value')
+    if p_value is not None and p_value > EASY_P_VALUE:
+        flags.append('too_easy')
+    if p_value is not None and p_value < HARD_P_VALUE:
+        flags.append('too_hard')
+    discrimination = stats.get('discrimination')
+    if discrimination is not None and discrimination < LOW_DISCRIMINATION:
+        flags.append('low_discrimination')
+    option_counts = stats.get('option_counts') or {}
+    if any(not option_counts.get(label) for label in option_labels):
+        flags.append('unused_option')
+    return flags
@@ -0,0 +1,388 @@
+"""
+贝叶斯知识追踪（BKT）
+每个学生的每个知识点维护一个"已掌握"的后验概率：
+- 在线更新：每条批改完成的提交按作答顺序逐题更新，每题 O(1)，结果按 (user_id, knowledge_point) 写入 knowledge_mastery；
+- 批量重算：从 quiz_answers 读取全部作答历史，以"作答序号"为步、所有 (学生, 知识点) 序列同时做向量化更新，
+  用于回填和参数重新拟合后刷新掌握度；
+- 参数拟合：每个知识点在参数网格上向量化计算对数似然，取最优参数写入 knowledge_tracing_params。
+"""
+import itertools
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import insert
+
+from models import db, QuizAnswer, KnowledgeMastery, KnowledgeTracingParams
+from services.question_bank import question_bank
+
+BKTParams = namedtuple('BKTParams', ['p_init', 'p_transit', 'p_slip', 'p_guess'])
+
+# 未拟合知识点使用的默认参数
+DEFAULT_PARAMS = BKTParams(p_init=0.3, p_transit=0.1, p_slip=0.1, p_guess=0.2)
+
+# 掌握概率达到该值视为已掌握
+MASTERY_THRESHOLD = 0.95
+
+# 拟合参数所需的最少作答数（不足时沿用默认参数）
+MIN_FIT_OBSERVATIONS = 50
+
+# 参数拟合网格（slip/guess 上限0.3，避免"掌握后反而更容易答错"的退化解）
+FIT_GRID = {
+    'p_init': (0.05, 0.15, 0.3, 0.5, 0.7, 0.9),
+    'p_transit': (0.02, 0.05, 0.1, 0.2, 0.35),
+    'p_slip': (0.02, 0.05, 0.1, 0.2, 0.3),
+    'p_guess': (0.05, 0.1, 0.2, 0.3)
+}
+
+# 进程内参数缓存的刷新间隔（秒），拟合脚本在其他进程写入后按此间隔生效
+PARAMS_RELOAD_INTERVAL = 60
+
+_EPSILON = 1e-6
+
+
+def bkt_update(p_mastery, is_correct, params):
+    """单次作答后的掌握概率：先按作答结果求后验，再计入本次练习的学习转移"""
+    p_slip, p_guess = params.p_slip, params.p_guess
+    if is_correct:
+        evidence = p_mastery * (1 - p_slip)
+        posterior = evidence / (evidence + (1 - p_mastery) * p_guess)
+    else:
+        evidence = p_mastery * p_slip
+        posterior = evidence / (evidence + (1 - p_mastery) * (1 - p_guess))
+    return posterior + (1 - posterior) * params.p_transit
+
+
+class TracingParamsCache:
+    """知识点BKT参数的进程内缓存（按时间间隔从数据库重新加载）"""
+
+    def __init__(self):
+        self._params = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def bust(self):
+        self._params = None
+
+    def all(self):
+        params = self._params
+        if params is not None and time.monotonic() - self._loaded_at < PARAMS_RELOAD_INTERVAL:
+            return params
+        with self._lock:
+            if self._params is None or time.monotonic() - self._loaded_at >= PARAMS_RELOAD_INTERVAL:
+                self._params = {
+                    row.knowledge_point: BKTParams(row.p_init, row.p_transit, row.p_slip, row.p_guess)
+                    for row in KnowledgeTracingParams.query.all()
+                }
+                self._loaded_at = time.monotonic()
+            return self._params
+
+    def get(self, knowledge_point):
+        return self.all().get(knowledge_point, DEFAULT_PARAMS)
+
+
+tracing_params = TracingParamsCache()
+
+
+def _upsert_mastery(rows):
+    """批量插入或更新掌握度（依赖 user_id + knowledge_point 唯一约束）"""
+    table = KnowledgeMastery.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=['user_id', 'knowledge_point'],
+            set_={
+                'p_mastery': statement.excluded.p_mastery,
+                'attempts': statement.excluded.attempts,
+                'correct': statement.excluded.correct,
+                'updated_at': statement.excluded.updated_at
+            }
+        )
+        db.session.execute(statement, rows)
+    elif dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        statement = dialect_insert(table)
+        statement = statement.on_duplicate_key_update(
+            p_mastery=statement.inserted.p_mastery,
+            attempts=statement.inserted.attempts,
+            correct=statement.inserted.correct,
+            updated_at=statement.inserted.updated_at
+        )
+        db.session.execute(statement, rows)
+    else:
+        for row in rows:
+            updated = KnowledgeMastery.query.filter_by(
+                user_id=row['user_id'], knowledge_point=row['knowledge_point']
+            ).update({
+                'p_mastery': row['p_mastery'], 'attempts': row['attempts'],
+                'correct': row['correct'], 'updated_at': row['updated_at']
+            }, synchronize_session=False)
+            if not updated:
+                db.session.execute(insert(table).values(**row))
+
+
+def record_mastery_outcomes(user_id, outcomes, now=None):
+    """
+    按一条提交的作答结果更新学生的知识点掌握概率（调用方负责提交事务）
+
+    Args:
+        outcomes: 按作答顺序排列的 (知识点, is_correct)
+
+    Returns:
+        dict: 知识点 -> 更新后的掌握概率
+    """
+    outcomes = list(outcomes)
+    if not outcomes:
+        return {}
+    now = now or datetime.utcnow()
+
+    states = {
+        row.knowledge_point: [row.p_mastery, row.attempts or 0, row.correct or 0]
+        for row in db.session.query(
+            KnowledgeMastery.knowledge_point, KnowledgeMastery.p_mastery,
+            KnowledgeMastery.attempts, KnowledgeMastery.correct
+        ).filter(
+            KnowledgeMastery.user_id == user_id,
+            KnowledgeMastery.knowledge_point.in_({knowledge_point for knowledge_point, _ in outcomes})
+        )
+    }
+
+    for knowledge_point, is_correct in outcomes:
+        params = tracing_params.get(knowledge_point)
+        state = states.setdefault(knowledge_point, [params.p_init, 0, 0])
+        state[0] = bkt_update(state[0], is_correct, params)
+        state[1] += 1
+        state[2] += 1 if is_correct else 0
+
+    _upsert_mastery([
+        {
+            'user_id': user_id,
+            'knowledge_point': knowledge_point,
+            'p_mastery': p_mastery,
+            'attempts': attempts,
+            'correct': correct,
+            'updated_at': now
+        }
+        for knowledge_point, (p_mastery, attempts, correct) in states.items()
+    ])
+    return {knowledge_point: state[0] for knowledge_point, state in states.items()}
+
+
+# ==================== 批量重算与参数拟合 ====================
+
+class AnswerHistory:
+    """
+    按 (学生, 知识点) 序列整理好的作答历史
+
+    属性:
+        sequence: 每条作答所属序列的下标
+        step: 作答在序列中的序号（从0开始）
+        correct: 是否答对
+        users / knowledge_points: 每个序列对应的学生ID和知识点
+    """
+
+    def __init__(self, user_ids, knowledge_points, correct, order_keys):
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        point_codes, point_names = _encode(knowledge_points)
+        correct = np.asarray(correct, dtype=bool)
+
+        # 按 (学生, 知识点, 作答时间, ID) 排序后，相邻且学生和知识点相同的作答属于同一序列
+        order = np.lexsort(tuple(np.asarray(key) for key in reversed(order_keys)) + (point_codes, user_ids))
+        user_ids, point_codes, correct = user_ids[order], point_codes[order], correct[order]
+        starts = np.ones(len(order), dtype=bool)
+        starts[1:] = (user_ids[1:] != user_ids[:-1]) | (point_codes[1:] != point_codes[:-1])
+        start_positions = np.flatnonzero(starts)
+
+        self.sequence = np.cumsum(starts) - 1
+        self.step = np.arange(len(order)) - start_positions[self.sequence] if len(order) else np.zeros(0, dtype=np.int64)
+        self.correct = correct
+        self.users = user_ids[start_positions]
+        self.point_codes = point_codes[start_positions]
+        self.point_names = point_names
+
+    def __len__(self):
+        return len(self.correct)
+
+    @property
+    def sequence_count(self):
+        return len(self.users)
+
+    def subset(self, point_code):
+        """只包含某一知识点的作答（序列重新编号）"""
+        sequence_mask = self.point_codes == point_code
+        renumber = np.cumsum(sequence_mask) - 1
+        answer_mask = sequence_mask[self.sequence]
+        return renumber[self.sequence[answer_mask]], self.step[answer_mask], self.correct[answer_mask], int(sequence_mask.sum())
+
+
+def _encode(values):
+    """字符串数组编码为整数（返回编码数组和编码对应的字符串列表）"""
+    names, codes = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    return codes.astype(np.int64), names.tolist()
+
+
+def trace_sequences(sequence, step, correct, sequence_count, p_init, p_transit, p_slip, p_guess):
+    """
+    向量化BKT：按作答序号逐步推进，每一步同时更新所有序列
+
+    参数数组可以是形状 (序列数, G)（每个序列各自的参数），也可以是 (1, G)（G组候选参数，用于拟合）。
+
+    Returns:
+        tuple: (最终掌握概率 序列数×G, 各组参数的对数似然 G)
+    """
+    p_init, p_transit, p_slip, p_guess = (np.atleast_2d(np.asarray(value, dtype=np.float64))
+                                          for value in (p_init, p_transit, p_slip, p_guess))
+    width = max(value.shape[1] for value in (p_init, p_transit, p_slip, p_guess))
+    mastery = np.array(np.broadcast_to(p_init, (sequence_count, width)))
+    log_likelihood = np.zeros(width)
+    if len(step) == 0:
+        return mastery, log_likelihood
+
+    def rows(value, sequences):
+        return value if value.shape[0] == 1 else value[sequences]
+
+    order = np.argsort(step, kind='stable')
+    sorted_steps = step[order]
+    boundaries = np.searchsorted(sorted_steps, np.arange(sorted_steps[-1] + 2))
+    for position in range(len(boundaries) - 1):
+        taken = order[boundaries[position]:boundaries[position + 1]]
+        sequences = sequence[taken]
+        is_correct = correct[taken][:, None]
+        slip, guess = rows(p_slip, sequences), rows(p_guess, sequences)
+
+        prior = mastery[sequences]
+        p_correct = np.clip(prior * (1 - slip) + (1 - prior) * guess, _EPSILON, 1 - _EPSILON)
+        log_likelihood += np.log(np.where(is_correct, p_correct, 1 - p_correct)).sum(axis=0)
+        posterior = np.where(is_correct, prior * (1 - slip) / p_correct, prior * slip / (1 - p_correct))
+        mastery[sequences] = posterior + (1 - posterior) * rows(p_transit, sequences)
+
+    return mastery, log_likelihood
+
+
+def load_answer_history(session, batch_size=50000):
+    """按ID分批读取 quiz_answers（只取需要的列），按题目映射到知识点"""
+    user_ids, knowledge_points, correct, created, answer_ids = [], [], [], [], []
+    last_id = 0
+    while True:
+        batch = session.query(
+            QuizAnswer.id, QuizAnswer.user_id, QuizAnswer.quiz_id, QuizAnswer.question_type,
+            QuizAnswer.is_correct, QuizAnswer.created_at
+        ).filter(QuizAnswer.id > last_id).order_by(QuizAnswer.id).limit(batch_size).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+        for row in batch:
+            question = question_bank.get(row.quiz_id, row.question_type) or {}
+            user_ids.append(row.user_id)
+            knowledge_points.append(question.get('knowledge_point') or '未分类')
+            correct.append(bool(row.is_correct))
+            created.append(row.created_at.timestamp() if row.created_at else 0.0)
+            answer_ids.append(row.id)
+    return AnswerHistory(user_ids, knowledge_points, correct, (created, answer_ids))
+
+
+def fit_params(sequence, step, correct, sequence_count, grid=None):
+    """
+    在参数网格上拟合一个知识点的BKT参数（所有候选参数一次向量化计算）
+
+    Returns:
+        tuple: (BKTParams, 对数似然)
+    """
+    grid = grid or FIT_GRID
+    candidates = np.array([
+        combination for combination in itertools.product(
+            grid['p_init'], grid['p_transit'], grid['p_slip'], grid['p_guess']
+        )
+        # 答对概率需随掌握而提高
+        if combination[2] + combination[3] < 1
+    ]).T[:, None, :]
+    _, log_likelihood = trace_sequences(sequence, step, correct, sequence_count, *candidates)
+    best = int(np.argmax(log_likelihood))
+    return BKTParams(*(float(values[0, best]) for values in candidates)), float(log_likelihood[best])
+
+
+def refit_params(session, history, min_observations=MIN_FIT_OBSERVATIONS):
+    """
+    按知识点重新拟合参数并写入 knowledge_tracing_params
+
+    Returns:
+        dict: 知识点 -> BKTParams（只含作答数足够、完成拟合的知识点）
+    """
+    fitted = {}
+    rows = []
+    now = datetime.utcnow()
+    for point_code, knowledge_point in enumerate(history.point_names):
+        sequence, step, correct, sequence_count = history.subset(point_code)
+        if len(step) < min_observations:
+            continue
+        params, log_likelihood = fit_params(sequence, step, correct, sequence_count)
+        fitted[knowledge_point] = params
+        rows.append({
+            'knowledge_point': knowledge_point,
+            **params._asdict(),
+            'observations': int(len(step)),
+            'log_likelihood': round(log_likelihood, 4),
+            'fitted_at': now
+        })
+
+    session.query(KnowledgeTracingParams).delete(synchronize_session=False)
+    if rows:
+        session.execute(insert(KnowledgeTracingParams), rows)
+    session.commit()
+    tracing_params.bust()
+    return fitted
+
+
+def recompute_mastery(session, history, params=None, write_batch=5000):
+    """
+    用向量化BKT从作答历史重算全部掌握度，替换 knowledge_mastery 表
+
+    Args:
+        params: 知识点 -> BKTParams，缺省时使用当前参数表
+
+    Returns:
+        int: 写入的 (学生, 知识点) 行数
+    """
+    params = tracing_params.all() if params is None else params
+    per_point = np.array([
+        params.get(knowledge_point, DEFAULT_PARAMS) for knowledge_point in history.point_names
+    ], dtype=np.float64).reshape(-1, 4)
+    # 每个序列使用其知识点的参数，形状 (序列数, 1)
+    sequence_params = per_point[history.point_codes][:, :, None]
+    mastery, _ = trace_sequences(
+        history.sequence, history.step, history.correct, history.sequence_count,
+        *(sequence_params[:, column] for column in range(4))
+    )
+
+    attempts = np.bincount(history.sequence, minlength=history.sequence_count)
+    correct = np.bincount(history.sequence, weights=history.correct, minlength=history.sequence_count)
+    now = datetime.utcnow()
+
+    session.query(KnowledgeMastery).delete(synchronize_session=False)
+    rows = []
+    written = 0
+    for index in range(history.sequence_count):
+        rows.append({
+            'user_id': int(history.users[index]),
+            'knowledge_point': history.point_names[history.point_codes[index]],
+            'p_mastery': float(mastery[index, 0]),
+            'attempts': int(attempts[index]),
+            'correct': int(correct[index]),
+            'updated_at': now
+        })
+        if len(rows) >= write_batch:
+            session.execute(insert(KnowledgeMastery), rows)
+            written += len(rows)
+            rows = []
+    if rows:
+        session.execute(insert(KnowledgeMastery), rows)
+        written += len(rows)
+    session.commit()
+    return written
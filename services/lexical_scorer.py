@@ -0,0 +1,242 @@
+"""
+中文感知的词法评分引擎（BERT服务不可用时的降级评分）
+
+参考答案切分为字符n-gram（中文连续片段取单字+双字，英文/数字按单词），
+构建TF-IDF向量并预计算，随题目保存在 quizzes.lexical_vector 中。
+学生答案评分只需一次稀疏点积，不再逐次切分参考答案。
+"""
+import hashlib
+import json
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from sqlalchemy import event
+
+from models import Quiz
+from services.question_bank import question_bank
+
+# 评分算法版本，算法调整时递增以使旧向量失效
+SCORER_VERSION = 1
+
+DEFAULT_INDEX_SIZE = 10000
+
+_TOKEN_PATTERN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff]+|[a-z0-9_]+')
+
+# 高频虚字，仅在单字层面过滤（双字n-gram保留，以免破坏"不可变"之类的短语）
+_STOP_CHARS = set('的了是在和与或及等也就都而之其这那个为以于把被对')
+
+
+def reference_hash(text):
+    """参考答案指纹，用于判断预计算向量是否过期"""
+    return hashlib.md5((text or '').encode('utf-8')).hexdigest()[:16]
+
+
+def extract_ngrams(text):
+    """将文本切分为n-gram并计数"""
+    counts = Counter()
+    for token in _TOKEN_PATTERN.findall((text or '').lower()):
+        if token[0].isascii():
+            counts[token] += 1
+            continue
+        for char in token:
+            if char not in _STOP_CHARS:
+                counts[char] += 1
+        for i in range(len(token) - 1):
+            counts[token[i:i + 2]] += 1
+    return counts
+
+
+def compute_idf(documents):
+    """
+    按题库参考答案计算平滑IDF
+
+    Returns:
+        tuple: (idf字典, 未登录n-gram使用的默认IDF)
+    """
+    document_frequency = Counter()
+    total = 0
+    for text in documents:
+        total += 1
+        document_frequency.update(extract_ngrams(text).keys())
+
+    idf = {
+        gram: math.log((1 + total) / (1 + df)) + 1
+        for gram, df in document_frequency.items()
+    }
+    return idf, math.log(1 + total) + 1
+
+
+def build_reference_vector(reference_answer, idf=None, default_idf=1.0):
+    """
+    预计算参考答案的归一化TF-IDF向量
+
+    未提供idf时退化为TF向量（新增题目在重建索引前使用）。
+    """
+    idf = idf or {}
+    counts = extract_ngrams(reference_answer)
+    gram_idf = {gram: idf.get(gram, default_idf) for gram in counts}
+    weights = {gram: tf * gram_idf[gram] for gram, tf in counts.items()}
+    norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+
+    return {
+        'v': SCORER_VERSION,
+        'h': reference_hash(reference_answer),
+        'w': {gram: round(w / norm, 5) for gram, w in weights.items()},
+        'idf': {gram: round(value, 4) for gram, value in gram_idf.items()},
+        'd': round(default_idf, 4)
+    }
+
+
+def score_answer(answer, vector):
+    """
+    学生答案与参考答案向量的稀疏点积评分
+
+    相似度取余弦相似度与参考答案覆盖率（命中n-gram的权重平方和）的平均，
+    既惩罚答非所问，也不因学生多写内容而过度扣分。
+
+    Returns:
+        tuple: (similarity, coverage)
+    """
+    weights = vector['w']
+    if not weights:
+        return 0.0, 0.0
+
+    idf = vector['idf']
+    default_idf = vector['d']
+    dot = 0.0
+    norm_sq = 0.0
+    coverage = 0.0
+    for gram, tf in extract_ngrams(answer).items():
+        value = tf * idf.get(gram, default_idf)
+        norm_sq += value * value
+        weight = weights.get(gram)
+        if weight:
+            dot += weight * value
+            coverage += weight * weight
+
+    if not norm_sq:
+        return 0.0, 0.0
+
+    cosine = dot / math.sqrt(norm_sq)
+    coverage = min(1.0, coverage)
+    return min(1.0, (cosine + coverage) / 2), coverage
+
+
+class LexicalIndex:
+    """
+    进程内的参考答案向量LRU缓存，按 (题目ID, 参考答案指纹) 索引
+
+    缓存项同时记录来源的 lexical_vector 原文：其他进程重建向量后，本进程题库快照刷新，
+    原文随之变化，缓存项即失效。
+    """
+
+    def __init__(self, max_size=DEFAULT_INDEX_SIZE):
+        self.max_size = max_size
+        self._vectors = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_size = app.config.get('LEXICAL_INDEX_SIZE', DEFAULT_INDEX_SIZE)
+        app.extensions['lexical_index'] = self
+
+    def vector_for(self, question):
+        """
+        获取题目的参考答案向量
+
+        优先使用题目上预计算的 lexical_vector；不存在或已过期时现场计算并缓存。
+        """
+        reference_answer = question.get('reference_answer') or ''
+        key = (question.get('id'), reference_hash(reference_answer))
+        stored = question.get('lexical_vector')
+        with self._lock:
+            entry = self._vectors.get(key)
+            if entry is not None and entry[0] == stored:
+                self._vectors.move_to_end(key)
+                return entry[1]
+
+        vector = None
+        if stored:
+            try:
+                vector = json.loads(stored) if isinstance(stored, str) else stored
+            except ValueError:
+                vector = None
+            if not vector or vector.get('v') != SCORER_VERSION or vector.get('h') != key[1]:
+                vector = None
+
+        if vector is None:
+            vector = build_reference_vector(reference_answer)
+
+        if self.max_size > 0:
+            with self._lock:
+                self._vectors[key] = (stored, vector)
+                self._vectors.move_to_end(key)
+                while len(self._vectors) > self.max_size:
+                    self._vectors.popitem(last=False)
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._vectors.clear()
+
+
+lexical_index = LexicalIndex()
+
+
+def score_with_fallback(answer, question, max_score):
+    """
+    词法降级评分
+
+    Returns:
+        tuple: (similarity, score, feedback)
+    """
+    similarity, coverage = score_answer(answer, lexical_index.vector_for(question))
+    score = round(similarity * max_score, 2)
+    feedback = f'语义服务不可用，按关键词覆盖评分（覆盖率 {coverage:.0%}）'
+    return similarity, score, feedback
+
+
+def rebuild_lexical_vectors(session, batch_size=500):
+    """
+    按整个题库的IDF重建所有主观题的参考答案向量
+
+    Returns:
+        int: 更新的题目数量
+    """
+    rows = session.query(Quiz.id, Quiz.reference_answer).filter(
+        Quiz.type == 'subjective', Quiz.reference_answer.isnot(None)
+    ).all()
+    idf, default_idf = compute_idf(reference for _, reference in rows)
+
+    updates = []
+    for quiz_id, reference_answer in rows:
+        vector = build_reference_vector(reference_answer, idf, default_idf)
+        updates.append({'id': quiz_id, 'lexical_vector': json.dumps(vector, ensure_ascii=False)})
+        if len(updates) >= batch_size:
+            session.bulk_update_mappings(Quiz, updates)
+            updates = []
+    if updates:
+        session.bulk_update_mappings(Quiz, updates)
+    session.commit()
+
+    lexical_index.clear()
+    question_bank.bust()
+    return len(rows)
+
+
+@event.listens_for(Quiz, 'before_insert')
+@event.listens_for(Quiz, 'before_update')
+def _refresh_lexical_vector(mapper, connection, target):
+    """保存题目时同步预计算参考答案向量（参考答案未变化时跳过）"""
+    if target.type != 'subjective' or not target.reference_answer:
+        return
+    current_hash = reference_hash(target.reference_answer)
+    if target.lexical_vector:
+        try:
+            stored = json.loads(target.lexical_vector)
+            if stored.get('v') == SCORER_VERSION and stored.get('h') == current_hash:
+                return
+        except ValueError:
+            pass
+    target.lexical_vector = json.dumps(build_reference_vector(target.reference_answer), ensure_ascii=False)
@@ -0,0 +1,226 @@
+"""
+大模型响应缓存
+PPT大纲、题目生成和内容分析的提示词完全由请求字段决定，教师重复生成同一主题时直接返回已有结果。
+
+按 (模型, 消息, 采样参数) 的规范化JSON哈希缓存完整响应，分两级：
+- 内存：进程内LRU，容量有上限，条目带过期时间；
+- 磁盘：独立的SQLite文件，服务重启后仍可命中，超出容量时按最近访问时间淘汰。
+磁盘命中的条目会放回内存。
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+DEFAULT_TTL = 7 * 86400
+DEFAULT_MEMORY_SIZE = 1000
+DEFAULT_DISK_SIZE = 20000
+# 每写入若干条检查一次磁盘容量
+_DISK_PRUNE_EVERY = 100
+
+
+def cache_key(payload):
+    """请求参数的规范化哈希（键排序、紧凑格式，字段顺序不同的相同请求得到相同的键）"""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """线程安全的两级响应缓存"""
+
+    def __init__(self, ttl=DEFAULT_TTL, memory_size=DEFAULT_MEMORY_SIZE, disk_size=DEFAULT_DISK_SIZE, path=None):
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        self._disk_lock = threading.Lock()
+        self._writes = 0
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._bypassed = 0
+        self._evictions = 0
+
+    def init_app(self, app):
+        self.ttl = app.config.get('LLM_CACHE_TTL', DEFAULT_TTL)
+        self.memory_size = app.config.get('LLM_CACHE_SIZE', DEFAULT_MEMORY_SIZE)
+        self.disk_size = app.config.get('LLM_CACHE_DISK_SIZE', DEFAULT_DISK_SIZE)
+        self.path = app.config.get('LLM_CACHE_PATH') or None
+        with self._disk_lock:
+            if self._disk is not None:
+                self._disk.close()
+            self._disk = None
+        app.extensions['llm_cache'] = self
+
+    # ---------- 磁盘层 ----------
+
+    def _connection(self):
+        """懒打开SQLite文件（调用方持有 _disk_lock）"""
+        if self._disk is None and self.path:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS llm_responses ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_llm_responses_accessed ON llm_responses (accessed_at)')
+            connection.commit()
+            self._disk = connection
+        return self._disk
+
+    def _disk_get(self, key, now):
+        try:
+            with self._disk_lock:
+                connection = self._connection()
+                if connection is None:
+                    return None, None
+                row = connection.execute(
+                    'SELECT value, expires_at FROM llm_responses WHERE key = ?', (key,)
+                ).fetchone()
+                if row is None:
+                    return None, None
+                if row[1] <= now:
+                    connection.execute('DELETE FROM llm_responses WHERE key = ?', (key,))
+                    connection.commit()
+                    return None, None
+                connection.execute('UPDATE llm_responses SET accessed_at = ? WHERE key = ?', (now, key))
+                connection.commit()
+                return json.loads(row[0]), row[1]
+        except (sqlite3.Error, ValueError) as e:
+            print(f"读取AI响应磁盘缓存失败: {e}")
+            return None, None
+
+    def _disk_put(self, key, value, expires_at, now):
+        try:
+            with self._disk_lock:
+                connection = self._connection()
+                if connection is None:
+                    return
+                connection.execute(
+                    'INSERT OR REPLACE INTO llm_responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                    (key, json.dumps(value, ensure_ascii=False), expires_at, now)
+                )
+                self._writes += 1
+                if self._writes % _DISK_PRUNE_EVERY == 0:
+                    connection.execute('DELETE FROM llm_responses WHERE expires_at <= ?', (now,))
+                    connection.execute(
+                        'DELETE FROM llm_responses WHERE key IN ('
+                        'SELECT key FROM llm_responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                        (self.disk_size,)
+                    )
+                connection.commit()
+        except sqlite3.Error as e:
+            print(f"写入AI响应磁盘缓存失败: {e}")
+
+    def _disk_size(self):
+        try:
+            with self._disk_lock:
+                connection = self._connection()
+                if connection is None:
+                    return 0
+                return connection.execute('SELECT COUNT(*) FROM llm_responses').fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    # ---------- 内存层 ----------
+
+    def _memory_put(self, key, value, expires_at):
+        if self.memory_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.memory_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def get(self, key):
+        """命中时返回缓存的响应，否则返回None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self._memory_hits += 1
+                    return entry[0]
+                del self._entries[key]
+
+        value, expires_at = self._disk_get(key, now)
+        with self._lock:
+            if value is None:
+                self._misses += 1
+                return None
+            self._disk_hits += 1
+        self._memory_put(key, value, expires_at)
+        return value
+
+    def put(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl
+        self._memory_put(key, value, expires_at)
+        self._disk_put(key, value, expires_at, now)
+
+    def fetch(self, payload, producer, bypass=False):
+        """
+        按请求参数读取缓存，未命中时调用 producer() 获取响应并写入缓存
+
+        Args:
+            payload: 决定响应内容的请求参数（模型、消息、采样参数）
+            bypass: 跳过读取缓存（仍用新结果覆盖缓存）
+
+        Returns:
+            tuple: (响应, 是否命中缓存)
+        """
+        key = cache_key(payload)
+        if bypass:
+            with self._lock:
+                self._bypassed += 1
+        else:
+            cached = self.get(key)
+            if cached is not None:
+                return cached, True
+        value = producer()
+        self.put(key, value)
+        return value, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        try:
+            with self._disk_lock:
+                connection = self._connection()
+                if connection is not None:
+                    connection.execute('DELETE FROM llm_responses')
+                    connection.commit()
+        except sqlite3.Error as e:
+            print(f"清空AI响应磁盘缓存失败: {e}")
+
+    def stats(self):
+        disk_entries = self._disk_size()
+        with self._lock:
+            hits = self._memory_hits + self._disk_hits
+            lookups = hits + self._misses
+            return {
+                'memory_size': len(self._entries),
+                'memory_max_size': self.memory_size,
+                'disk_size': disk_entries,
+                'disk_max_size': self.disk_size if self.path else 0,
+                'ttl_seconds': self.ttl,
+                'memory_hits': self._memory_hits,
+                'disk_hits': self._disk_hits,
+                'misses': self._misses,
+                'bypassed': self._bypassed,
+                'evictions': self._evictions,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0
+            }
+
+
+llm_cache = LLMResponseCache()
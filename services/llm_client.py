@@ -0,0 +1,397 @@
+"""
+大模型（DeepSeek，OpenAI兼容格式）调用客户端
+所有AI路由共用一个 requests.Session：连接池保持长连接，避免每次对话重新建立TCP/TLS连接。
+
+- 连接超时和读取超时分开配置；
+- 429 和 5xx、连接错误按带抖动的指数退避重试，响应带 Retry-After 时按其等待；
+- 熔断器：连续失败达到阈值后在冷却时间内直接失败，冷却后放行一个探测请求；
+- 并发的相同请求（规范化参数哈希相同）合并为一次上游调用，结果共享（single-flight）；
+- 流式对话逐行解析上游SSE并逐块交出，不在内存中拼接完整回复。
+"""
+import json
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.llm_cache import cache_key
+
+# 可重试的HTTP状态码
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+DEFAULT_POOL_SIZE = 20
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 8.0
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_RESET = 30.0
+
+
+class LLMError(Exception):
+    """大模型请求失败"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LLMUnavailableError(LLMError):
+    """熔断器打开，服务暂不可用（不发出请求）"""
+
+
+class CircuitBreaker:
+    """连续失败计数熔断器（closed → open → half_open → closed）"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=DEFAULT_BREAKER_THRESHOLD, reset_timeout=DEFAULT_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._rejected = 0
+        self._trips = 0
+
+    def allow(self):
+        """是否允许发出请求（半开状态只放行一个探测请求）"""
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self._rejected += 1
+                    return False
+                self._state = self.HALF_OPEN
+                self._probing = False
+            if self._state == self.HALF_OPEN:
+                if self._probing:
+                    self._rejected += 1
+                    return False
+                self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._trips += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def retry_after(self):
+        """熔断打开时距离允许探测还有多少秒"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'trips': self._trips,
+                'rejected': self._rejected
+            }
+
+
+class _Flight:
+    """一次进行中的上游调用"""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """合并并发的相同调用：同一个键同时只执行一次，等待者共享结果或异常"""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._executed = 0
+        self._coalesced = 0
+        self._max_waiters = 0
+
+    def do(self, key, fn):
+        """
+        Returns:
+            tuple: (结果, 是否为共享结果)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self._executed += 1
+                leader = True
+            else:
+                flight.waiters += 1
+                self._coalesced += 1
+                self._max_waiters = max(self._max_waiters, flight.waiters)
+                leader = False
+
+        if not leader:
+            # 发起者自身受连接/读取超时和重试次数约束，等待必然结束
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+        return flight.result, False
+
+    def stats(self):
+        with self._lock:
+            calls = self._executed + self._coalesced
+            return {
+                'upstream_calls': self._executed,
+                'coalesced': self._coalesced,
+                'in_flight': len(self._flights),
+                'max_waiters': self._max_waiters,
+                'dedup_rate': round(self._coalesced / calls, 4) if calls else 0.0
+            }
+
+
+def _retry_after_seconds(response):
+    """解析 Retry-After 响应头（只支持秒数格式）"""
+    value = response.headers.get('Retry-After') if response is not None else None
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+class LLMClient:
+    """线程安全的大模型客户端（进程内单例，连接池懒创建）"""
+
+    def __init__(self):
+        self.api_key = ''
+        self.api_url = 'https://api.deepseek.com/v1'
+        self.model = 'deepseek-chat'
+        self.pool_size = DEFAULT_POOL_SIZE
+        self.connect_timeout = DEFAULT_CONNECT_TIMEOUT
+        self.read_timeout = DEFAULT_READ_TIMEOUT
+        self.max_retries = DEFAULT_MAX_RETRIES
+        self.backoff_base = DEFAULT_BACKOFF_BASE
+        self.backoff_max = DEFAULT_BACKOFF_MAX
+        self.breaker = CircuitBreaker()
+        self.coalesce = True
+        self.single_flight = SingleFlight()
+        self._session = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._retries = 0
+        self._failures = 0
+
+    def init_app(self, app):
+        config = app.config
+        self.api_key = config.get('DEEPSEEK_API_KEY', '')
+        self.api_url = config.get('DEEPSEEK_API_URL', self.api_url).rstrip('/')
+        self.model = config.get('DEEPSEEK_MODEL', self.model)
+        self.pool_size = config.get('LLM_POOL_SIZE', DEFAULT_POOL_SIZE)
+        self.connect_timeout = config.get('LLM_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)
+        self.read_timeout = config.get('LLM_READ_TIMEOUT', DEFAULT_READ_TIMEOUT)
+        self.max_retries = config.get('LLM_MAX_RETRIES', DEFAULT_MAX_RETRIES)
+        self.backoff_base = config.get('LLM_BACKOFF_BASE', DEFAULT_BACKOFF_BASE)
+        self.backoff_max = config.get('LLM_BACKOFF_MAX', DEFAULT_BACKOFF_MAX)
+        self.coalesce = config.get('LLM_COALESCE', True)
+        self.breaker = CircuitBreaker(
+            config.get('LLM_BREAKER_THRESHOLD', DEFAULT_BREAKER_THRESHOLD),
+            config.get('LLM_BREAKER_RESET', DEFAULT_BREAKER_RESET)
+        )
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+        app.extensions['llm_client'] = self
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    # 只连接一个上游主机，连接池大小按并发请求数（工作线程数）设置
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    session.headers.update({'Content-Type': 'application/json'})
+                    self._session = session
+        return self._session
+
+    def _backoff(self, attempt, response=None):
+        """第 attempt 次重试前的等待时间：Retry-After 优先，否则为带全抖动的指数退避"""
+        retry_after = _retry_after_seconds(response)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _count(self, name):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def post(self, path, payload, stream=False, timeout=None):
+        """
+        向上游发送POST请求（带重试和熔断），返回状态码为2xx的响应
+
+        Raises:
+            ValueError: 未配置API Key
+            LLMUnavailableError: 熔断器打开
+            LLMError: 重试后仍失败或上游返回不可重试的错误
+        """
+        if not self.api_key:
+            raise ValueError("DeepSeek API Key未配置，请在.env文件中设置DEEPSEEK_API_KEY")
+
+        url = f"{self.api_url}/{path.lstrip('/')}"
+        headers = {'Authorization': f'Bearer {self.api_key}'}
+        timeout = timeout or (self.connect_timeout, self.read_timeout)
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise LLMUnavailableError(
+                    f"DeepSeek API暂不可用，请{int(self.breaker.retry_after()) + 1}秒后重试", status_code=503
+                )
+            self._count('_requests')
+            response = None
+            try:
+                response = self.session.post(url, json=payload, headers=headers, timeout=timeout, stream=stream)
+            except requests.exceptions.Timeout:
+                error = LLMError("DeepSeek API请求超时", status_code=504)
+            except requests.exceptions.RequestException as e:
+                error = LLMError(f"DeepSeek API请求失败: {str(e)}", status_code=502)
+            else:
+                if response.status_code < 400:
+                    self.breaker.record_success()
+                    return response
+                error = LLMError(
+                    f"DeepSeek API请求失败: HTTP {response.status_code} {response.text[:200]}",
+                    status_code=response.status_code
+                )
+                response.close()
+                if response.status_code not in RETRYABLE_STATUS:
+                    # 请求本身有误（参数、鉴权），上游是正常的
+                    self.breaker.record_success()
+                    self._count('_failures')
+                    raise error
+
+            # 限流说明上游仍在工作，不计入熔断
+            if response is None or response.status_code != 429:
+                self.breaker.record_failure()
+            if attempt >= self.max_retries:
+                self._count('_failures')
+                raise error
+            delay = self._backoff(attempt, response)
+            attempt += 1
+            self._count('_retries')
+            print(f"DeepSeek API请求失败，{delay:.2f}秒后第{attempt}次重试: {error}")
+            time.sleep(delay)
+
+    def chat_completion(self, messages, model=None, temperature=0.7, max_tokens=2000, **options):
+        """
+        调用对话补全接口（非流式，并发的相同请求共享一次上游调用，调用方不应修改返回的字典）
+
+        Returns:
+            dict: API响应结果
+        """
+        payload = {
+            'model': model or self.model,
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            'stream': False,
+            **options
+        }
+        if not self.coalesce:
+            return self._complete(payload)
+        # 同一时刻大量学生发送相同提示词时只请求一次上游
+        result, _ = self.single_flight.do(cache_key(payload), lambda: self._complete(payload))
+        return result
+
+    def _complete(self, payload):
+        response = self.post('/chat/completions', payload)
+        try:
+            return response.json()
+        except ValueError:
+            raise LLMError("DeepSeek API返回结果不是合法的JSON", status_code=502)
+
+    def stream_chat_completion(self, messages, model=None, temperature=0.7, max_tokens=2000, **options):
+        """
+        调用对话补全接口（流式）
+
+        连接建立和重试在调用时完成（错误在返回前抛出），之后返回逐块产出上游JSON数据块的生成器；
+        最后一个数据块带 usage 统计。生成器关闭时释放上游连接。
+        """
+        payload = {
+            'model': model or self.model,
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            'stream': True,
+            'stream_options': {'include_usage': True},
+            **options
+        }
+        response = self.post('/chat/completions', payload, stream=True)
+        return self._iter_stream(response)
+
+    @staticmethod
+    def _iter_stream(response):
+        """解析上游SSE：只处理 data 行，遇到 [DONE] 结束"""
+        try:
+            for line in response.iter_lines():
+                if not line or not line.startswith(b'data:'):
+                    continue
+                data = line[5:].strip()
+                if data == b'[DONE]':
+                    break
+                try:
+                    yield json.loads(data)
+                except ValueError:
+                    continue
+        finally:
+            response.close()
+
+    def stats(self):
+        with self._stats_lock:
+            counters = {
+                'requests': self._requests,
+                'retries': self._retries,
+                'failures': self._failures
+            }
+        return {
+            **counters,
+            'pool_size': self.pool_size,
+            'circuit_breaker': self.breaker.stats(),
+            'single_flight': self.single_flight.stats()
+        }
+
+
+llm_client = LLMClient()
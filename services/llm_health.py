@@ -0,0 +1,122 @@
+"""
+大模型服务健康探测
+后台线程每隔 LLM_HEALTH_INTERVAL 秒请求一次上游的模型列表接口（GET /models，不消耗token），
+记录状态、延迟和最近一次错误；状态接口直接返回缓存的探测结果及其时效。
+"""
+import threading
+import time
+from datetime import datetime
+
+from services.llm_client import llm_client
+
+DEFAULT_INTERVAL = 60.0
+DEFAULT_TIMEOUT = 10.0
+
+
+class HealthProber:
+    """大模型服务健康探测线程（首次查询状态时启动）"""
+
+    UNKNOWN = 'unknown'
+    HEALTHY = 'healthy'
+    UNHEALTHY = 'unhealthy'
+    UNCONFIGURED = 'error'
+
+    def __init__(self, client):
+        self.client = client
+        self.interval = DEFAULT_INTERVAL
+        self.timeout = DEFAULT_TIMEOUT
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._result = {
+            'status': self.UNKNOWN,
+            'latency_ms': None,
+            'last_error': None,
+            'checked_at': None,
+            'last_success_at': None,
+            'consecutive_failures': 0
+        }
+        self._checked_monotonic = None
+
+    def init_app(self, app):
+        self.interval = app.config.get('LLM_HEALTH_INTERVAL', DEFAULT_INTERVAL)
+        self.timeout = app.config.get('LLM_HEALTH_TIMEOUT', DEFAULT_TIMEOUT)
+        app.extensions['llm_health'] = self
+
+    def ensure_started(self):
+        """启动探测线程（只执行一次）"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='llm-health-prober', daemon=True)
+                self._thread.start()
+
+    def probe(self):
+        """执行一次探测并更新缓存的结果"""
+        now = datetime.now()
+        started = time.perf_counter()
+        error = None
+        if not self.client.api_key:
+            status = self.UNCONFIGURED
+            error = 'DeepSeek API Key未配置'
+        else:
+            try:
+                response = self.client.session.get(
+                    f'{self.client.api_url}/models',
+                    headers={'Authorization': f'Bearer {self.client.api_key}'},
+                    timeout=(self.client.connect_timeout, self.timeout)
+                )
+                response.close()
+                if response.status_code == 200:
+                    status = self.HEALTHY
+                else:
+                    status = self.UNHEALTHY
+                    error = f'HTTP {response.status_code}'
+            except Exception as e:
+                status = self.UNHEALTHY
+                error = str(e)
+        latency_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        with self._lock:
+            result = dict(self._result)
+            result.update({
+                'status': status,
+                'latency_ms': latency_ms if status != self.UNCONFIGURED else None,
+                'checked_at': now.isoformat()
+            })
+            if status == self.HEALTHY:
+                result['last_success_at'] = now.isoformat()
+                result['consecutive_failures'] = 0
+            else:
+                result['last_error'] = error
+                result['consecutive_failures'] += 1
+            self._result = result
+            self._checked_monotonic = time.monotonic()
+        return result
+
+    def snapshot(self):
+        """最近一次探测结果（附带距今秒数，尚未探测时为None）"""
+        with self._lock:
+            result = dict(self._result)
+            checked = self._checked_monotonic
+        result['age_seconds'] = round(time.monotonic() - checked, 1) if checked is not None else None
+        result['interval_seconds'] = self.interval
+        return result
+
+    def refresh(self):
+        """立即唤醒探测线程重新探测"""
+        self.ensure_started()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.probe()
+            except Exception as e:
+                print(f"大模型健康探测线程异常: {e}")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+
+llm_health = HealthProber(llm_client)
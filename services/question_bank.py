@@ -0,0 +1,356 @@
+"""
+题库服务
+提供静态备用题库（数据库不可用或题目缺失时使用），以及进程内题库缓存：
+缓存序列化后的题目字典、按 (题型, ID) 的索引和预编码的列表响应，
+以 (max(updated_at), 行数) 作为版本戳，题目写入时主动失效。
+"""
+import hashlib
+import json
+import threading
+import time
+from bisect import bisect_left
+
+from flask import current_app
+from sqlalchemy import event, func
+
+from models import db, Quiz, QuizSimilarQuestion
+
+
+def get_static_question_bank():
+    """获取静态题库数据"""
+    return {
+        "objective": get_static_objective_questions(),
+        "subjective": get_static_subjective_questions()
+    }
+
+def get_static_objective_questions():
+    """获取静态客观题数据"""
+    return [
+        {
+            "id": 1,
+            "anchor": "obj1",
+            "question": "Python定义函数的关键字是？",
+            "options": [
+                {"label": "A", "text": "def"},
+                {"label": "B", "text": "function"},
+                {"label": "C", "text": "func"},
+                {"label": "D", "text": "define"}
+            ],
+            "answer": "A",
+            "knowledge_point": "Python基础语法",
+            "explanation": "Python中使用def（definition的缩写）关键字定义函数，function/func/define均不是Python的内置关键字。"
+        },
+        {
+            "id": 2,
+            "anchor": "obj2",
+            "question": "以下哪个不是Python的数据类型？",
+            "options": [
+                {"label": "A", "text": "list"},
+                {"label": "B", "text": "dict"},
+                {"label": "C", "text": "array"},
+                {"label": "D", "text": "tuple"}
+            ],
+            "answer": "C",
+            "knowledge_point": "Python数据类型",
+            "explanation": "Python内置数据类型包括list、dict、tuple等，但没有array类型，array属于numpy库。"
+        },
+        {
+            "id": 3,
+            "anchor": "obj3",
+            "question": "Python中用于读取文件内容的方法是？",
+            "options": [
+                {"label": "A", "text": "open()"},
+                {"label": "B", "text": "read()"},
+                {"label": "C", "text": "write()"},
+                {"label": "D", "text": "close()"}
+            ],
+            "answer": "B",
+            "knowledge_point": "Python文件操作",
+            "explanation": "open()用于打开文件，read()用于读取文件内容，write()用于写入，close()用于关闭文件。"
+        },
+        {
+            "id": 4,
+            "anchor": "obj4",
+            "question": "Python中哪个关键字用于异常处理？",
+            "options": [
+                {"label": "A", "text": "try"},
+                {"label": "B", "text": "catch"},
+                {"label": "C", "text": "exception"},
+                {"label": "D", "text": "error"}
+            ],
+            "answer": "A",
+            "knowledge_point": "Python异常处理",
+            "explanation": "Python使用try-except-finally结构处理异常，catch是其他语言的关键字。"
+        },
+        {
+            "id": 5,
+            "anchor": "obj5",
+            "question": "Python中如何创建空列表？",
+            "options": [
+                {"label": "A", "text": "[]"},
+                {"label": "B", "text": "list()"},
+                {"label": "C", "text": "{}"},
+                {"label": "D", "text": "()"}
+            ],
+            "answer": "A",
+            "knowledge_point": "Python列表",
+            "explanation": "[]是创建空列表的最简方式，list()也可以创建空列表，但[]更常用。"
+        }
+    ]
+
+def get_static_subjective_questions():
+    """获取静态主观题数据"""
+    return [
+        {
+            "id": 101,
+            "anchor": "sub1",
+            "question": "简述Python列表与元组的区别",
+            "reference_answer": "列表是可变序列（可增删改元素），用[]表示；元组是不可变序列，用()表示。列表适合存储需要修改的数据，元组适合存储固定不变的数据。",
+            "knowledge_point": "Python序列类型",
+            "explanation": "1. 可变性：列表可变（mutable），元组不可变（immutable）；2. 语法：列表用[]，元组用()；3. 性能：元组因不可变，遍历/访问速度略快；4. 用途：列表适合动态修改数据，元组适合存储固定不变的数据（如配置项）。"
+        },
+        {
+            "id": 102,
+            "anchor": "sub2",
+            "question": "解释Python中的装饰器是什么",
+            "reference_answer": "装饰器是一种函数，用于修改其他函数的行为，在不改变原函数代码的情况下增加功能。它接收函数作为参数并返回新函数。",
+            "knowledge_point": "Python高级特性",
+            "explanation": "装饰器是Python的高级特性，本质是接收函数作为参数并返回新函数的函数。常用于日志记录、性能测试、事务处理、缓存等场景。"
+        },
+        {
+            "id": 103,
+            "anchor": "sub3",
+            "question": "什么是Python的生成器？",
+            "reference_answer": "生成器是一种特殊的迭代器，使用yield关键字返回值，可以按需生成值而不是一次性生成所有值，节省内存。",
+            "knowledge_point": "Python迭代器和生成器",
+            "explanation": "生成器使用yield语句，每次产生一个值后暂停执行，下次从暂停处继续。与普通函数不同，生成器函数返回一个生成器对象，而不是一次性返回所有结果。"
+        }
+    ]
+
+
+# 分页查询支持的筛选字段
+PAGE_FILTER_FIELDS = ('type', 'category', 'knowledge_point', 'difficulty', 'video_id')
+
+
+def video_quiz_summary(question):
+    """视频随堂测验的精简题目信息（播放器轮询使用，不含答案和解析）"""
+    return {
+        'id': question['id'],
+        'type': question['type'],
+        'timestamp': question['timestamp'],
+        'question': question['question'],
+        'options': question.get('options') or []
+    }
+
+
+class _BankSnapshot:
+    """某一版本题库的只读快照"""
+
+    def __init__(self, version, questions):
+        self.version = version
+        self.objective = []
+        self.subjective = []
+        # ID -> 接口响应用题目字典（仅数据库题目）
+        self.by_id = {}
+        # (题型, ID) -> 批改用题目字典；静态题库打底，数据库同题型同ID的题目覆盖
+        self.index = {}
+        self._encoded = {}
+        # 题目ID -> 相似题字典列表
+        self._similar = {}
+        # 视频ID -> (有序时间点列表, 对应的预编码题目摘要)
+        self._timelines = {}
+
+        for question_type, static_questions in get_static_question_bank().items():
+            for static_q in static_questions:
+                self.index[(question_type, static_q['id'])] = dict(static_q, type=question_type)
+
+        for question in questions:
+            data = question.to_dict()
+            if data['type'] == 'objective':
+                self.objective.append(data)
+            elif data['type'] == 'subjective':
+                self.subjective.append(data)
+            self.by_id[data['id']] = data
+            # 批改需要的预计算向量只放在索引中，不出现在接口响应里
+            self.index[(data['type'], data['id'])] = dict(data, lexical_vector=question.lexical_vector)
+
+    def encoded_listing(self, question_type):
+        """预编码的题库列表响应体（按题型缓存）"""
+        body = self._encoded.get(question_type)
+        if body is None:
+            data = {
+                'objective': self.objective if question_type in ('all', 'objective') else [],
+                'subjective': self.subjective if question_type in ('all', 'subjective') else []
+            }
+            body = json.dumps({'success': True, 'data': data}, ensure_ascii=False).encode('utf-8')
+            self._encoded[question_type] = body
+        return body
+
+
+    def video_window(self, video_id, start, end, loader):
+        """
+        视频 [start, end) 时间段内的随堂测验（二分查找）
+
+        每个视频首次访问时通过loader按 (video_id, timestamp) 索引取出有序题目ID，随快照缓存。
+
+        Returns:
+            tuple: (预编码题目摘要列表, 起始下标, 结束下标)
+        """
+        timeline = self._timelines.get(video_id)
+        if timeline is None:
+            questions = [self.by_id[quiz_id] for quiz_id in loader(video_id) if quiz_id in self.by_id]
+            timeline = (
+                [q['timestamp'] for q in questions],
+                [json.dumps(video_quiz_summary(q), ensure_ascii=False).encode('utf-8') for q in questions]
+            )
+            self._timelines[video_id] = timeline
+        timestamps, encoded = timeline
+        lo = bisect_left(timestamps, start)
+        hi = bisect_left(timestamps, end, lo)
+        return encoded[lo:hi], lo, hi
+
+    def similar(self, quiz_id, loader):
+        """
+        题目的相似题列表（按相似度降序）
+
+        优先使用题目上预计算的 similar_questions；为空时通过loader查询关系表，结果随快照缓存。
+        """
+        similar = self._similar.get(quiz_id)
+        if similar is None:
+            question = self.by_id.get(quiz_id)
+            similar_ids = (question or {}).get('similar_questions') or loader(quiz_id)
+            similar = [self.by_id[similar_id] for similar_id in similar_ids if similar_id in self.by_id]
+            self._similar[quiz_id] = similar
+        return similar
+
+
+class QuestionBankCache:
+    """进程内题库缓存，按版本戳自动刷新"""
+
+    def __init__(self):
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def bust(self):
+        """题目写入后调用，下一次访问时重新加载"""
+        self._stale = True
+
+    def _current_version(self):
+        updated_at, count = db.session.query(func.max(Quiz.updated_at), func.count(Quiz.id)).one()
+        return (updated_at.isoformat() if updated_at else None, count)
+
+    def snapshot(self):
+        """获取当前题库快照（数据库不可用时抛出异常）"""
+        snapshot = self._snapshot
+        interval = current_app.config.get('QUESTION_BANK_CHECK_INTERVAL', 1.0)
+        if snapshot is not None and not self._stale and time.monotonic() - self._checked_at < interval:
+            return snapshot
+
+        with self._lock:
+            stale = self._stale
+            self._stale = False
+            version = self._current_version()
+            self._checked_at = time.monotonic()
+            if self._snapshot is None or stale or self._snapshot.version != version:
+                self._snapshot = _BankSnapshot(version, Quiz.query.order_by(Quiz.id).all())
+            return self._snapshot
+
+    def listing(self, question_type='all'):
+        """题库列表的预编码JSON响应体"""
+        return self.snapshot().encoded_listing(question_type)
+
+    def page(self, filters, after_id=None, limit=50):
+        """
+        按条件筛选题目并按ID游标分页
+
+        SQL只在复合索引上取出本页的题目ID，题目内容直接取自缓存快照。
+
+        Args:
+            filters: 字段名 -> 值，支持 type/category/knowledge_point/difficulty/video_id
+            after_id: 上一页最后一道题的ID
+            limit: 每页数量
+
+        Returns:
+            tuple: (题目字典列表, 是否还有下一页)
+        """
+        query = db.session.query(Quiz.id)
+        for field in PAGE_FILTER_FIELDS:
+            if filters.get(field) is not None:
+                query = query.filter(getattr(Quiz, field) == filters[field])
+        if after_id is not None:
+            query = query.filter(Quiz.id > after_id)
+        ids = [row.id for row in query.order_by(Quiz.id).limit(limit + 1)]
+
+        has_more = len(ids) > limit
+        ids = ids[:limit]
+
+        snapshot = self.snapshot()
+        questions = {quiz_id: snapshot.by_id[quiz_id] for quiz_id in ids if quiz_id in snapshot.by_id}
+        missing = [quiz_id for quiz_id in ids if quiz_id not in questions]
+        if missing:
+            # 快照尚未包含刚写入的题目时直接读取
+            for question in Quiz.query.filter(Quiz.id.in_(missing)):
+                questions[question.id] = question.to_dict()
+
+        return [questions[quiz_id] for quiz_id in ids if quiz_id in questions], has_more
+
+    def video_window(self, video_id, start, end):
+        """
+        视频时间窗口内的随堂测验响应体（预编码JSON）
+
+        Returns:
+            tuple: (响应体, ETag)
+        """
+        def load(target_id):
+            rows = db.session.query(Quiz.id).filter(
+                Quiz.video_id == target_id, Quiz.timestamp.isnot(None)
+            ).order_by(Quiz.timestamp, Quiz.id)
+            return [row.id for row in rows]
+
+        snapshot = self.snapshot()
+        encoded, lo, hi = snapshot.video_window(video_id, start, end, load)
+        body = b''.join((
+            b'{"success":true,"data":{"video_id":', str(video_id).encode(),
+            b',"quizzes":[', b','.join(encoded), b']}}'
+        ))
+        # 响应内容只取决于题库版本和命中的区间，轮询时可直接返回304
+        etag = hashlib.md5(repr((snapshot.version, video_id, lo, hi)).encode()).hexdigest()[:16]
+        return body, etag
+
+    def similar(self, quiz_id, limit=10):
+        """题目的相似题（来自缓存快照，未预计算时查询一次关系表）"""
+        def load(target_id):
+            rows = db.session.query(QuizSimilarQuestion.similar_quiz_id).filter(
+                QuizSimilarQuestion.quiz_id == target_id
+            ).order_by(QuizSimilarQuestion.similarity_score.desc())
+            return [row.similar_quiz_id for row in rows]
+
+        return self.snapshot().similar(quiz_id, load)[:limit]
+
+    def get(self, q_id, question_type):
+        """按题型和ID查找题目字典（只读），数据库不可用时仅查静态题库"""
+        try:
+            key = (question_type, int(q_id))
+        except (TypeError, ValueError):
+            return None
+
+        try:
+            return self.snapshot().index.get(key)
+        except Exception as db_error:
+            print(f"题库缓存刷新失败，使用静态题库: {db_error}")
+            for static_q in get_static_question_bank().get(question_type, []):
+                if static_q['id'] == key[1]:
+                    return dict(static_q, type=question_type)
+            return None
+
+
+question_bank = QuestionBankCache()
+
+
+@event.listens_for(Quiz, 'after_insert')
+@event.listens_for(Quiz, 'after_update')
+@event.listens_for(Quiz, 'after_delete')
+def _bust_question_bank(mapper, connection, target):
+    question_bank.bust()
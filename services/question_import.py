@@ -0,0 +1,442 @@
+"""
+题库批量导入
+逐行流式读取题目文件（JSONL/JSON/CSV/XLSX），校验后与现有题库做近似重复检测：
+- 题干+选项按字符3-gram切分，计算 MinHash 签名（numpy 向量化，现有题库按批计算），
+  签名分段做 LSH 分桶，只对落入同一桶的候选题比较估计 Jaccard 相似度；
+- 同一文件内的题目也会互相查重；
+- 通过的题目累积成批，以 executemany 批量插入，整个文件一个事务，出错时全部回滚。
+
+每行字段: question、type（objective/subjective，缺省时有选项为客观题）、options（JSON数组，
+或 CSV/XLSX 的 option_a..option_f 列）、answer、reference_answer、knowledge_point、explanation、
+difficulty（1-5）、category、video_id、timestamp
+"""
+import csv
+import io
+import json
+import re
+import time
+import unicodedata
+
+import numpy as np
+from sqlalchemy import insert
+
+from models import Quiz
+from services.lexical_scorer import build_reference_vector
+from services.question_bank import question_bank
+
+SUPPORTED_FORMATS = ('jsonl', 'json', 'csv', 'xlsx')
+
+# MinHash 参数：NUM_PERM = LSH_BANDS × LSH_ROWS，候选阈值约为 (1/BANDS)^(1/ROWS) ≈ 0.7
+NUM_PERM = 128
+LSH_BANDS = 16
+LSH_ROWS = 8
+SHINGLE_SIZE = 3
+# 估计 Jaccard 相似度达到该值视为重复
+DEFAULT_DUPLICATE_THRESHOLD = 0.8
+
+DEFAULT_BATCH_SIZE = 500
+# 报告中最多列出的重复/错误条目数
+MAX_REPORTED = 200
+
+# shingle 和 LSH 分段哈希的混合乘数（64位奇数）
+_MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+_BAND_MIX = np.array([
+    0x9E3779B97F4A7C15, 0xBF58476D1CE4E5B9, 0x94D049BB133111EB, 0xC2B2AE3D27D4EB4F,
+    0x165667B19E3779F9, 0xD6E8FEB86659FD93, 0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53
+], dtype=np.uint64)
+_OPTION_LABELS = 'ABCDEF'
+_NOISE_PATTERN = re.compile(r'[\s\W_]+', re.UNICODE)
+
+
+def detect_format(filename=None, explicit=None):
+    """根据显式参数或文件扩展名确定格式，无法识别时返回None"""
+    fmt = (explicit or '').lower()
+    if not fmt and filename:
+        fmt = filename.rsplit('.', 1)[-1].lower()
+    if fmt == 'ndjson':
+        fmt = 'jsonl'
+    return fmt if fmt in SUPPORTED_FORMATS else None
+
+
+# ==================== 读取 ====================
+
+def _record_from_columns(row):
+    """CSV/XLSX 行转换为题目记录（option_a..option_f 列合并为选项）"""
+    record = {}
+    options = []
+    for column, value in row.items():
+        if column is None or value is None or str(value).strip() == '':
+            continue
+        column = str(column).strip().lower()
+        if column.startswith('option_') and len(column) == 8:
+            options.append({'label': column[-1].upper(), 'text': str(value).strip()})
+        else:
+            record[column] = value if not isinstance(value, str) else value.strip()
+    if options and 'options' not in record:
+        record['options'] = sorted(options, key=lambda option: option['label'])
+    return record
+
+
+def _iter_xlsx(raw):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError('导入XLSX需要安装 openpyxl: pip install openpyxl')
+
+    # XLSX 是zip格式，需要可随机访问的文件对象；只读模式逐行读取，不把整个工作表载入内存
+    if not (hasattr(raw, 'seekable') and raw.seekable()):
+        raw = io.BytesIO(raw.read())
+    workbook = load_workbook(raw, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            return
+        for line_no, values in enumerate(rows, 2):
+            if not any(value not in (None, '') for value in values):
+                continue
+            yield line_no, _record_from_columns(dict(zip(header, values))), None
+    finally:
+        workbook.close()
+
+
+def iter_question_rows(raw, fmt):
+    """
+    逐行解析题目文件（raw 为二进制流）
+
+    Yields:
+        tuple: (行号, 记录字典, 错误信息)，解析失败时记录为None
+    """
+    if fmt == 'xlsx':
+        yield from _iter_xlsx(raw)
+        return
+
+    stream = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        for line_no, row in enumerate(csv.DictReader(stream), 2):
+            yield line_no, _record_from_columns(row), None
+        return
+
+    if fmt == 'json':
+        # JSON 数组需要整体解析，大文件请使用 JSONL
+        try:
+            records = json.load(stream)
+        except ValueError as e:
+            yield 1, None, f'JSON解析失败: {e}'
+            return
+        if isinstance(records, dict):
+            records = records.get('questions', [])
+        for index, record in enumerate(records, 1):
+            if isinstance(record, dict):
+                yield index, record, None
+            else:
+                yield index, None, '每道题应为一个JSON对象'
+        return
+
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f'JSON解析失败: {e}'
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, '每行应为一个JSON对象'
+            continue
+        yield line_no, record, None
+
+
+# ==================== 校验 ====================
+
+def _parse_options(value):
+    if value in (None, ''):
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            raise ValueError('options 应为JSON数组')
+    if not isinstance(value, list):
+        raise ValueError('options 应为数组')
+
+    options = []
+    for index, option in enumerate(value):
+        if isinstance(option, dict):
+            label = str(option.get('label') or _OPTION_LABELS[index % len(_OPTION_LABELS)]).upper()
+            options.append({'label': label, 'text': str(option.get('text') or '').strip()})
+        else:
+            options.append({'label': _OPTION_LABELS[index % len(_OPTION_LABELS)], 'text': str(option).strip()})
+    return options
+
+
+def _optional_int(value, field):
+    if value in (None, ''):
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} 应为整数')
+
+
+def normalize_question(record):
+    """
+    校验并转换为 quizzes 表的行
+
+    Raises:
+        ValueError: 字段缺失或格式错误
+    """
+    question = str(record.get('question') or '').strip()
+    if not question:
+        raise ValueError('缺少题干 question')
+
+    options = _parse_options(record.get('options'))
+    question_type = str(record.get('type') or ('objective' if options else 'subjective')).strip().lower()
+    if question_type not in ('objective', 'subjective'):
+        raise ValueError(f'未知题型: {question_type}')
+
+    answer = str(record.get('answer') or '').strip().upper() or None
+    reference_answer = str(record.get('reference_answer') or '').strip() or None
+    if question_type == 'objective':
+        if len(options) < 2:
+            raise ValueError('客观题至少需要两个选项')
+        if not answer or answer not in {option['label'] for option in options}:
+            raise ValueError(f'答案 {answer} 不在选项中')
+    elif not reference_answer:
+        raise ValueError('主观题缺少参考答案 reference_answer')
+
+    difficulty = _optional_int(record.get('difficulty'), 'difficulty') or 1
+    if not 1 <= difficulty <= 5:
+        raise ValueError('difficulty 应为 1-5')
+
+    return {
+        'question': question,
+        'type': question_type,
+        'options': json.dumps(options, ensure_ascii=False) if options else None,
+        'answer': answer if question_type == 'objective' else None,
+        'reference_answer': reference_answer,
+        'knowledge_point': str(record.get('knowledge_point') or '').strip() or None,
+        'explanation': str(record.get('explanation') or '').strip() or None,
+        'difficulty': difficulty,
+        'category': str(record.get('category') or '').strip() or None,
+        'video_id': _optional_int(record.get('video_id'), 'video_id'),
+        'timestamp': _optional_int(record.get('timestamp'), 'timestamp'),
+        # 批量插入不触发ORM事件，这里直接预计算词法向量
+        'lexical_vector': json.dumps(build_reference_vector(reference_answer), ensure_ascii=False)
+        if question_type == 'subjective' else None
+    }
+
+
+# ==================== 近似重复检测 ====================
+
+def duplicate_text(question, options=None):
+    """参与查重的文本：题干+选项，NFKC规范化、小写并去掉空白和标点"""
+    if isinstance(options, str):
+        try:
+            options = json.loads(options)
+        except ValueError:
+            options = []
+    parts = [question or '']
+    for option in options or []:
+        parts.append(option.get('text', '') if isinstance(option, dict) else str(option))
+    text = unicodedata.normalize('NFKC', ' '.join(parts)).lower()
+    return _NOISE_PATTERN.sub('', text)
+
+
+class MinHasher:
+    """
+    向量化 MinHash
+
+    一批文本的字符拼接成一个码点数组，每3个相邻码点混合为一个shingle哈希（不跨越文本边界）；
+    NUM_PERM 个哈希函数取乘移位族 h_i(x) = (a_i · x + b_i) >> 32，按文本分段取最小值。
+    """
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = np.random.RandomState(seed)
+        # a 为奇数的64位乘数
+        self.a = (rng.randint(0, 1 << 62, size=num_perm, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+        self.b = rng.randint(0, 1 << 62, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        return self.signatures([text])[0]
+
+    def signatures(self, texts):
+        """一批文本的签名矩阵（文本数 × NUM_PERM）"""
+        # 不足一个shingle的文本补齐，每个文本贡献 len - SHINGLE_SIZE + 1 个shingle
+        texts = [text.ljust(SHINGLE_SIZE, '\0') for text in texts]
+        lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+        codes = np.frombuffer(''.join(texts).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+
+        text_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        counts = lengths - SHINGLE_SIZE + 1
+        positions = np.repeat(text_starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+        positions += np.arange(counts.sum())
+
+        with np.errstate(over='ignore'):
+            shingles = codes[positions] * _MIX[0]
+            for offset in range(1, SHINGLE_SIZE):
+                shingles ^= codes[positions + offset] * _MIX[offset]
+            shingles >>= np.uint64(32)
+            values = (self.a[:, None] * shingles[None, :] + self.b[:, None]) >> np.uint64(32)
+        segment_starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        return np.minimum.reduceat(values, segment_starts, axis=1).T.astype(np.uint32)
+
+
+def band_hashes(signatures):
+    """签名按 LSH_ROWS 分段，每段混合为一个64位哈希（文本数 × LSH_BANDS）"""
+    bands = np.asarray(signatures, dtype=np.uint64).reshape(-1, LSH_BANDS, LSH_ROWS)
+    with np.errstate(over='ignore'):
+        return (bands * _BAND_MIX).sum(axis=2)
+
+
+class DuplicateIndex:
+    """MinHash LSH 索引"""
+
+    def __init__(self, threshold=DEFAULT_DUPLICATE_THRESHOLD, hasher=None):
+        self.threshold = threshold
+        self.hasher = hasher or MinHasher()
+        self._buckets = [{} for _ in range(LSH_BANDS)]  # 每个分段: 分段哈希 -> [条目下标]
+        self._signatures = []
+        self._keys = []  # 条目标识（题目ID或 "line:N"）
+
+    def __len__(self):
+        return len(self._keys)
+
+    def query(self, signature, bands=None):
+        """
+        查找最相似的已有条目
+
+        Returns:
+            tuple: (条目标识, 估计相似度)，没有达到阈值的条目时返回 (None, 0.0)
+        """
+        bands = band_hashes(signature)[0].tolist() if bands is None else bands
+        candidates = set()
+        for buckets, band in zip(self._buckets, bands):
+            candidates.update(buckets.get(band, ()))
+        best, best_score = None, 0.0
+        for index in candidates:
+            score = float(np.mean(self._signatures[index] == signature))
+            if score > best_score:
+                best, best_score = index, score
+        if best is None or best_score < self.threshold:
+            return None, 0.0
+        return self._keys[best], best_score
+
+    def add(self, key, signature, bands=None):
+        bands = band_hashes(signature)[0].tolist() if bands is None else bands
+        index = len(self._keys)
+        self._keys.append(key)
+        self._signatures.append(signature)
+        for buckets, band in zip(self._buckets, bands):
+            buckets.setdefault(band, []).append(index)
+
+    @classmethod
+    def from_question_bank(cls, session, threshold=DEFAULT_DUPLICATE_THRESHOLD, batch_size=2000):
+        """按ID分批读取现有题目（只取题干和选项），每批一次计算签名后建立索引"""
+        index = cls(threshold)
+        last_id = 0
+        while True:
+            rows = session.query(Quiz.id, Quiz.question, Quiz.options).filter(
+                Quiz.id > last_id
+            ).order_by(Quiz.id).limit(batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            # 每500道题一起计算签名，中间矩阵约 NUM_PERM × 500 × 每题shingle数
+            for start in range(0, len(rows), 500):
+                chunk = rows[start:start + 500]
+                signatures = index.hasher.signatures([duplicate_text(row.question, row.options) for row in chunk])
+                for row, signature, bands in zip(chunk, signatures, band_hashes(signatures).tolist()):
+                    index.add(row.id, signature, bands)
+        return index
+
+
+# ==================== 导入 ====================
+
+def import_questions(session, rows, threshold=DEFAULT_DUPLICATE_THRESHOLD, batch_size=DEFAULT_BATCH_SIZE,
+                     dry_run=False):
+    """
+    导入题目：校验、查重后批量插入，整个文件一个事务
+
+    Args:
+        rows: iter_question_rows 产出的 (行号, 记录, 错误)
+        dry_run: 只校验和查重，不写入
+
+    Returns:
+        dict: 导入报告（各类计数、重复和错误明细、耗时和吞吐）
+    """
+    started = time.perf_counter()
+    index = DuplicateIndex.from_question_bank(session, threshold)
+    indexed_at = time.perf_counter()
+
+    report = {
+        'total': 0,
+        'imported': 0,
+        'duplicate_count': 0,
+        'error_count': 0,
+        'duplicates': [],
+        'errors': [],
+        'dry_run': dry_run
+    }
+
+    def note(kind, entry):
+        report[f'{kind}_count'] += 1
+        if len(report[f'{kind}s']) < MAX_REPORTED:
+            report[f'{kind}s'].append(entry)
+
+    pending = []
+    try:
+        for line_no, record, error in rows:
+            report['total'] += 1
+            if error:
+                note('error', {'line': line_no, 'message': error})
+                continue
+            try:
+                values = normalize_question(record)
+            except ValueError as e:
+                note('error', {'line': line_no, 'message': str(e)})
+                continue
+
+            signature = index.hasher.signature(duplicate_text(values['question'], values['options']))
+            bands = band_hashes(signature)[0].tolist()
+            duplicate_of, similarity = index.query(signature, bands)
+            if duplicate_of is not None:
+                note('duplicate', {
+                    'line': line_no,
+                    'question': values['question'][:80],
+                    'duplicate_of': duplicate_of,
+                    'similarity': round(similarity, 4)
+                })
+                continue
+            index.add(f'line:{line_no}', signature, bands)
+
+            pending.append(values)
+            if len(pending) >= batch_size:
+                if not dry_run:
+                    session.execute(insert(Quiz), pending)
+                report['imported'] += len(pending)
+                pending = []
+
+        if pending:
+            if not dry_run:
+                session.execute(insert(Quiz), pending)
+            report['imported'] += len(pending)
+
+        if dry_run:
+            session.rollback()
+        else:
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    if report['imported'] and not dry_run:
+        question_bank.bust()
+
+    elapsed = time.perf_counter() - started
+    report['index_seconds'] = round(indexed_at - started, 2)
+    report['indexed_questions'] = len(index) - report['imported']
+    report['seconds'] = round(elapsed, 2)
+    report['rows_per_second'] = round(report['total'] / elapsed, 1) if elapsed > 0 else None
+    return report
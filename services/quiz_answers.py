@@ -0,0 +1,50 @@
+"""
+单题作答结果
+批改完成时把提交的 detailed_results 拆分为 quiz_answers 行并批量插入，
+"全班在第17题上表现如何"之类的查询直接走 quiz_id 索引。
+"""
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from models import db, QuizAnswer
+from services.quiz_stats import answer_outcome
+
+
+def build_answer_rows(submission_id, user_id, results, created_at=None):
+    """将一条提交的批改结果转换为 quiz_answers 行"""
+    created_at = created_at or datetime.utcnow()
+    rows = []
+    for question_type in ('objective', 'subjective'):
+        for q_id, entry in (results.get(question_type) or {}).items():
+            try:
+                quiz_id = int(q_id)
+            except (TypeError, ValueError):
+                continue
+            is_correct, score, max_score = answer_outcome(question_type, entry)
+            user_answer = entry.get('user_answer')
+            rows.append({
+                'submission_id': submission_id,
+                'user_id': user_id,
+                'quiz_id': quiz_id,
+                'question_type': question_type,
+                'answer': None if user_answer is None else str(user_answer),
+                'score': score,
+                'max_score': max_score,
+                'is_correct': is_correct,
+                'similarity': entry.get('similarity'),
+                'created_at': created_at
+            })
+    return rows
+
+
+def record_answers(submission, results):
+    """写入一条提交的单题结果（提交记录需已分配ID，调用方负责提交事务）
+
+    重新批改时先清除该提交已有的结果行。
+    """
+    QuizAnswer.query.filter_by(submission_id=submission.id).delete(synchronize_session=False)
+    rows = build_answer_rows(submission.id, submission.user_id, results, submission.submitted_at)
+    if rows:
+        db.session.execute(insert(QuizAnswer), rows)
+    return len(rows)
@@ -0,0 +1,200 @@
+"""
+测验统计维护
+每条批改完成的提交增量更新 QuizStatistics：
+- 计数类字段使用单条 UPDATE 原子自增，并发提交不会丢失更新；
+- 知识点/难度分布等JSON字段在同一事务中、计数 UPDATE 之后读改写。
+  UPDATE 已持有该行的写锁（SQLite为库级写锁，PostgreSQL/MySQL为行锁），
+  因此同一用户的并发提交在这里被串行化，看板无需回扫历史提交。
+进程内的自适应掌握度向量在事务提交成功后才更新，事务回滚时丢弃，保持与数据库一致。
+"""
+import json
+
+from sqlalchemy import case, event, insert
+from sqlalchemy.orm import Session
+
+from models import db, QuizStatistics
+from services.question_bank import question_bank
+from services.adaptive import adaptive_engine
+from services.review import record_review_outcomes
+from services.knowledge_tracing import record_mastery_outcomes
+
+# 主观题得分率达到该比例计为答对
+SUBJECTIVE_PASS_RATIO = 0.6
+
+# 历史批改结果中没有 max_score 字段时使用的每题满分
+DEFAULT_MAX_SCORE = 10
+
+# 弱项判定：作答次数不少于 WEAK_MIN_ATTEMPTS 且正确率低于 WEAK_ACCURACY
+WEAK_MIN_ATTEMPTS = 3
+WEAK_ACCURACY = 0.6
+WEAK_AREA_LIMIT = 5
+
+# session.info 中等待事务提交后再更新的掌握度观测
+_PENDING_OBSERVATIONS = 'adaptive_observations'
+
+
+def _insert_ignore(values):
+    """插入统计行，已存在时忽略（依赖 user_id + quiz_type 唯一索引）"""
+    table = QuizStatistics.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        statement = dialect_insert(table).values(**values).on_conflict_do_nothing()
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(table).values(**values).on_conflict_do_nothing()
+    elif dialect == 'mysql':
+        statement = insert(table).values(**values).prefix_with('IGNORE')
+    else:
+        exists = db.session.query(QuizStatistics.id).filter_by(
+            user_id=values['user_id'], quiz_type=values['quiz_type']
+        ).first()
+        if exists:
+            return
+        statement = insert(table).values(**values)
+    db.session.execute(statement)
+
+
+def answer_outcome(question_type, entry):
+    """
+    单题批改结果的得分情况
+
+    Returns:
+        tuple: (is_correct, score, max_score)
+    """
+    score = entry.get('score') or 0
+    max_score = entry.get('max_score', DEFAULT_MAX_SCORE)
+    if question_type == 'objective':
+        is_correct = bool(entry.get('is_correct'))
+    else:
+        is_correct = max_score > 0 and score / max_score >= SUBJECTIVE_PASS_RATIO
+    return is_correct, score, max_score
+
+
+def _question_outcomes(results):
+    """
+    从批改结果中提取每道题的知识点、难度和得分
+
+    Yields:
+        tuple: (knowledge_point, difficulty, is_correct, score, max_score)
+    """
+    for question_type in ('objective', 'subjective'):
+        for q_id, entry in results.get(question_type, {}).items():
+            question = question_bank.get(q_id, question_type) or {}
+            knowledge_point = question.get('knowledge_point') or '未分类'
+            difficulty = str(question.get('difficulty') or 1)
+            is_correct, score, max_score = answer_outcome(question_type, entry)
+            yield knowledge_point, difficulty, is_correct, score, max_score
+
+
+def _accumulate(bucket, is_correct, score, max_score):
+    bucket['total'] = bucket.get('total', 0) + 1
+    bucket['correct'] = bucket.get('correct', 0) + (1 if is_correct else 0)
+    bucket['score'] = round(bucket.get('score', 0) + score, 2)
+    bucket['max_score'] = round(bucket.get('max_score', 0) + max_score, 2)
+    bucket['accuracy'] = round(bucket['correct'] / bucket['total'], 4)
+
+
+def compute_weak_areas(knowledge_statistics):
+    """按知识点正确率找出弱项（作答次数足够且正确率偏低）"""
+    weak = [
+        {
+            'knowledge_point': knowledge_point,
+            'accuracy': bucket['accuracy'],
+            'total': bucket['total']
+        }
+        for knowledge_point, bucket in knowledge_statistics.items()
+        if bucket.get('total', 0) >= WEAK_MIN_ATTEMPTS and bucket.get('accuracy', 1) < WEAK_ACCURACY
+    ]
+    weak.sort(key=lambda item: (item['accuracy'], -item['total']))
+    return weak[:WEAK_AREA_LIMIT]
+
+
+def record_graded_submission(user_id, results, quiz_type='static'):
+    """
+    将一条批改完成的提交计入用户统计（调用方负责提交事务）
+
+    Args:
+        user_id: 用户ID
+        results: 批改结果（含 objective/subjective/summary）
+        quiz_type: 测验类型
+    """
+    summary = results['summary']
+    score = summary['total_score']
+
+    _insert_ignore({
+        'user_id': user_id,
+        'quiz_type': quiz_type,
+        'total_quizzes': 0,
+        'average_score': 0.0,
+        'best_score': 0.0,
+        'worst_score': 0.0,
+        'total_correct': 0,
+        'total_questions': 0
+    })
+
+    # 1. 计数字段原子自增（右侧表达式均取更新前的值）
+    QuizStatistics.query.filter_by(user_id=user_id, quiz_type=quiz_type).update({
+        QuizStatistics.average_score: (
+            (QuizStatistics.average_score * QuizStatistics.total_quizzes + score)
+            / (QuizStatistics.total_quizzes + 1)
+        ),
+        QuizStatistics.best_score: case(
+            (QuizStatistics.total_quizzes == 0, score),
+            (QuizStatistics.best_score < score, score),
+            else_=QuizStatistics.best_score
+        ),
+        QuizStatistics.worst_score: case(
+            (QuizStatistics.total_quizzes == 0, score),
+            (QuizStatistics.worst_score > score, score),
+            else_=QuizStatistics.worst_score
+        ),
+        QuizStatistics.total_quizzes: QuizStatistics.total_quizzes + 1,
+        QuizStatistics.total_correct: QuizStatistics.total_correct + summary['correct_count'],
+        QuizStatistics.total_questions: QuizStatistics.total_questions + summary['total_count']
+    }, synchronize_session=False)
+
+    # 2. 持有写锁后增量合并知识点/难度分布
+    stats = db.session.query(
+        QuizStatistics.id, QuizStatistics.knowledge_statistics, QuizStatistics.difficulty_statistics
+    ).filter_by(user_id=user_id, quiz_type=quiz_type).with_for_update().first()
+
+    knowledge_statistics = json.loads(stats.knowledge_statistics) if stats.knowledge_statistics else {}
+    difficulty_statistics = json.loads(stats.difficulty_statistics) if stats.difficulty_statistics else {}
+    mastery_outcomes = []
+    tracing_outcomes = []
+    for knowledge_point, difficulty, is_correct, question_score, max_score in _question_outcomes(results):
+        _accumulate(knowledge_statistics.setdefault(knowledge_point, {}), is_correct, question_score, max_score)
+        _accumulate(difficulty_statistics.setdefault(difficulty, {}), is_correct, question_score, max_score)
+        mastery_outcomes.append((knowledge_point, question_score / max_score if max_score else 0.0))
+        tracing_outcomes.append((knowledge_point, is_correct))
+
+    QuizStatistics.query.filter_by(id=stats.id).update({
+        QuizStatistics.knowledge_statistics: json.dumps(knowledge_statistics, ensure_ascii=False),
+        QuizStatistics.difficulty_statistics: json.dumps(difficulty_statistics, ensure_ascii=False),
+        QuizStatistics.weak_areas: json.dumps(compute_weak_areas(knowledge_statistics), ensure_ascii=False)
+    }, synchronize_session=False)
+
+    # 3. 自适应选题使用的掌握度向量在事务提交后更新
+    db.session.info.setdefault(_PENDING_OBSERVATIONS, []).append((user_id, mastery_outcomes))
+
+    # 4. 答错的题目加入错题本，已在错题本中的题目重新安排复习
+    record_review_outcomes(user_id, (
+        (question_type, q_id, *answer_outcome(question_type, entry), entry.get('user_answer'))
+        for question_type in ('objective', 'subjective')
+        for q_id, entry in results.get(question_type, {}).items()
+    ))
+
+    # 5. 贝叶斯知识追踪：逐题更新知识点掌握概率
+    record_mastery_outcomes(user_id, tracing_outcomes)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_observations(session):
+    for user_id, outcomes in session.info.pop(_PENDING_OBSERVATIONS, ()):
+        adaptive_engine.observe(user_id, outcomes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_observations(session):
+    session.info.pop(_PENDING_OBSERVATIONS, None)
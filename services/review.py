@@ -0,0 +1,204 @@
+"""
+错题本与间隔重复复习
+批改完成时增量维护错题本：答错的题目加入（或重新开始）复习计划，
+已在错题本中的题目再次作答时按SM-2算法调整间隔和下次复习时间。
+"待复习"查询走 (user_id, due_at) 索引范围扫描。
+"""
+import hashlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, insert, update
+
+from models import db, ReviewItem
+
+# SM-2 参数
+MIN_EASE_FACTOR = 1.3
+DEFAULT_EASE_FACTOR = 2.5
+# 质量评分低于该值视为遗忘，重新开始
+PASS_QUALITY = 3
+
+
+def quality_from_outcome(question_type, is_correct, score, max_score):
+    """将单题批改结果转换为SM-2质量评分（0-5）"""
+    if question_type == 'objective':
+        return 4 if is_correct else 1
+    ratio = score / max_score if max_score else 0.0
+    return max(0, min(5, int(round(ratio * 5))))
+
+
+def sm2_next(repetitions, interval_days, ease_factor, quality):
+    """
+    SM-2 调度
+
+    Returns:
+        tuple: (repetitions, interval_days, ease_factor, 是否遗忘)
+    """
+    ease_factor = max(
+        MIN_EASE_FACTOR,
+        ease_factor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    )
+    if quality < PASS_QUALITY:
+        return 0, 1.0, ease_factor, True
+
+    repetitions += 1
+    if repetitions == 1:
+        interval_days = 1.0
+    elif repetitions == 2:
+        interval_days = 6.0
+    else:
+        interval_days = round(interval_days * ease_factor, 2)
+    return repetitions, interval_days, ease_factor, False
+
+
+def apply_review(item, quality, answer=None, now=None):
+    """按质量评分更新一个错题本条目（ORM对象）"""
+    now = now or datetime.utcnow()
+    repetitions, interval_days, ease_factor, lapsed = sm2_next(
+        item.repetitions or 0, item.interval_days or 0.0, item.ease_factor or DEFAULT_EASE_FACTOR, quality
+    )
+    item.repetitions = repetitions
+    item.interval_days = interval_days
+    item.ease_factor = ease_factor
+    item.lapses = (item.lapses or 0) + (1 if lapsed else 0)
+    item.due_at = now + timedelta(days=interval_days)
+    item.last_reviewed_at = now
+    if answer is not None:
+        item.last_answer = str(answer)
+    return item
+
+
+def _insert_ignore_rows(rows):
+    """批量插入新条目，并发下已存在的条目忽略（依赖 user_id + question_type + quiz_id 唯一约束）"""
+    table = ReviewItem.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        statement = dialect_insert(table).on_conflict_do_nothing()
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(table).on_conflict_do_nothing()
+    elif dialect == 'mysql':
+        statement = insert(table).prefix_with('IGNORE')
+    else:
+        statement = insert(table)
+    db.session.execute(statement, rows)
+
+
+def record_review_outcomes(user_id, outcomes, now=None):
+    """
+    根据一条提交的批改结果增量维护错题本（调用方负责提交事务）
+
+    - 答错且不在错题本中的题目：加入错题本，次日复习；
+    - 已在错题本中的题目：按本次作答质量重新调度。
+
+    Args:
+        outcomes: 可迭代的 (题型, 题目ID, is_correct, score, max_score, 学生答案)
+
+    Returns:
+        tuple: (新增条目数, 更新条目数)
+    """
+    now = now or datetime.utcnow()
+    graded = {}
+    for question_type, q_id, is_correct, score, max_score, user_answer in outcomes:
+        try:
+            key = (question_type, int(q_id))
+        except (TypeError, ValueError):
+            continue
+        graded[key] = (quality_from_outcome(question_type, is_correct, score, max_score), user_answer)
+    if not graded:
+        return 0, 0
+
+    existing = {
+        (item.question_type, item.quiz_id): item
+        for item in ReviewItem.query.filter(
+            ReviewItem.user_id == user_id,
+            ReviewItem.quiz_id.in_({quiz_id for _, quiz_id in graded})
+        )
+    }
+
+    new_rows = []
+    updated = 0
+    for key, (quality, user_answer) in graded.items():
+        item = existing.get(key)
+        if item is not None:
+            apply_review(item, quality, user_answer, now)
+            updated += 1
+        elif quality < PASS_QUALITY:
+            repetitions, interval_days, ease_factor, _ = sm2_next(0, 0.0, DEFAULT_EASE_FACTOR, quality)
+            new_rows.append({
+                'user_id': user_id,
+                'question_type': key[0],
+                'quiz_id': key[1],
+                'last_answer': None if user_answer is None else str(user_answer),
+                'repetitions': repetitions,
+                'interval_days': interval_days,
+                'ease_factor': ease_factor,
+                'lapses': 1,
+                'due_at': now + timedelta(days=interval_days),
+                'last_reviewed_at': now,
+                'created_at': now
+            })
+
+    if new_rows:
+        _insert_ignore_rows(new_rows)
+    return len(new_rows), updated
+
+
+def _spread_offset(item_id, spread_days):
+    """按条目ID确定性地分散到 [0, spread_days) 天内（重复执行结果相同）"""
+    digest = hashlib.md5(str(item_id).encode()).digest()
+    return int.from_bytes(digest[:4], 'big') / 2 ** 32 * spread_days
+
+
+def reschedule_reviews(session, max_interval=None, spread_days=None, batch_size=5000, now=None, progress=None):
+    """
+    批量重新调度错题本（按ID游标分批读取，每批一次 executemany 更新并提交）
+
+    Args:
+        max_interval: 复习间隔上限（天），超出的条目缩短间隔并按上次复习时间重算到期时间
+        spread_days: 把已过期的积压条目均匀分散到未来若干天，避免某一天复习量过大
+        batch_size: 每批条目数
+        progress: 可选回调 progress(已扫描数, 已更新数)
+
+    Returns:
+        tuple: (扫描条目数, 更新条目数)
+    """
+    now = now or datetime.utcnow()
+    table = ReviewItem.__table__
+    statement = update(table).where(table.c.id == bindparam('item_id')).values(
+        interval_days=bindparam('new_interval'),
+        due_at=bindparam('new_due_at')
+    )
+
+    last_id = 0
+    scanned = 0
+    changed = 0
+    while True:
+        rows = session.query(
+            ReviewItem.id, ReviewItem.interval_days, ReviewItem.due_at, ReviewItem.last_reviewed_at
+        ).filter(ReviewItem.id > last_id).order_by(ReviewItem.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        scanned += len(rows)
+
+        updates = []
+        for row in rows:
+            interval_days = row.interval_days or 0.0
+            due_at = row.due_at
+            if max_interval is not None and interval_days > max_interval:
+                interval_days = float(max_interval)
+                due_at = (row.last_reviewed_at or now) + timedelta(days=interval_days)
+            if spread_days and due_at < now:
+                due_at = now + timedelta(days=_spread_offset(row.id, spread_days))
+            if interval_days != row.interval_days or due_at != row.due_at:
+                updates.append({'item_id': row.id, 'new_interval': interval_days, 'new_due_at': due_at})
+
+        if updates:
+            session.execute(statement, updates)
+            changed += len(updates)
+        session.commit()
+        if progress:
+            progress(scanned, changed)
+
+    return scanned, changed
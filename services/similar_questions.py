@@ -0,0 +1,190 @@
+"""
+相似题预计算
+离线任务：分批获取所有题目的语义向量，分块矩阵乘法求每道题的 top-k 相似题，
+批量写入 quiz_similar_questions 表和 quizzes.similar_questions 列。
+分块计算时只保留每行当前的 top-k，内存占用为 块大小 × (块大小 + k)，不需要完整的 n×n 矩阵。
+
+语义向量优先使用BERT服务 /api/embeddings；服务不可用时整批改用字符n-gram哈希向量，
+保证同一次计算中所有题目的向量可比。
+"""
+import json
+import time
+import zlib
+
+import numpy as np
+import requests
+from flask import current_app
+from sqlalchemy import insert
+
+from models import Quiz, QuizSimilarQuestion
+from services.lexical_scorer import extract_ngrams
+from services.question_bank import question_bank
+
+DEFAULT_TOP_K = 10
+# 字符n-gram哈希向量维度：与BERT向量（768维）相同，降级时内存占用与BERT路径一致
+HASHED_DIMENSION = 768
+
+
+def question_text(question):
+    """用于计算语义向量的题目文本：题干 + 选项/参考答案 + 知识点"""
+    parts = [question.question or '']
+    if question.options:
+        try:
+            options = json.loads(question.options)
+            parts.extend(option.get('text', '') if isinstance(option, dict) else str(option) for option in options)
+        except ValueError:
+            pass
+    if question.reference_answer:
+        parts.append(question.reference_answer)
+    if question.knowledge_point:
+        parts.append(question.knowledge_point)
+    return ' '.join(part for part in parts if part)
+
+
+def hashed_embeddings(texts, dimension=HASHED_DIMENSION):
+    """字符n-gram哈希向量（原地L2归一化，不产生额外副本），BERT服务不可用时使用"""
+    matrix = np.zeros((len(texts), dimension), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for gram, count in extract_ngrams(text).items():
+            matrix[row, zlib.crc32(gram.encode('utf-8')) % dimension] += np.sqrt(count)
+    # einsum 逐行求平方和，不生成与矩阵同样大小的临时数组
+    norms = np.sqrt(np.einsum('ij,ij->i', matrix, matrix))[:, None]
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def bert_embeddings(texts, batch_size=64):
+    """分批请求BERT服务获取语义向量，任一批失败时抛出异常"""
+    bert_url = current_app.config.get('BERT_SERVICE_URL', 'http://localhost:5001')
+    timeout = current_app.config.get('BERT_SERVICE_TIMEOUT', 10)
+    chunks = []
+    for start in range(0, len(texts), batch_size):
+        response = requests.post(
+            f'{bert_url}/api/embeddings',
+            json={'texts': texts[start:start + batch_size]},
+            timeout=timeout * max(1, batch_size // 16)
+        )
+        if response.status_code != 200:
+            raise Exception(f"BERT服务响应错误: {response.status_code}")
+        chunks.append(np.asarray(response.json()['embeddings'], dtype=np.float32))
+    return np.concatenate(chunks) if chunks else np.zeros((0, 1), dtype=np.float32)
+
+
+def embed_texts(texts, batch_size=64):
+    """
+    获取文本语义向量
+
+    Returns:
+        tuple: (向量矩阵, 向量来源 'bert' | 'hashed')
+    """
+    try:
+        return bert_embeddings(texts, batch_size), 'bert'
+    except Exception as e:
+        print(f"BERT向量服务不可用，使用字符n-gram哈希向量: {e}")
+        return hashed_embeddings(texts), 'hashed'
+
+
+def top_k_neighbors(embeddings, k=DEFAULT_TOP_K, block_size=1024):
+    """
+    分块计算每行的 top-k 余弦相似行（向量需已归一化，排除自身）
+
+    Returns:
+        tuple: (相似行下标 n×k, 相似度 n×k)，按相似度降序；题目不足k+1道时k相应缩小
+    """
+    n = embeddings.shape[0]
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.zeros((n, 0), dtype=np.int64), np.zeros((n, 0), dtype=np.float32)
+
+    all_indices = np.empty((n, k), dtype=np.int64)
+    all_scores = np.empty((n, k), dtype=np.float32)
+    for row_start in range(0, n, block_size):
+        rows = embeddings[row_start:row_start + block_size]
+        row_ids = np.arange(row_start, row_start + rows.shape[0])
+        best_scores = np.full((rows.shape[0], k), -np.inf, dtype=np.float32)
+        best_indices = np.zeros((rows.shape[0], k), dtype=np.int64)
+
+        for col_start in range(0, n, block_size):
+            cols = embeddings[col_start:col_start + block_size]
+            scores = rows @ cols.T
+            col_ids = np.arange(col_start, col_start + cols.shape[0])
+            # 排除自身
+            scores[row_ids[:, None] == col_ids[None, :]] = -np.inf
+
+            # 与当前 top-k 合并后重新取 top-k
+            merged_scores = np.concatenate([best_scores, scores], axis=1)
+            merged_indices = np.concatenate([best_indices, np.broadcast_to(col_ids, scores.shape)], axis=1)
+            keep = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+            best_indices = np.take_along_axis(merged_indices, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        all_scores[row_start:row_start + rows.shape[0]] = np.take_along_axis(best_scores, order, axis=1)
+        all_indices[row_start:row_start + rows.shape[0]] = np.take_along_axis(best_indices, order, axis=1)
+    return all_indices, all_scores
+
+
+def rebuild_similar_questions(session, top_k=DEFAULT_TOP_K, min_score=0.0, batch_size=64,
+                              block_size=1024, write_batch=5000):
+    """
+    重新计算所有题目的相似题并批量写入
+
+    Returns:
+        dict: 题目数、写入关系数、向量来源和各阶段耗时
+    """
+    started = time.perf_counter()
+    questions = session.query(
+        Quiz.id, Quiz.question, Quiz.options, Quiz.reference_answer, Quiz.knowledge_point
+    ).order_by(Quiz.id).all()
+    ids = np.array([question.id for question in questions], dtype=np.int64)
+
+    embeddings, source = embed_texts([question_text(question) for question in questions], batch_size)
+    embedded_at = time.perf_counter()
+
+    neighbors, scores = top_k_neighbors(embeddings, top_k, block_size)
+    computed_at = time.perf_counter()
+
+    session.query(QuizSimilarQuestion).delete(synchronize_session=False)
+    relations = []
+    quiz_updates = []
+    written = 0
+    for row, quiz_id in enumerate(ids.tolist()):
+        similar_ids = []
+        for column in range(neighbors.shape[1]):
+            score = float(scores[row, column])
+            if score < min_score:
+                break
+            similar_id = int(ids[neighbors[row, column]])
+            similar_ids.append(similar_id)
+            relations.append({
+                'quiz_id': quiz_id,
+                'similar_quiz_id': similar_id,
+                'similarity_score': round(score, 4)
+            })
+        quiz_updates.append({'id': quiz_id, 'similar_questions': json.dumps(similar_ids)})
+
+        if len(relations) >= write_batch:
+            session.execute(insert(QuizSimilarQuestion), relations)
+            written += len(relations)
+            relations = []
+        if len(quiz_updates) >= write_batch:
+            session.bulk_update_mappings(Quiz, quiz_updates)
+            quiz_updates = []
+
+    if relations:
+        session.execute(insert(QuizSimilarQuestion), relations)
+        written += len(relations)
+    if quiz_updates:
+        session.bulk_update_mappings(Quiz, quiz_updates)
+    session.commit()
+    question_bank.bust()
+
+    return {
+        'questions': len(ids),
+        'relations': written,
+        'source': source,
+        'embed_seconds': round(embedded_at - started, 2),
+        'topk_seconds': round(computed_at - embedded_at, 2),
+        'write_seconds': round(time.perf_counter() - computed_at, 2)
+    }
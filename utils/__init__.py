@@ -4,12 +4,19 @@
 """
 
 from .decorators import token_required, admin_required, teacher_required, roles_required
+from .sse import format_sse, sse_keepalive, sse_response
+from .idempotency import idempotent, idempotency_store
 
 __all__ = [
     'token_required',
     'admin_required', 
     'teacher_required',
-    'roles_required'
+    'roles_required',
+    'format_sse',
+    'sse_keepalive',
+    'sse_response',
+    'idempotent',
+    'idempotency_store'
 ]
 
 # 可选：添加模块说明
@@ -0,0 +1,148 @@
+"""
+幂等请求支持
+客户端在 Idempotency-Key 请求头中携带唯一键，重试时服务端直接返回首次请求的结果；
+首次请求仍在处理时，重试请求等待其完成而不是重复执行。
+
+结果保存在进程内存中并按TTL过期（多进程部署时需配合会话保持，或替换为共享存储）。
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, current_app, jsonify, request
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+class _Entry:
+    """一个幂等键对应的请求状态"""
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.response = None  # (status, body, mimetype)，首次请求失败时保持None
+        self.expires_at = None
+
+
+class IdempotencyStore:
+    """带TTL的幂等结果存储"""
+
+    def __init__(self, ttl=86400, max_entries=50000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get('IDEMPOTENCY_TTL', self.ttl)
+        app.extensions['idempotency_store'] = self
+
+    def begin(self, key, fingerprint):
+        """
+        登记一次请求
+
+        Returns:
+            tuple: (entry, is_owner)，is_owner为True时由调用方执行请求并回写结果
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry, False
+            entry = _Entry(fingerprint)
+            entry.expires_at = now + self.ttl
+            self._entries[key] = entry
+            return entry, True
+
+    def complete(self, entry, status, body, mimetype):
+        """保存首次请求的响应并唤醒等待中的重试请求"""
+        entry.response = (status, body, mimetype)
+        entry.expires_at = time.monotonic() + self.ttl
+        entry.done.set()
+
+    def release(self, key, entry):
+        """首次请求失败：移除记录，允许重试重新执行"""
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
+
+    def _purge(self, now):
+        # 记录按创建顺序排列且TTL相同，只需从头部清理
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            if not entry.done.is_set():
+                break  # 最早的请求仍在处理中
+            if entry.expires_at >= now and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
+
+
+idempotency_store = IdempotencyStore()
+
+
+def _replay(entry):
+    status, body, mimetype = entry.response
+    response = Response(body, status=status, mimetype=mimetype)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(f):
+    """
+    幂等请求装饰器（放在 token_required 之后，按用户隔离幂等键）
+
+    同一键携带不同请求体时返回422；首次请求超时未完成时返回409，客户端可稍后重试。
+    5xx响应不保存，重试会重新执行。
+    """
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return f(current_user, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({
+                'success': False,
+                'message': f'{IDEMPOTENCY_HEADER} 长度不能超过{MAX_KEY_LENGTH}'
+            }), 400
+
+        scope = (current_user.id, request.method, request.path, key)
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        wait_timeout = current_app.config.get('IDEMPOTENCY_WAIT_TIMEOUT', 30)
+        deadline = time.monotonic() + wait_timeout
+
+        while True:
+            entry, is_owner = idempotency_store.begin(scope, fingerprint)
+            if is_owner:
+                break
+            if entry.fingerprint != fingerprint:
+                return jsonify({
+                    'success': False,
+                    'message': f'{IDEMPOTENCY_HEADER} 已用于不同的请求内容'
+                }), 422
+            if not entry.done.wait(max(0.0, deadline - time.monotonic())):
+                return jsonify({
+                    'success': False,
+                    'message': '相同请求仍在处理中，请稍后重试'
+                }), 409
+            if entry.response is not None:
+                return _replay(entry)
+            # 首次请求失败已释放，由本次请求重新执行
+
+        try:
+            response = current_app.make_response(f(current_user, *args, **kwargs))
+        except Exception:
+            idempotency_store.release(scope, entry)
+            raise
+
+        if response.status_code >= 500:
+            idempotency_store.release(scope, entry)
+        else:
+            idempotency_store.complete(entry, response.status_code, response.get_data(), response.mimetype)
+        return response
+
+    return decorated
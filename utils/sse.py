@@ -0,0 +1,38 @@
+"""
+Server-Sent Events 工具函数
+"""
+import json
+
+from flask import Response, stream_with_context
+
+
+def format_sse(data, event=None, event_id=None):
+    """将数据编码为一条SSE消息"""
+    if not isinstance(data, str):
+        data = json.dumps(data, ensure_ascii=False)
+
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    for line in data.splitlines() or ['']:
+        lines.append(f'data: {line}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def sse_keepalive():
+    """SSE心跳注释行，防止代理断开空闲连接"""
+    return ': keep-alive\n\n'
+
+
+def sse_response(generator):
+    """将生成器包装为SSE响应（保持请求上下文，禁用代理缓冲）"""
+    return Response(
+        stream_with_context(generator),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )